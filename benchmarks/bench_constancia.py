@@ -0,0 +1,98 @@
+"""
+Micro-benchmark: tiempo de render por constancia, antes y después de cachear la página base.
+
+Uso:
+    python -m benchmarks.bench_constancia [--n 1000]
+"""
+import io
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.constancia import ConstanciaRenderer, LOGO_PATH, TITULO, PIE, html_a_texto  # noqa: E402
+
+CUERPO = (
+    "<html><body><h2>Hola {nombre},</h2><p>Adjuntamos tu boleta correspondiente al mes de Junio.</p>"
+    "<p>Saludos cordiales,<br>Clínica Santa Rosa</p></body></html>"
+)
+
+
+def destinatarios_sinteticos(n):
+    for i in range(n):
+        yield {
+            "nombre": f"Empleado {i:05d}",
+            "email": f"empleado{i:05d}@example.com",
+            "dni": f"{10000000 + i}",
+            "message_id": f"<{i}.bench@example.com>",
+        }
+
+
+def render_anterior(r):
+    """Render original: decodifica el logo y redibuja toda la página en cada llamada."""
+    import textwrap
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.utils import ImageReader
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=letter)
+    width, height = letter
+    if os.path.exists(LOGO_PATH):
+        c.drawImage(ImageReader(LOGO_PATH), width/2-30, height-80, width=60, height=60, mask='auto')
+        y = height - 100
+    else:
+        y = height - 40
+    c.setFont("Helvetica-Bold", 16)
+    c.drawCentredString(width/2, y, TITULO)
+    y -= 30
+    c.setFont("Helvetica", 10)
+    for texto in ("Fecha/hora de envío: 2025-06-30 10:00:00", f"Message-ID: {r['message_id']}"):
+        c.drawString(40, y, texto)
+        y -= 18
+    c.line(40, y, width-40, y)
+    y -= 25
+    for texto in ("De: Clínica Santa Rosa <rrhh@example.com>", f"Para: {r['nombre']} <{r['email']}>",
+                  "Asunto: Boleta del mes de Junio", f"Adjunto: {r['dni']}.pdf"):
+        c.drawString(40, y, texto)
+        y -= 18
+    for line in html_a_texto(CUERPO.format(nombre=r["nombre"])).splitlines():
+        for wrapped in textwrap.wrap(line.strip(), width=90):
+            c.drawString(50, y, wrapped)
+            y -= 15
+    c.setFont("Helvetica-Oblique", 9)
+    c.drawString(40, y - 10, PIE)
+    c.save()
+    return buffer.getvalue()
+
+
+def render_nuevo(renderer, r):
+    return renderer.render(
+        ("Clínica Santa Rosa", "rrhh@example.com"), (r["nombre"], r["email"]),
+        "Boleta del mes de Junio", CUERPO.format(nombre=r["nombre"]),
+        "2025-06-30 10:00:00", f"{r['dni']}.pdf", message_id=r["message_id"],
+    )
+
+
+def medir(nombre, func, n):
+    inicio = time.perf_counter()
+    for r in destinatarios_sinteticos(n):
+        func(r)
+    total = time.perf_counter() - inicio
+    print(f"{nombre:<10} {n:>6} constancias  {total:8.2f}s  {total / n * 1000:8.2f} ms/constancia")
+    return total / n
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=1000, help="destinatarios sintéticos (por defecto 1000)")
+    args = parser.parse_args()
+    renderer = ConstanciaRenderer()
+    antes = medir("antes", render_anterior, args.n)
+    despues = medir("después", lambda r: render_nuevo(renderer, r), args.n)
+    print(f"Aceleración: x{antes / despues:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark: correos construidos por segundo con MIMEMultipart + send_message (antes)
+y con MessageBuilder + sendmail en bytes crudos (después).
+
+Uso:
+    python -m benchmarks.bench_message_builder [--n 2000] [--kb 120]
+"""
+import os
+import sys
+import time
+import argparse
+from email.header import Header
+from email.mime.application import MIMEApplication
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from email.utils import formataddr, make_msgid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.message_builder import MessageBuilder, codificar_base64  # noqa: E402
+
+REMITENTE = "rrhh@example.com"
+HTML = "<html><body><h2>Hola {nombre},</h2><p>Adjuntamos tu boleta correspondiente al mes de Junio.</p></body></html>"
+
+
+def construir_anterior(i, pdf_bytes):
+    msg = MIMEMultipart("alternative")
+    msg["From"] = formataddr((str(Header("Clínica Santa Rosa", "utf-8")), REMITENTE))
+    msg["To"] = formataddr((f"Empleado {i}", f"empleado{i}@example.com"))
+    msg["Subject"] = "Boleta del mes de Junio"
+    msg.add_header('Disposition-Notification-To', REMITENTE)
+    msg['Message-ID'] = make_msgid()
+    msg.attach(MIMEText(HTML.format(nombre=f"Empleado {i}"), "html"))
+    part = MIMEApplication(pdf_bytes, _subtype="pdf")
+    part.add_header("Content-Disposition", "attachment", filename=f"{10000000 + i}.pdf")
+    msg.attach(part)
+    # send_message serializa el árbol con el generador de email
+    return msg.as_bytes(policy=msg.policy.clone(linesep="\r\n"))
+
+
+def construir_nuevo(builder, i, pdf_bytes):
+    return builder.build(
+        f"Empleado {i}", f"empleado{i}@example.com", "Boleta del mes de Junio",
+        HTML.format(nombre=f"Empleado {i}"), codificar_base64(pdf_bytes),
+        f"{10000000 + i}.pdf", builder.nuevo_message_id(),
+    )
+
+
+def medir(nombre, func, n):
+    inicio = time.perf_counter()
+    for i in range(n):
+        func(i)
+    total = time.perf_counter() - inicio
+    print(f"{nombre:<10} {n:>6} correos  {total:8.2f}s  {n / total:10.1f} correos/s")
+    return n / total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=2000, help="correos a construir (por defecto 2000)")
+    parser.add_argument("--kb", type=int, default=120, help="tamaño del PDF adjunto sintético en KB")
+    args = parser.parse_args()
+    pdf_bytes = os.urandom(args.kb * 1024)
+    builder = MessageBuilder(remitente_email=REMITENTE)
+    antes = medir("antes", lambda i: construir_anterior(i, pdf_bytes), args.n)
+    despues = medir("después", lambda i: construir_nuevo(builder, i, pdf_bytes), args.n)
+    print(f"Aceleración: x{despues / antes:.1f}")
+
+
+if __name__ == "__main__":
+    main()
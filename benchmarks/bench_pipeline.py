@@ -0,0 +1,177 @@
+"""
+Benchmark de extremo a extremo: envío + constancias contra un servidor SMTP local (sin red).
+
+Genera un Excel de destinatarios y boletas PDF sintéticas a varias escalas, ejecuta el
+pipeline completo (core.pipeline) contra benchmarks.smtp_sink y reporta correos/s,
+latencia p50/p99 por correo y memoria máxima (RSS). Cada escala corre en un proceso
+nuevo para que el RSS máximo no arrastre el de la escala anterior. Solo Linux.
+
+Uso:
+    python -m benchmarks.bench_pipeline [--escalas 100 1000 10000] [--workers 4] [--rate 500]
+        [--latencia-ms 20] [--transitorios 0.01] [--permanentes 0.005] [--kb 60]
+"""
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import resource
+import tempfile
+import subprocess
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+# El remitente y los reintentos rápidos deben fijarse antes de importar core.config
+os.environ.setdefault("EMAIL_USER", "rrhh@example.com")
+os.environ.setdefault("SMTP_BACKOFF_BASE", "0.05")
+os.environ.setdefault("SMTP_BACKOFF_MAX", "1")
+
+MES = "junio"
+
+
+def boleta_sintetica(kb):
+    """PDF con texto aleatorio hasta ~`kb` KB (el relleno no se comprime, como una boleta escaneada)."""
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=letter)
+    c.drawString(72, 740, "Boleta de pago - benchmark")
+    c.setFont("Helvetica", 4)
+    # Cada línea de 120 caracteres hexadecimales ocupa ~65 bytes comprimida
+    for linea in range(kb * 1024 // 65):
+        if linea and linea % 170 == 0:
+            c.showPage()
+            c.setFont("Helvetica", 4)
+        c.drawString(20, 720 - (linea % 170) * 4, os.urandom(60).hex())
+    c.save()
+    return buffer.getvalue()
+
+
+def generar_datos(directorio, n, kb):
+    """Crea destinatarios.xlsx y <directorio>/junio/<dni>.pdf para `n` destinatarios."""
+    from openpyxl import Workbook
+    carpeta_mes = os.path.join(directorio, MES)
+    os.makedirs(carpeta_mes)
+    pdf = boleta_sintetica(kb)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Destinatarios")
+    ws.append(["nombre", "email", "dni", "cargo"])
+    for i in range(n):
+        dni = f"{10000000 + i}"
+        ws.append([f"Empleado {i:05d}", f"empleado{i:05d}@example.com", dni, "Técnico"])
+        with open(os.path.join(carpeta_mes, f"{dni}.pdf"), "wb") as f:
+            f.write(pdf)
+    excel = os.path.join(directorio, "destinatarios.xlsx")
+    wb.save(excel)
+    return excel
+
+
+def percentil(valores, q):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(q * (len(ordenados) - 1))))]
+
+
+def ejecutar_escala(args):
+    """Corre una escala en este proceso e imprime el resultado como una línea JSON."""
+    from benchmarks.smtp_sink import SMTPSink
+    from core.pipeline import SendPipeline, ENVIANDO, ENVIADO
+    from core.smtp_pool import SMTPConnectionPool
+    from core.journal import SendJournal
+    from core.error_report import ErrorReportWriter
+    from core.attachment_cache import AttachmentCache
+
+    directorio = tempfile.mkdtemp(prefix="bench_pipeline_")
+    try:
+        inicio_datos = time.perf_counter()
+        excel = generar_datos(directorio, args.una, args.kb)
+        tiempo_datos = time.perf_counter() - inicio_datos
+
+        with SMTPSink(latencia=args.latencia_ms / 1000, tasa_transitorios=args.transitorios,
+                      tasa_permanentes=args.permanentes, semilla=1) as sink:
+            pool = SMTPConnectionPool(connection_factory=sink.conectar, max_idle=args.workers)
+            journal = SendJournal(os.path.join(directorio, "envios.sqlite3"))
+            pipeline = SendPipeline(
+                pool=pool, journal=journal, workers=args.workers, rate=args.rate, reanudar=False,
+                reportar=lambda: ErrorReportWriter(os.path.join(directorio, "logError")),
+                adjuntos=lambda: AttachmentCache(os.path.join(directorio, "cache_adjuntos")),
+                metrics_file=os.path.join(directorio, "metricas_envio.json"),
+            )
+            inicios = {}
+            latencias = []
+
+            def medir(evento):
+                if evento.tipo == ENVIANDO:
+                    inicios[evento.datos["fila"]] = time.perf_counter()
+                elif evento.tipo == ENVIADO:
+                    latencias.append(time.perf_counter() - inicios.pop(evento.datos["fila"]))
+
+            pipeline.subscribe(medir)
+            inicio = time.perf_counter()
+            resultado = pipeline.run(excel, MES, directorio)
+            total = time.perf_counter() - inicio
+            pool.close()
+            journal.close()
+
+        propio = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        hijos = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        print(json.dumps({
+            "n": args.una,
+            "enviados": resultado.enviados,
+            "errores": resultado.total_errores,
+            "constancias": len(resultado.constancias),
+            "reintentos": resultado.control_tasa.get("reintentos", 0),
+            "segundos": total,
+            "envio_smtp": resultado.tiempos.get("envio_smtp", 0.0),
+            "datos": tiempo_datos,
+            "p50": percentil(latencias, 0.50),
+            "p99": percentil(latencias, 0.99),
+            # ru_maxrss está en KB en Linux
+            "rss_mb": propio / 1024,
+            "rss_hijos_mb": hijos / 1024,
+        }))
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--escalas", type=int, nargs="+", default=[100, 1000, 10000],
+                        help="cantidades de destinatarios a medir (por defecto 100 1000 10000)")
+    parser.add_argument("--workers", type=int, default=4, help="hilos de envío (por defecto 4)")
+    parser.add_argument("--rate", type=float, default=500, help="tasa inicial en correos/s (por defecto 500)")
+    parser.add_argument("--latencia-ms", type=float, default=20, help="latencia simulada del servidor por correo")
+    parser.add_argument("--transitorios", type=float, default=0.0, help="fracción de rechazos 451 4.7.1")
+    parser.add_argument("--permanentes", type=float, default=0.0, help="fracción de rechazos 550 5.1.1")
+    parser.add_argument("--kb", type=int, default=60, help="tamaño aproximado de cada boleta PDF en KB")
+    parser.add_argument("--una", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.una:
+        ejecutar_escala(args)
+        return
+
+    print(f"{'destinat.':>9} {'enviados':>8} {'errores':>7} {'reint.':>6} {'total s':>8} {'correos/s':>9} "
+          f"{'p50 ms':>7} {'p99 ms':>7} {'RSS MB':>7} {'RSS hijos':>9}")
+    for n in args.escalas:
+        comando = [
+            sys.executable, "-m", "benchmarks.bench_pipeline", "--una", str(n),
+            "--workers", str(args.workers), "--rate", str(args.rate), "--latencia-ms", str(args.latencia_ms),
+            "--transitorios", str(args.transitorios), "--permanentes", str(args.permanentes), "--kb", str(args.kb),
+        ]
+        salida = subprocess.run(comando, cwd=RAIZ, capture_output=True, text=True)
+        if salida.returncode != 0:
+            print(f"{n:>9} falló:\n{salida.stderr}", file=sys.stderr)
+            continue
+        r = json.loads(salida.stdout.strip().splitlines()[-1])
+        print(f"{r['n']:>9} {r['enviados']:>8} {r['errores']:>7} {r['reintentos']:>6} {r['segundos']:>8.2f} "
+              f"{r['enviados'] / r['segundos']:>9.1f} {r['p50'] * 1000:>7.1f} {r['p99'] * 1000:>7.1f} "
+              f"{r['rss_mb']:>7.1f} {r['rss_hijos_mb']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
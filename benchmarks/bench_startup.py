@@ -0,0 +1,99 @@
+"""
+Benchmark de arranque de la aplicación de escritorio.
+
+Mide dos cosas en procesos nuevos (arranque en frío):
+- Tiempo de importación de gui.email_sender_gui según `python -X importtime`,
+  con los módulos que más pesan.
+- Tiempo hasta el primer frame: desde el inicio del proceso hasta que Tk procesa
+  el primer evento con la ventana principal ya construida (requiere pantalla).
+
+Uso:
+    python -m benchmarks.bench_startup [--runs 5] [--max-ms 1500]
+
+Con --max-ms termina con código 1 si la mediana del primer frame supera el umbral,
+para usarlo como métrica de regresión.
+"""
+import os
+import re
+import sys
+import argparse
+import statistics
+import subprocess
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_RE_IMPORTTIME = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+SCRIPT_PRIMER_FRAME = r"""
+import time
+t0 = time.perf_counter()
+import ttkbootstrap as tb
+from gui.email_sender_gui import EmailSenderGUI
+app = tb.Window(themename="superhero")
+EmailSenderGUI(app)
+def primer_frame():
+    print(f"{(time.perf_counter() - t0) * 1000:.1f}")
+    app.destroy()
+app.after(0, primer_frame)
+app.mainloop()
+"""
+
+
+def medir_importtime():
+    resultado = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import gui.email_sender_gui"],
+        cwd=RAIZ, capture_output=True, text=True,
+    )
+    # importtime lista los hijos antes que su padre; el nivel 1 es un import de primer nivel
+    hijos = []
+    for linea in resultado.stderr.splitlines():
+        m = _RE_IMPORTTIME.match(linea)
+        if not m:
+            continue
+        _, acumulado, sangria, nombre = m.groups()
+        if len(sangria) == 1:
+            if nombre == "gui.email_sender_gui":
+                directos = sorted(hijos, reverse=True)[:10]
+                return int(acumulado) / 1000, [(n, us / 1000) for us, n in directos]
+            hijos = []
+        elif len(sangria) == 3:
+            hijos.append((int(acumulado), nombre))
+    raise RuntimeError(resultado.stderr.strip().splitlines()[-1] if resultado.stderr else "importtime sin salida")
+
+
+def medir_primer_frame():
+    resultado = subprocess.run(
+        [sys.executable, "-c", SCRIPT_PRIMER_FRAME], cwd=RAIZ, capture_output=True, text=True, timeout=60,
+    )
+    if resultado.returncode != 0:
+        return None
+    return float(resultado.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="repeticiones (por defecto 5)")
+    parser.add_argument("--max-ms", type=float, default=None, help="umbral de regresión para el primer frame")
+    args = parser.parse_args()
+
+    importaciones = [medir_importtime() for _ in range(args.runs)]
+    total_import = statistics.median(t for t, _ in importaciones)
+    print(f"Importación de gui.email_sender_gui (mediana de {args.runs}): {total_import:.1f} ms")
+    for nombre, ms in importaciones[-1][1]:
+        print(f"  {ms:8.1f} ms  {nombre}")
+
+    frames = [medir_primer_frame() for _ in range(args.runs)]
+    frames = [f for f in frames if f is not None]
+    if not frames:
+        print("Tiempo hasta el primer frame: no disponible (sin pantalla o sin ttkbootstrap)")
+        return 0
+    mediana = statistics.median(frames)
+    print(f"Tiempo hasta el primer frame (mediana de {len(frames)}): {mediana:.1f} ms")
+    if args.max_ms is not None and mediana > args.max_ms:
+        print(f"REGRESIÓN: {mediana:.1f} ms > {args.max_ms:.1f} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+"""
+Servidor SMTP local en proceso para benchmarks y pruebas sin enviar correos reales.
+
+Acepta cualquier usuario (AUTH PLAIN/LOGIN), descarta los mensajes y permite simular
+latencia por mensaje y rechazos del proveedor:
+- `tasa_transitorios`: fracción de mensajes rechazados con 451 4.7.1 (limitación temporal)
+- `tasa_permanentes`: fracción de mensajes rechazados con 550 5.1.1 (buzón inexistente)
+
+Uso:
+    with SMTPSink(latencia=0.02, tasa_transitorios=0.01) as sink:
+        pool = SMTPConnectionPool(connection_factory=sink.conectar)
+"""
+import random
+import smtplib
+import threading
+import time
+import socketserver
+
+
+class _SesionSMTP(socketserver.StreamRequestHandler):
+    def responder(self, linea):
+        self.wfile.write(linea.encode("ascii") + b"\r\n")
+
+    def handle(self):
+        sink = self.server.sink
+        self.responder("220 sink.local ESMTP listo")
+        while True:
+            linea = self.rfile.readline()
+            if not linea:
+                return
+            comando = linea.decode("ascii", "replace").strip()
+            verbo = comando.split(" ", 1)[0].upper()
+            if verbo == "EHLO":
+                self.wfile.write(b"250-sink.local\r\n250-AUTH PLAIN LOGIN\r\n250-8BITMIME\r\n250 SIZE 52428800\r\n")
+            elif verbo == "HELO":
+                self.responder("250 sink.local")
+            elif verbo == "AUTH":
+                partes = comando.split()
+                if len(partes) == 2 and partes[1].upper() == "LOGIN":
+                    # Usuario y contraseña en dos pasos
+                    self.responder("334 VXNlcm5hbWU6")
+                    self.rfile.readline()
+                    self.responder("334 UGFzc3dvcmQ6")
+                    self.rfile.readline()
+                self.responder("235 2.7.0 Autenticacion correcta")
+            elif verbo in ("MAIL", "RCPT", "RSET"):
+                self.responder("250 2.1.0 OK")
+            elif verbo == "NOOP":
+                self.responder("250 2.0.0 OK")
+            elif verbo == "DATA":
+                self.responder("354 Fin con <CRLF>.<CRLF>")
+                tamano = 0
+                while True:
+                    dato = self.rfile.readline()
+                    if not dato or dato == b".\r\n":
+                        break
+                    tamano += len(dato)
+                self.responder(sink.recibir(tamano))
+            elif verbo == "QUIT":
+                self.responder("221 2.0.0 Adios")
+                return
+            else:
+                self.responder("502 5.5.2 Comando no reconocido")
+
+
+class _Servidor(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class SMTPSink:
+    """
+    Sumidero SMTP local (sin TLS) que corre en un hilo del mismo proceso.
+    :param latencia: segundos de espera por mensaje antes de responder al DATA
+    :param tasa_transitorios: fracción de mensajes rechazados con 451 4.7.1
+    :param tasa_permanentes: fracción de mensajes rechazados con 550 5.1.1
+    :param semilla: semilla del generador de fallos (resultados reproducibles)
+    """
+
+    def __init__(self, latencia=0.0, tasa_transitorios=0.0, tasa_permanentes=0.0, semilla=None,
+                 host="127.0.0.1", port=0):
+        self.latencia = latencia
+        self.tasa_transitorios = tasa_transitorios
+        self.tasa_permanentes = tasa_permanentes
+        self._random = random.Random(semilla)
+        self._lock = threading.Lock()
+        self.recibidos = 0
+        self.bytes_recibidos = 0
+        self.transitorios = 0
+        self.permanentes = 0
+        self._servidor = _Servidor((host, port), _SesionSMTP)
+        self._servidor.sink = self
+        self.host, self.port = self._servidor.server_address[:2]
+        self._hilo = None
+
+    def recibir(self, tamano):
+        """Decide la respuesta al DATA de un mensaje de `tamano` bytes."""
+        if self.latencia:
+            time.sleep(self.latencia)
+        with self._lock:
+            sorteo = self._random.random()
+            if sorteo < self.tasa_transitorios:
+                self.transitorios += 1
+                return "451 4.7.1 Demasiados mensajes, intente mas tarde"
+            if sorteo < self.tasa_transitorios + self.tasa_permanentes:
+                self.permanentes += 1
+                return "550 5.1.1 Buzon inexistente"
+            self.recibidos += 1
+            self.bytes_recibidos += tamano
+        return "250 2.0.0 Mensaje aceptado"
+
+    def conectar(self):
+        """Fábrica de conexiones para SMTPConnectionPool: sesión autenticada contra el sumidero."""
+        server = smtplib.SMTP(self.host, self.port)
+        server.login("benchmark", "benchmark")
+        return server
+
+    def start(self):
+        self._hilo = threading.Thread(target=self._servidor.serve_forever, name="smtp-sink", daemon=True)
+        self._hilo.start()
+        return self
+
+    def stop(self):
+        self._servidor.shutdown()
+        self._servidor.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,8 @@
+import sys
+import multiprocessing
+from .cli import main
+
+if __name__ == "__main__":
+    # Necesario para el pool de procesos de constancias en Windows/ejecutables
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,261 @@
+"""
+Archivo mensual de constancias (CONSTANCIA_ARCHIVO=pdf|zip).
+
+En lugar de un `constancia_<dni>.pdf` por destinatario, todas las constancias del período
+(año y mes, p. ej. 2026-01) se agregan a un solo archivo en `<mes>/constancias/`:
+- pdf: `constancias_<periodo>.pdf`, cada constancia con su boleta ocupa un rango de páginas
+- zip: `constancias_<periodo>.zip`, un miembro `constancia_<dni>.pdf` por destinatario
+Junto al archivo se guarda el índice `constancias_<periodo>.index.json`, que asocia cada DNI y
+cada Message-ID con su rango de páginas o su miembro. Para recuperar la constancia de una
+persona se consulta el índice (ver `buscar_constancia`), sin recorrer la carpeta.
+
+Durante el envío cada constancia se guarda de inmediato en `constancias_<periodo>.parciales/`
+(un PDF por constancia y un registro JSON por línea); al cerrar se incorporan al archivo y al
+índice, y el índice se reemplaza de forma atómica. El ZIP se abre en modo "a": solo se escriben
+las constancias nuevas, sin reescribir el archivo del mes. El PDF no admite agregar páginas sin
+reescribirlo: se arma completo en un temporal que reemplaza al anterior, con un costo que crece
+con el tamaño del archivo del mes (para meses grandes conviene `zip`). Si el proceso se corta,
+las parciales se incorporan en el próximo envío del período. Un archivo dañado (ZIP sin directorio central, PDF truncado) se
+aparta con el sufijo `.danado-<fecha>` y se empieza uno nuevo.
+"""
+import io
+import os
+import json
+import uuid
+import shutil
+import zipfile
+import threading
+import logging
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+FORMATOS_ARCHIVO = ("pdf", "zip")
+REGISTRO_PARCIALES = "parciales.jsonl"
+
+
+def rutas_archivo(carpeta, periodo, formato):
+    """(archivo, índice) del archivo mensual de constancias dentro de `carpeta` (el índice no depende del formato)."""
+    base = os.path.join(carpeta, f"constancias_{periodo}")
+    return f"{base}.{formato}", f"{base}.index.json"
+
+
+def carpeta_parciales(carpeta, periodo):
+    """Carpeta donde se guardan las constancias del período aún no incorporadas al archivo."""
+    return os.path.join(carpeta, f"constancias_{periodo}.parciales")
+
+
+def _leer_indice(ruta_indice):
+    try:
+        with open(ruta_indice, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _leer_parciales(directorio):
+    """Entradas del registro de parciales cuyo PDF existe (una última línea cortada se descarta)."""
+    try:
+        with open(os.path.join(directorio, REGISTRO_PARCIALES), encoding="utf-8") as f:
+            lineas = f.readlines()
+    except FileNotFoundError:
+        return []
+    entradas = []
+    for linea in lineas:
+        try:
+            entrada = json.loads(linea)
+        except ValueError:
+            continue
+        if os.path.exists(os.path.join(directorio, entrada["parte"])):
+            entradas.append(entrada)
+    return entradas
+
+
+def _validar(ruta, formato):
+    """Lanza una excepción si el archivo existente no se puede leer."""
+    if formato == "zip":
+        with zipfile.ZipFile(ruta):
+            return
+    from PyPDF2 import PdfReader
+    len(PdfReader(ruta).pages)
+
+
+class ConstanciaArchive:
+    """
+    Archivo mensual de constancias con índice. Thread-safe: las constancias se agregan
+    desde los hilos que recogen los PDF generados.
+    `agregar` solo escribe la constancia en la carpeta de parciales (sin leer ni combinar PDF);
+    `cerrar` la incorpora al archivo. Si el archivo del período ya existe (envío reanudado),
+    las nuevas constancias se agregan a continuación.
+    :param carpeta: carpeta de constancias del mes
+    :param periodo: período YYYY-MM (parte del nombre del archivo, ver core.journal.periodo_envio)
+    :param formato: "pdf" o "zip"
+    """
+
+    def __init__(self, carpeta, periodo, formato):
+        if formato not in FORMATOS_ARCHIVO:
+            raise ValueError(f"Formato de archivo de constancias no soportado: {formato}")
+        self.carpeta = carpeta
+        self.periodo = periodo
+        self.formato = formato
+        self.ruta, self.ruta_indice = rutas_archivo(carpeta, periodo, formato)
+        self.parciales = carpeta_parciales(carpeta, periodo)
+        self.apartado = None
+        self._lock = threading.Lock()
+        self._registro = None
+        self._abrir()
+
+    def _apartar_danado(self, e):
+        sufijo = f".danado-{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        self.apartado = f"{self.ruta}{sufijo}"
+        os.replace(self.ruta, self.apartado)
+        if os.path.exists(self.ruta_indice):
+            os.replace(self.ruta_indice, f"{self.ruta_indice}{sufijo}")
+        logger.error(f"Archivo de constancias dañado ({str(e)}): se apartó como {self.apartado} y se empieza uno nuevo")
+
+    def _abrir(self):
+        os.makedirs(self.parciales, exist_ok=True)
+        if os.path.exists(self.ruta):
+            try:
+                _validar(self.ruta, self.formato)
+            except Exception as e:
+                self._apartar_danado(e)
+        self._entradas = _leer_parciales(self.parciales)
+        if self._entradas:
+            logger.warning(f"Se recuperan {len(self._entradas)} constancias de un envío interrumpido ({self.parciales})")
+        # Modo "a": las parciales de un envío anterior se conservan
+        self._registro = open(os.path.join(self.parciales, REGISTRO_PARCIALES), "a", encoding="utf-8")
+
+    def agregar(self, dni, message_id, contenido, fecha_envio=None):
+        """
+        Guarda una constancia (PDF ya combinado con la boleta) en las parciales del período.
+        :return: ruta del archivo mensual
+        """
+        with self._lock:
+            parte = f"{dni}_{uuid.uuid4().hex[:12]}.pdf"
+            ruta_parte = os.path.join(self.parciales, parte)
+            with open(f"{ruta_parte}.tmp", "wb") as f:
+                f.write(contenido)
+            os.replace(f"{ruta_parte}.tmp", ruta_parte)
+            entrada = {"dni": dni, "message_id": message_id, "fecha_envio": fecha_envio, "parte": parte}
+            # Una línea por constancia, vaciada a disco: si el proceso se corta queda registrada
+            self._registro.write(json.dumps(entrada, ensure_ascii=False) + "\n")
+            self._registro.flush()
+            self._entradas.append(entrada)
+        return self.ruta
+
+    def _indice_actual(self):
+        indice = _leer_indice(self.ruta_indice) if os.path.exists(self.ruta) else None
+        if indice is not None and indice.get("formato") == self.formato:
+            return indice
+        if os.path.exists(self.ruta_indice):
+            logger.warning(f"El índice {self.ruta_indice} corresponde a otro formato de archivo; se reemplazará")
+        return {"periodo": self.periodo, "formato": self.formato, "archivo": os.path.basename(self.ruta),
+                "constancias": {}, "message_ids": {}}
+
+    def _escribir_zip(self, indice, entradas):
+        # Se agregan solo las constancias nuevas y el directorio central; los PDF ya vienen
+        # comprimidos y se guardan sin volver a comprimir
+        with zipfile.ZipFile(self.ruta, "a", compression=zipfile.ZIP_STORED) as archivo:
+            existentes = set(archivo.namelist())
+            for entrada in entradas:
+                nombre = f"constancia_{entrada['dni']}.pdf"
+                n = 1
+                while nombre in existentes:
+                    n += 1
+                    nombre = f"constancia_{entrada['dni']}_{n}.pdf"
+                existentes.add(nombre)
+                archivo.write(os.path.join(self.parciales, entrada["parte"]), nombre)
+                indice["constancias"][entrada["dni"]]["miembro"] = nombre
+
+    def _escribir_pdf(self, temporal, indice, entradas):
+        from PyPDF2 import PdfReader, PdfWriter
+        writer = PdfWriter()
+        if os.path.exists(self.ruta):
+            writer.append(self.ruta)
+        paginas = len(writer.pages)
+        for entrada in entradas:
+            nuevas = PdfReader(os.path.join(self.parciales, entrada["parte"])).pages
+            for pagina in nuevas:
+                writer.add_page(pagina)
+            indice["constancias"][entrada["dni"]]["paginas"] = [paginas + 1, paginas + len(nuevas)]
+            paginas += len(nuevas)
+        with open(temporal, "wb") as f:
+            writer.write(f)
+
+    def cerrar(self):
+        """
+        Incorpora las parciales al archivo (ZIP: se agregan al final; PDF: se reescribe en un
+        temporal) y al índice, que se reemplaza de forma atómica, y borra las parciales. Si falla,
+        las parciales se conservan para el próximo envío.
+        """
+        with self._lock:
+            self._registro.close()
+            entradas = self._entradas
+            if not entradas:
+                shutil.rmtree(self.parciales, ignore_errors=True)
+                return self.ruta
+            indice = self._indice_actual()
+            for entrada in entradas:
+                indice["constancias"][entrada["dni"]] = {
+                    "message_id": entrada["message_id"], "fecha_envio": entrada["fecha_envio"]
+                }
+                if entrada["message_id"]:
+                    indice["message_ids"][entrada["message_id"]] = entrada["dni"]
+            if self.formato == "zip":
+                self._escribir_zip(indice, entradas)
+            else:
+                temporal = f"{self.ruta}.tmp"
+                if os.path.exists(temporal):
+                    os.remove(temporal)
+                self._escribir_pdf(temporal, indice, entradas)
+                os.replace(temporal, self.ruta)
+            # Se escribe a un temporal y se reemplaza para no dejar un índice a medias
+            with open(f"{self.ruta_indice}.tmp", "w", encoding="utf-8") as f:
+                json.dump(indice, f, ensure_ascii=False, indent=1)
+            os.replace(f"{self.ruta_indice}.tmp", self.ruta_indice)
+            shutil.rmtree(self.parciales, ignore_errors=True)
+        logger.info(f"Archivo de constancias guardado en {self.ruta} ({len(indice['constancias'])} constancias)")
+        return self.ruta
+
+
+def buscar_constancia(carpeta, periodo, dni=None, message_id=None):
+    """
+    Recupera la constancia de un destinatario desde el archivo mensual usando el índice
+    (o desde las parciales, si el envío que la generó no llegó a cerrar el archivo).
+    :param carpeta: carpeta de constancias del mes
+    :param periodo: período YYYY-MM del envío
+    :param dni: DNI del destinatario (o bien `message_id`)
+    :param message_id: Message-ID del correo enviado
+    :return: contenido del PDF de la constancia (bytes) o None si no figura en el índice
+    """
+    if dni is None and message_id is None:
+        return None
+    parciales = carpeta_parciales(carpeta, periodo)
+    for entrada in reversed(_leer_parciales(parciales)):
+        if (dni is not None and entrada["dni"] == dni) or (dni is None and entrada["message_id"] == message_id):
+            with open(os.path.join(parciales, entrada["parte"]), "rb") as f:
+                return f.read()
+    _, ruta_indice = rutas_archivo(carpeta, periodo, FORMATOS_ARCHIVO[0])
+    indice = _leer_indice(ruta_indice)
+    if indice is None:
+        return None
+    if dni is None and message_id is not None:
+        dni = indice["message_ids"].get(message_id)
+    entrada = indice["constancias"].get(dni) if dni is not None else None
+    if entrada is None:
+        return None
+    ruta = os.path.join(carpeta, indice["archivo"])
+    if indice["formato"] == "zip":
+        with zipfile.ZipFile(ruta) as archivo:
+            return archivo.read(entrada["miembro"])
+    from PyPDF2 import PdfReader, PdfWriter
+    # PdfReader carga las páginas bajo demanda: solo se leen las del rango indexado
+    lector = PdfReader(ruta)
+    writer = PdfWriter()
+    inicio, fin = entrada["paginas"]
+    for n in range(inicio - 1, fin):
+        writer.add_page(lector.pages[n])
+    salida = io.BytesIO()
+    writer.write(salida)
+    return salida.getvalue()
@@ -0,0 +1,192 @@
+"""
+Caché en disco de adjuntos ya codificados en base64, compartido entre envíos.
+
+Al reenviar un mes (correcciones, rebotes) cada boleta se volvería a leer desde la carpeta
+compartida y a codificar. El caché guarda la parte MIME ya codificada, direccionada por el
+SHA-256 del PDF, y un índice SQLite ruta + tamaño + fecha de modificación -> SHA-256:
+- acierto: la boleta no cambió (mismo tamaño y fecha) y su contenido está en el caché, no se
+  lee el PDF de la red ni se codifica
+- acierto por contenido: la ruta es nueva pero el mismo PDF ya estaba (p. ej. carpeta copiada),
+  se lee el PDF para calcular el SHA-256 pero no se codifica
+- fallo: se lee, se codifica y se guarda
+Cuando el caché supera su tamaño máximo se eliminan los contenidos usados hace más tiempo (LRU).
+"""
+import os
+import time
+import base64
+import hashlib
+import sqlite3
+import threading
+import logging
+from .config import ATTACHMENT_CACHE_DIR, ATTACHMENT_CACHE_MAX_MB
+from .message_builder import codificar_base64
+
+logger = logging.getLogger(__name__)
+
+INDICE_CACHE = "indice.sqlite3"
+
+
+class AttachmentCache:
+    """
+    Caché de adjuntos codificados (thread-safe).
+    :param directorio: carpeta del caché (se crea si no existe)
+    :param max_bytes: tamaño máximo total de los adjuntos codificados guardados
+    """
+
+    def __init__(self, directorio=None, max_bytes=None):
+        self.directorio = directorio or ATTACHMENT_CACHE_DIR
+        self.max_bytes = ATTACHMENT_CACHE_MAX_MB * 1024 * 1024 if max_bytes is None else max_bytes
+        os.makedirs(self.directorio, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            os.path.join(self.directorio, INDICE_CACHE), check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS archivos (
+                ruta TEXT PRIMARY KEY,
+                tamano INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                sha256 TEXT NOT NULL
+            )"""
+        )
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS contenidos (
+                sha256 TEXT PRIMARY KEY,
+                tamano INTEGER NOT NULL,
+                ultimo_uso REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS contenidos_uso ON contenidos (ultimo_uso)")
+        (self.total_bytes,) = self._conn.execute("SELECT COALESCE(SUM(tamano), 0) FROM contenidos").fetchone()
+        self.aciertos = 0
+        self.aciertos_contenido = 0
+        self.fallos = 0
+        self.desalojados = 0
+
+    def _ruta_contenido(self, sha256):
+        return os.path.join(self.directorio, sha256[:2], f"{sha256}.b64")
+
+    def _leer_contenido(self, sha256):
+        try:
+            with open(self._ruta_contenido(sha256), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _guardar_contenido(self, sha256, codificado):
+        ruta = self._ruta_contenido(sha256)
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        # Temporal + reemplazo: otro hilo nunca lee un contenido a medio escribir
+        temporal = f"{ruta}.{threading.get_ident()}.tmp"
+        with open(temporal, "wb") as f:
+            f.write(codificado)
+        os.replace(temporal, ruta)
+
+    def _usar(self, sha256):
+        with self._lock:
+            self._conn.execute("UPDATE contenidos SET ultimo_uso = ? WHERE sha256 = ?", (time.time(), sha256))
+
+    def obtener(self, path, tamano=None, mtime=None):
+        """
+        Devuelve (adjunto_base64, pdf_bytes) de un PDF, usando el caché cuando es posible.
+        `pdf_bytes` se reconstruye desde el base64 en un acierto (no se lee la red).
+        :param tamano: tamaño del archivo ya conocido (p. ej. del índice de boletas); si falta se consulta
+        :param mtime: fecha de modificación ya conocida (st_mtime)
+        """
+        if tamano is None or mtime is None:
+            stat = os.stat(path)
+            tamano, mtime = stat.st_size, stat.st_mtime
+        with self._lock:
+            fila = self._conn.execute(
+                "SELECT sha256 FROM archivos WHERE ruta = ? AND tamano = ? AND mtime = ?", (path, tamano, mtime)
+            ).fetchone()
+        if fila is not None:
+            codificado = self._leer_contenido(fila[0])
+            if codificado is not None:
+                self._usar(fila[0])
+                with self._lock:
+                    self.aciertos += 1
+                return codificado, base64.b64decode(codificado)
+
+        with open(path, "rb") as f:
+            pdf_bytes = f.read()
+        sha256 = hashlib.sha256(pdf_bytes).hexdigest()
+        codificado = self._leer_contenido(sha256)
+        if codificado is not None:
+            self._usar(sha256)
+            with self._lock:
+                self.aciertos_contenido += 1
+        else:
+            codificado = codificar_base64(pdf_bytes)
+            with self._lock:
+                self.fallos += 1
+            if len(codificado) <= self.max_bytes:
+                self._guardar_contenido(sha256, codificado)
+                with self._lock:
+                    previo = self._conn.execute(
+                        "SELECT tamano FROM contenidos WHERE sha256 = ?", (sha256,)
+                    ).fetchone()
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO contenidos (sha256, tamano, ultimo_uso) VALUES (?, ?, ?)",
+                        (sha256, len(codificado), time.time()),
+                    )
+                    self.total_bytes += len(codificado) - (previo[0] if previo else 0)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO archivos (ruta, tamano, mtime, sha256) VALUES (?, ?, ?, ?)",
+                (path, tamano, mtime, sha256),
+            )
+        self._desalojar()
+        return codificado, pdf_bytes
+
+    def _desalojar(self):
+        """Elimina los contenidos menos usados hasta volver al tamaño máximo."""
+        with self._lock:
+            if self.total_bytes <= self.max_bytes:
+                return
+            victimas = []
+            exceso = self.total_bytes - self.max_bytes
+            filas = self._conn.execute("SELECT sha256, tamano FROM contenidos ORDER BY ultimo_uso").fetchall()
+            for sha256, tamano in filas:
+                if exceso <= 0:
+                    break
+                victimas.append(sha256)
+                exceso -= tamano
+                self.total_bytes -= tamano
+            self._conn.executemany("DELETE FROM contenidos WHERE sha256 = ?", [(v,) for v in victimas])
+            self._conn.executemany("DELETE FROM archivos WHERE sha256 = ?", [(v,) for v in victimas])
+            self.desalojados += len(victimas)
+        for sha256 in victimas:
+            try:
+                os.remove(self._ruta_contenido(sha256))
+            except OSError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            consultas = self.aciertos + self.aciertos_contenido + self.fallos
+            return {
+                "aciertos": self.aciertos,
+                "aciertos_contenido": self.aciertos_contenido,
+                "fallos": self.fallos,
+                "desalojados": self.desalojados,
+                "tasa_aciertos": (self.aciertos + self.aciertos_contenido) / consultas if consultas else 0.0,
+                "bytes": self.total_bytes,
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def crear_cache_adjuntos():
+    """Caché de adjuntos según la configuración, o None si ATTACHMENT_CACHE_DIR está vacío."""
+    if not ATTACHMENT_CACHE_DIR:
+        return None
+    try:
+        return AttachmentCache()
+    except (OSError, sqlite3.Error) as e:
+        logger.warning(f"No se pudo abrir el caché de adjuntos en {ATTACHMENT_CACHE_DIR}: {str(e)}")
+        return None
@@ -0,0 +1,64 @@
+import os
+import logging
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+BoletaInfo = namedtuple("BoletaInfo", ["path", "size", "mtime"])
+
+
+class BoletasIndex:
+    """
+    Índice DNI -> (ruta, tamaño, fecha) de las boletas de un mes.
+    La carpeta se recorre una sola vez con os.scandir, en lugar de consultar
+    os.path.exists por cada destinatario (cada consulta es un viaje de red en SMB).
+    :param path_boletas: directorio raíz de boletas
+    :param mes: subcarpeta del mes
+    """
+
+    def __init__(self, path_boletas, mes):
+        self.directorio = os.path.join(path_boletas, mes)
+        self.por_dni = {}
+        self.existe = os.path.isdir(self.directorio)
+        if self.existe:
+            self._escanear()
+
+    def _escanear(self):
+        with os.scandir(self.directorio) as entradas:
+            for entrada in entradas:
+                nombre, extension = os.path.splitext(entrada.name)
+                if extension.lower() != ".pdf" or not entrada.is_file():
+                    continue
+                stat = entrada.stat()
+                self.por_dni[nombre] = BoletaInfo(entrada.path, stat.st_size, stat.st_mtime)
+        logger.info(f"Índice de boletas: {len(self.por_dni)} PDF en {self.directorio}")
+
+    def __len__(self):
+        return len(self.por_dni)
+
+    def __contains__(self, dni):
+        return dni in self.por_dni
+
+    def get(self, dni):
+        return self.por_dni.get(dni)
+
+    def huerfanos(self, dnis_con_destinatario):
+        """PDF del mes que no corresponden a ningún destinatario."""
+        return sorted(set(self.por_dni) - set(dnis_con_destinatario))
+
+
+def reporte_preflight(recipients, indice):
+    """
+    Cruza los destinatarios con el índice antes de abrir cualquier conexión SMTP.
+    :return: dict con total, faltantes [(fila, nombre, dni)] y huerfanos [dni]
+    """
+    faltantes = []
+    dnis = set()
+    total = 0
+    for n, recipient in enumerate(recipients, start=1):
+        total += 1
+        dni = str(recipient["dni"]).strip().zfill(8)
+        dnis.add(dni)
+        if dni not in indice:
+            faltantes.append((recipient.get("fila", n + 1), recipient["nombre"], dni))
+    return {"total": total, "faltantes": faltantes, "huerfanos": indice.huerfanos(dnis)}
@@ -0,0 +1,128 @@
+"""
+Envío de boletas desde la línea de comandos (sin interfaz gráfica).
+
+Ejemplo:
+    python -m core destinatarios.xlsx --mes Junio --anio 2026 --ruta C:/BoletasCSR --workers 4 --rate 3
+    python -m core destinatarios.xlsx --mes Junio --simular
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+from .config import DEFAULT_PATH, SMTP_WORKERS, SMTP_RATE_PER_SECOND, SMTP_ACCOUNTS_FILE
+
+
+def crear_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m core",
+        description="Envía las boletas de pago por correo sin abrir la interfaz gráfica.",
+    )
+    parser.add_argument("excel", help="archivo de destinatarios (.xlsx o .csv) con columnas nombre, email, dni")
+    parser.add_argument("--mes", required=True, help="mes a procesar (nombre de la carpeta de boletas, p. ej. Junio)")
+    parser.add_argument("--anio", type=int, default=None,
+                        help="año del período (por defecto el actual; un mes posterior al actual es del año pasado)")
+    parser.add_argument("--ruta", default=DEFAULT_PATH, help=f"directorio raíz de boletas (por defecto {DEFAULT_PATH})")
+    parser.add_argument("--workers", type=int, default=SMTP_WORKERS,
+                        help=f"conexiones SMTP simultáneas (por defecto {SMTP_WORKERS})")
+    parser.add_argument("--rate", type=float, default=None,
+                        help=f"límite de correos por segundo (por defecto {SMTP_RATE_PER_SECOND}); con varias "
+                             f"cuentas en {SMTP_ACCOUNTS_FILE}, tope global sobre la suma de sus tasas")
+    parser.add_argument("--no-reanudar", action="store_true",
+                        help="reenviar también a quienes ya figuran como enviados en el período")
+    parser.add_argument("--simular", action="store_true",
+                        help="validar y armar todos los correos sin enviarlos; muestra el tiempo estimado de envío")
+    parser.add_argument("-v", "--verbose", action="store_true", help="mostrar el log detallado")
+    return parser
+
+
+def _progreso(evento):
+    if evento.mensaje:
+        print(evento.mensaje, flush=True)
+
+
+def _simular(pipeline, recipients, args, sender):
+    from .recipients import RecipientSourceError
+    from .dry_run import formatear_reporte
+    try:
+        reporte = pipeline.simular(recipients, args.mes, args.ruta, anio=args.anio)
+    except RecipientSourceError as e:
+        print(f"❌ Error: {str(e)}", file=sys.stderr)
+        return 2
+    finally:
+        sender.close()
+    print(formatear_reporte(reporte))
+    return 0 if reporte.listo_para_enviar else 1
+
+
+def main(argv=None):
+    args = crear_parser().parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+
+    from .recipients import RecipientSource, RecipientSourceError
+    from .email_sender import EmailSender
+    from .relays import RelayConfigError
+
+    try:
+        recipients = RecipientSource(args.excel)
+    except RecipientSourceError as e:
+        print(f"❌ Error: {str(e)}", file=sys.stderr)
+        return 2
+    if not os.path.isdir(args.ruta):
+        print(f"❌ Error: el directorio de boletas no existe: {args.ruta}", file=sys.stderr)
+        return 2
+
+    try:
+        sender = EmailSender()
+    except RelayConfigError as e:
+        print(f"❌ Error en {SMTP_ACCOUNTS_FILE}: {str(e)}", file=sys.stderr)
+        return 2
+    if sender.relays and args.rate:
+        suma = sum(relay.tasa for relay in sender.relays.relays)
+        print(f"🚦 Con {len(sender.relays.relays)} cuentas SMTP, --rate {args.rate:g} se aplica como tope global "
+              f"sobre la suma de sus tasas ({suma:g} correos/s)")
+    pipeline = sender.crear_pipeline(workers=args.workers, rate=args.rate, reanudar=not args.no_reanudar)
+    pipeline.subscribe(_progreso)
+    if args.simular:
+        return _simular(pipeline, recipients, args, sender)
+    inicio = time.time()
+    try:
+        resultado = pipeline.run(recipients, args.mes, args.ruta, anio=args.anio)
+    except RecipientSourceError as e:
+        print(f"❌ Error: {str(e)}", file=sys.stderr)
+        return 2
+    finally:
+        sender.close()
+    elapsed = int(time.time() - inicio)
+
+    print(f"📅 Período: {resultado.periodo}")
+    print(f"📊 Total procesados: {resultado.procesados}")
+    print(f"✅ Enviados correctamente: {resultado.enviados}")
+    if resultado.omitidos:
+        print(f"⏭️ Omitidos (ya enviados en {resultado.periodo}): {resultado.omitidos}")
+    print(f"❌ Errores encontrados: {resultado.total_errores}")
+    print(f"⏱️ Tiempo: {elapsed}s")
+    if "tasa" in resultado.control_tasa:
+        print(f"🚦 Tasa final: {resultado.control_tasa['tasa']:.2f} correos/s "
+              f"({resultado.control_tasa['reintentos']} reintentos por límite del servidor)")
+    cache = resultado.cache_adjuntos
+    if cache.get("aciertos", 0) + cache.get("aciertos_contenido", 0) + cache.get("fallos", 0):
+        print(f"🗂️ Caché de adjuntos: {cache['tasa_aciertos']:.0%} aciertos "
+              f"({cache['aciertos']} sin leer la boleta, {cache['aciertos_contenido']} por contenido, "
+              f"{cache['fallos']} codificados)")
+    for nombre, relay in resultado.relays.items():
+        texto = (f"📮 {nombre}: {relay['enviados']} enviados ({relay['correos_por_segundo']:.2f} correos/s), "
+                 f"{relay['rechazos']} rechazos, {relay['failovers']} failovers")
+        if relay["cuota_restante"] is not None:
+            texto += f", cuota restante hoy {relay['cuota_restante']}"
+        if relay["desactivado"]:
+            texto += f" - desactivado: {relay['desactivado']}"
+        print(texto)
+    if resultado.error_file:
+        print(f"📄 Ver detalles en: {resultado.error_file}")
+    if resultado.metrics_file:
+        print(f"📈 Métricas por etapa: {resultado.metrics_file}")
+    return 1 if resultado.total_errores else 0
@@ -10,6 +10,48 @@ EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")
 DEFAULT_PATH = "C:/BoletasCSR"
 EMAIL_CONFIG_FILE = "email_config.txt"
 
+# Envío concurrente: conexiones simultáneas y límite de tasa compartido
+SMTP_WORKERS = int(os.getenv("SMTP_WORKERS", 4))
+SMTP_RATE_PER_SECOND = float(os.getenv("SMTP_RATE_PER_SECOND", 2))
+SMTP_RATE_BURST = int(os.getenv("SMTP_RATE_BURST", 0))
+SMTP_MESSAGES_PER_CONNECTION = int(os.getenv("SMTP_MESSAGES_PER_CONNECTION", 0))
+SMTP_POOL_IDLE_CHECK = float(os.getenv("SMTP_POOL_IDLE_CHECK", 10))
+SMTP_CONNECT_RETRIES = int(os.getenv("SMTP_CONNECT_RETRIES", 3))
+
+# Control adaptativo de tasa: sube mientras el servidor acepta y retrocede ante 421/451/4.7.x
+SMTP_RATE_ADAPTIVE = os.getenv("SMTP_RATE_ADAPTIVE", "1") != "0"
+SMTP_RATE_MIN_PER_SECOND = float(os.getenv("SMTP_RATE_MIN_PER_SECOND", 0.2))
+SMTP_RATE_MAX_PER_SECOND = float(os.getenv("SMTP_RATE_MAX_PER_SECOND", 0))
+SMTP_RATE_WINDOW = int(os.getenv("SMTP_RATE_WINDOW", 20))
+SMTP_TRANSIENT_RETRIES = int(os.getenv("SMTP_TRANSIENT_RETRIES", 5))
+SMTP_BACKOFF_BASE = float(os.getenv("SMTP_BACKOFF_BASE", 2))
+SMTP_BACKOFF_MAX = float(os.getenv("SMTP_BACKOFF_MAX", 120))
+
+# Varias cuentas o relays SMTP con su propia tasa y cuota diaria (JSON; si no existe se usa SMTP_SERVER/EMAIL_USER)
+SMTP_ACCOUNTS_FILE = os.getenv("SMTP_ACCOUNTS_FILE", "smtp_cuentas.json")
+
+# Procesos para generar constancias PDF en paralelo (0 = en el mismo hilo de envío)
+CONSTANCIA_WORKERS = int(os.getenv("CONSTANCIA_WORKERS", max(1, (os.cpu_count() or 2) - 1)))
+
+# Archivo mensual de constancias: "pdf" o "zip" con índice (vacío = un PDF por destinatario)
+CONSTANCIA_ARCHIVO = os.getenv("CONSTANCIA_ARCHIVO", "").strip().lower()
+
+# Caché en disco de adjuntos ya codificados, reutilizado entre envíos. Guarda copias sin cifrar de
+# las boletas: se activa solo indicando una carpeta protegida (vacío = sin caché)
+ATTACHMENT_CACHE_DIR = os.getenv("ATTACHMENT_CACHE_DIR", "")
+ATTACHMENT_CACHE_MAX_MB = float(os.getenv("ATTACHMENT_CACHE_MAX_MB", 512))
+
+# Adjuntos leídos y codificados por adelantado mientras se envía (0 = leer cada uno al enviarlo);
+# PREFETCH_MAX_MB acota todos los adjuntos en memoria, también los que se están enviando
+PREFETCH_ADJUNTOS = int(os.getenv("PREFETCH_ADJUNTOS", 8))
+PREFETCH_MAX_MB = float(os.getenv("PREFETCH_MAX_MB", 64))
+
+# Registro persistente de envíos (permite reanudar un envío interrumpido)
+SEND_JOURNAL_FILE = os.getenv("SEND_JOURNAL_FILE", "envios.sqlite3")
+
+# Métricas por etapa de cada envío (.json, o formato Prometheus si termina en .prom; vacío = no guardar)
+METRICS_FILE = os.getenv("METRICS_FILE", "metricas_envio.json")
+
 
 def load_email_templates():
     subject = "Boleta del mes de {MES}"
@@ -0,0 +1,343 @@
+import io
+import os
+import re
+import time
+import textwrap
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from .config import EMAIL_USER, CONSTANCIA_WORKERS, CONSTANCIA_ARCHIVO
+from .archive import ConstanciaArchive, FORMATOS_ARCHIVO
+
+logger = logging.getLogger(__name__)
+
+
+LOGO_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'img', 'logocsr.png')
+TITULO = "CONSTANCIA DE ENVÍO DE CORREO ELECTRÓNICO"
+PIE = "Este documento certifica que el correo fue enviado exitosamente desde la aplicación."
+
+_RE_PARRAFO = re.compile(r'<p[^>]*>', flags=re.IGNORECASE)
+_RE_ETIQUETA = re.compile('<[^<]+?>')
+
+
+def html_a_texto(cuerpo):
+    """Convierte el cuerpo HTML en texto plano respetando saltos de párrafo."""
+    # Reemplazar etiquetas <br> y <p> por saltos de línea reales
+    cuerpo_html = cuerpo.replace('<br>', '\n').replace('<br/>', '\n').replace('<br />', '\n')
+    cuerpo_html = _RE_PARRAFO.sub('\n', cuerpo_html)
+    cuerpo_html = cuerpo_html.replace('</p>', '\n')
+    # Eliminar el resto de etiquetas HTML
+    return _RE_ETIQUETA.sub('', cuerpo_html)
+
+
+class ConstanciaRenderer:
+    """
+    Dibuja constancias reutilizando una página base (logo y título) generada una sola vez.
+    El logo se decodifica y comprime una vez por proceso; en cada constancia solo se
+    dibujan los datos del destinatario y se superponen sobre la página base ya cacheada.
+    :param logo_path: ruta al logo (si no existe, la página base lleva solo el título)
+    """
+
+    def __init__(self, logo_path=LOGO_PATH):
+        from reportlab.lib.pagesizes import letter
+        self.logo_path = logo_path
+        self.pagesize = letter
+        self._pagina_base = None
+        self._y_inicio = None
+
+    def _construir_base(self):
+        from reportlab.pdfgen import canvas
+        from reportlab.lib.utils import ImageReader
+        from PyPDF2 import PdfReader
+        width, height = self.pagesize
+        buffer = io.BytesIO()
+        c = canvas.Canvas(buffer, pagesize=self.pagesize)
+        # Añadir logo
+        if os.path.exists(self.logo_path):
+            logo_img = ImageReader(self.logo_path)
+            logo_width = 60
+            logo_height = 60
+            c.drawImage(logo_img, width/2-logo_width/2, height-80, width=logo_width, height=logo_height, mask='auto')
+            y = height - 100
+        else:
+            y = height - 40
+        c.setFont("Helvetica-Bold", 16)
+        c.drawCentredString(width/2, y, TITULO)
+        c.save()
+        buffer.seek(0)
+        self._pagina_base = PdfReader(buffer).pages[0]
+        self._y_inicio = y - 30
+
+    def render(self, remitente, destinatario, asunto, cuerpo, fecha_envio, adjunto_nombre, message_id=None):
+        """
+        Genera la página de constancia y devuelve el PDF en bytes.
+        :param adjunto_nombre: nombre del archivo adjunto mostrado en la constancia
+        """
+        salida = io.BytesIO()
+        self.render_writer(
+            remitente, destinatario, asunto, cuerpo, fecha_envio, adjunto_nombre, message_id=message_id
+        ).write(salida)
+        return salida.getvalue()
+
+    def render_writer(self, remitente, destinatario, asunto, cuerpo, fecha_envio, adjunto_nombre, message_id=None):
+        """Como render(), pero devuelve el PdfWriter en memoria para seguir añadiendo páginas."""
+        from reportlab.pdfgen import canvas
+        from PyPDF2 import PdfReader, PdfWriter
+        if self._pagina_base is None:
+            self._construir_base()
+        width, height = self.pagesize
+        buffer = io.BytesIO()
+        c = canvas.Canvas(buffer, pagesize=self.pagesize)
+        y = self._y_inicio
+        c.setFont("Helvetica", 10)
+        c.drawString(40, y, f"Fecha/hora de envío: {fecha_envio}")
+        y -= 18
+        if message_id:
+            c.setFont("Helvetica", 9)
+            c.drawString(40, y, f"Message-ID: {message_id}")
+            y -= 18
+        c.setFont("Helvetica", 10)
+        c.line(40, y, width-40, y)
+        y -= 25
+        # Mostrar correctamente el remitente (nombre y correo)
+        c.drawString(40, y, f"De: {remitente[0]} <{remitente[1] if remitente[1] else EMAIL_USER}>")
+        y -= 18
+        c.drawString(40, y, f"Para: {destinatario[0]} <{destinatario[1]}>")
+        y -= 18
+        c.drawString(40, y, f"Asunto: {asunto}")
+        y -= 18
+        c.drawString(40, y, f"Adjunto: {adjunto_nombre}")
+        y -= 25
+        c.setFont("Helvetica-Bold", 11)
+        c.drawString(40, y, "Mensaje:")
+        y -= 18
+        c.setFont("Helvetica", 10)
+        # Imprimir cuerpo del mensaje respetando saltos de párrafo del HTML
+        max_width = 90  # caracteres por línea
+        for line in html_a_texto(cuerpo).splitlines():
+            if not line.strip():
+                y -= 10  # Espacio extra para líneas vacías (párrafos)
+                continue
+            wrapped_lines = textwrap.wrap(line.strip(), width=max_width, break_long_words=False, replace_whitespace=False)
+            for wrapped in wrapped_lines:
+                if y < 60:
+                    c.showPage(); y = height - 40; c.setFont("Helvetica", 10)
+                c.drawString(50, y, wrapped)
+                y -= 15
+            if wrapped_lines:
+                y -= 5  # Espacio extra entre párrafos
+        y -= 10
+        c.setFont("Helvetica-Oblique", 9)
+        c.drawString(40, y, PIE)
+        c.save()
+        # Superponer la página base (logo y título) sobre la primera página
+        buffer.seek(0)
+        writer = PdfWriter()
+        for n, page in enumerate(PdfReader(buffer).pages):
+            if n == 0:
+                page.merge_page(self._pagina_base)
+            writer.add_page(page)
+        return writer
+
+
+_renderer = None
+
+
+def obtener_renderer():
+    """Renderer compartido por proceso (cada worker del pool construye su página base una vez)."""
+    global _renderer
+    if _renderer is None:
+        _renderer = ConstanciaRenderer()
+    return _renderer
+
+
+def generar_constancia_pdf(remitente, destinatario, asunto, cuerpo, fecha_envio, adjunto_path, message_id=None,
+                           adjunto_bytes=None):
+    """
+    Genera la constancia combinada con el PDF adjunto y la devuelve en bytes, sin escribir a disco.
+    Recibe los mismos parámetros que generar_constancia_envio().
+    """
+    from PyPDF2 import PdfReader
+    if adjunto_bytes is None:
+        with open(adjunto_path, "rb") as f:
+            adjunto_bytes = f.read()
+    writer = obtener_renderer().render_writer(
+        remitente, destinatario, asunto, cuerpo, fecha_envio,
+        os.path.basename(adjunto_path), message_id=message_id
+    )
+    # Combinar constancia y PDF adjunto
+    for page in PdfReader(io.BytesIO(adjunto_bytes)).pages:
+        writer.add_page(page)
+    salida = io.BytesIO()
+    writer.write(salida)
+    return salida.getvalue()
+
+
+def generar_constancia_envio(remitente, destinatario, asunto, cuerpo, fecha_envio, adjunto_path, message_id=None,
+                             adjunto_bytes=None):
+    """
+    Genera un PDF de constancia de envío exitoso y lo combina con el PDF adjunto enviado.
+    Todo se arma en memoria; la única escritura a disco es el PDF combinado final.
+    :param remitente: (nombre, email)
+    :param destinatario: (nombre, email)
+    :param asunto: str
+    :param cuerpo: str (puede ser HTML)
+    :param fecha_envio: str (YYYY-MM-DD HH:MM:SS)
+    :param adjunto_path: ruta al PDF adjunto enviado
+    :param message_id: Message-ID del correo (opcional)
+    :param adjunto_bytes: contenido del PDF adjunto ya leído para el correo (evita releerlo)
+    :return: ruta al PDF combinado generado
+    """
+    contenido = generar_constancia_pdf(
+        remitente, destinatario, asunto, cuerpo, fecha_envio, adjunto_path,
+        message_id=message_id, adjunto_bytes=adjunto_bytes
+    )
+    output_dir = carpeta_constancias(adjunto_path)
+    os.makedirs(output_dir, exist_ok=True)
+    output_pdf_path = os.path.join(output_dir, f"constancia_{os.path.splitext(os.path.basename(adjunto_path))[0]}.pdf")
+    with open(output_pdf_path, "wb") as f:
+        f.write(contenido)
+    return output_pdf_path
+
+
+def carpeta_constancias(adjunto_path):
+    """Carpeta de constancias del mes de una boleta (<mes>/constancias)."""
+    return os.path.join(os.path.dirname(adjunto_path), "constancias")
+
+
+def _trabajo_constancia(kwargs):
+    inicio = time.perf_counter()
+    ruta = generar_constancia_envio(**kwargs)
+    return ruta, time.perf_counter() - inicio
+
+
+def _trabajo_constancia_archivo(kwargs):
+    inicio = time.perf_counter()
+    contenido = generar_constancia_pdf(**kwargs)
+    return contenido, time.perf_counter() - inicio
+
+
+# Trabajos de constancia en curso por proceso del pool (los que se generan más los que esperan)
+EN_VUELO_POR_PROCESO = 2
+
+
+class ConstanciaStage:
+    """
+    Etapa de generación de constancias fuera del envío SMTP.
+    Los hilos de envío encolan un trabajo por cada correo enviado y un pool de procesos
+    genera los PDF en paralelo; cada resultado se registra desde el hilo del pool al terminar,
+    fuera de los callbacks del despachador. `drain()` espera a que se vacíe la cola.
+    Los trabajos en curso se acotan a EN_VUELO_POR_PROCESO por proceso (cada uno lleva la boleta y
+    el cuerpo del correo): si los PDF van más lento que el envío, `submit` espera y frena a los hilos
+    de envío en lugar de acumular el mes completo en memoria.
+    Con `archivo` ("pdf" o "zip") las constancias no se escriben una por una: los procesos
+    devuelven el PDF en bytes y se agregan al archivo mensual con índice (ver core.archive).
+    :param workers: procesos para generar PDF (0 = generar en el hilo que encola)
+    :param archivo: formato del archivo mensual (por defecto CONSTANCIA_ARCHIVO; "" = un PDF por destinatario)
+    :param carpeta: carpeta de constancias del mes; con `archivo`, el archivo se abre al crear la etapa
+    :param periodo: período YYYY-MM del envío, nombre del archivo mensual (por defecto la carpeta del mes)
+    """
+
+    def __init__(self, workers=None, archivo=None, carpeta=None, periodo=None):
+        self.workers = CONSTANCIA_WORKERS if workers is None else workers
+        self.formato_archivo = CONSTANCIA_ARCHIVO if archivo is None else archivo
+        if self.formato_archivo and self.formato_archivo not in FORMATOS_ARCHIVO:
+            raise ValueError(f"CONSTANCIA_ARCHIVO debe ser 'pdf' o 'zip' (recibido: {self.formato_archivo!r})")
+        self.periodo = periodo
+        self._lock = threading.Lock()
+        self.archivo = None
+        self._archivadas = []
+        self.generadas = []
+        self.errores = []
+        self.tiempo_pdf = 0.0
+        self.tiempo_espera = 0.0
+        # Segundos de render de cada constancia (para el histograma de métricas)
+        self.duraciones = []
+        if self.formato_archivo and carpeta is not None:
+            # Se abre antes del envío: un archivo dañado o inaccesible no afecta a los correos
+            self._abrir_archivo(carpeta, periodo or os.path.basename(os.path.dirname(carpeta)))
+        self._executor = ProcessPoolExecutor(max_workers=self.workers) if self.workers > 0 else None
+        self._en_vuelo = threading.BoundedSemaphore(self.workers * EN_VUELO_POR_PROCESO) if self.workers > 0 else None
+        self.esperas_submit = 0
+
+    def _abrir_archivo(self, carpeta, periodo):
+        try:
+            self.archivo = ConstanciaArchive(carpeta, periodo, self.formato_archivo)
+        except Exception as e:
+            logger.error(f"No se pudo abrir el archivo de constancias en {carpeta}: {str(e)}; "
+                         f"se guardará un PDF por destinatario")
+            self.formato_archivo = ""
+
+    def _registrar(self, contexto, trabajo):
+        """Guarda el resultado de un trabajo: `trabajo` es un future o una función que lo calcula."""
+        dni, message_id, fecha_envio = contexto[1]
+        try:
+            resultado, segundos = trabajo.result() if hasattr(trabajo, "result") else trabajo()
+            if isinstance(resultado, bytes):
+                resultado = self.archivo.agregar(dni, message_id, resultado, fecha_envio)
+                with self._lock:
+                    self._archivadas.append(contexto[0])
+        except Exception as e:
+            logger.error(f"Error al generar constancia: {str(e)}")
+            with self._lock:
+                self.errores.append((contexto[0], e))
+            return
+        with self._lock:
+            self.generadas.append(resultado)
+            self.tiempo_pdf += segundos
+            self.duraciones.append(segundos)
+
+    def submit(self, contexto, **kwargs):
+        """
+        Encola la constancia de un correo enviado.
+        :param contexto: dato devuelto junto al error si la constancia falla (p. ej. la fila)
+        """
+        if self.formato_archivo and self.archivo is None:
+            # Sin carpeta al crear la etapa: el archivo se abre con la carpeta de la primera boleta
+            with self._lock:
+                if self.archivo is None:
+                    self._abrir_archivo(carpeta_constancias(kwargs["adjunto_path"]),
+                                        self.periodo or os.path.basename(os.path.dirname(kwargs["adjunto_path"])))
+        trabajo = _trabajo_constancia_archivo if self.archivo is not None else _trabajo_constancia
+        dni = os.path.splitext(os.path.basename(kwargs["adjunto_path"]))[0]
+        contexto = (contexto, (dni, kwargs.get("message_id"), kwargs.get("fecha_envio")))
+        if self._executor is None:
+            self._registrar(contexto, lambda: trabajo(kwargs))
+            return
+        if not self._en_vuelo.acquire(blocking=False):
+            with self._lock:
+                self.esperas_submit += 1
+            self._en_vuelo.acquire()
+        try:
+            future = self._executor.submit(trabajo, kwargs)
+        except BaseException:
+            self._en_vuelo.release()
+            raise
+        # El resultado se registra (y se libera) en cuanto termina, sin esperar a drain()
+        future.add_done_callback(lambda terminado: self._terminado(contexto, terminado))
+
+    def _terminado(self, contexto, future):
+        try:
+            self._registrar(contexto, future)
+        finally:
+            self._en_vuelo.release()
+
+    def drain(self):
+        """Espera todas las constancias encoladas, cierra el pool de procesos y el archivo mensual."""
+        inicio = time.perf_counter()
+        if self._executor is not None:
+            # Al volver, todos los callbacks de los futures ya se ejecutaron
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        if self.archivo is not None:
+            try:
+                self.archivo.cerrar()
+            except Exception as e:
+                logger.error(f"Error al guardar el archivo de constancias: {str(e)}")
+                # Las constancias quedan en las parciales y se archivan en el próximo envío del período
+                error = RuntimeError(f"no se pudo guardar {self.archivo.ruta} ({str(e)}); "
+                                     f"queda en {self.archivo.parciales}")
+                self.errores.extend((contexto, error) for contexto in self._archivadas)
+                self.generadas = []
+        self.tiempo_espera = time.perf_counter() - inicio
+        return self.generadas, self.errores
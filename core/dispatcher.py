@@ -0,0 +1,195 @@
+import time
+import queue
+import threading
+import logging
+from .config import SMTP_WORKERS, SMTP_RATE_BURST, SMTP_TRANSIENT_RETRIES
+from .rate_limiter import crear_limitador
+from .smtp_pool import SMTPConnectionPool, SMTPPoolError, es_error_transitorio
+from .relays import es_fallo_de_relay
+
+logger = logging.getLogger(__name__)
+
+_FIN = object()
+
+
+class SMTPDispatcher:
+    """
+    Motor de envío concurrente: N hilos que toman sesiones de un pool SMTP compartido
+    y respetan un único limitador de tasa (token bucket).
+    Los rechazos transitorios del servidor (421/451/4.7.x) se reintentan hasta `max_reintentos`
+    veces con espera exponencial; si el limitador es adaptativo, además se le informa de cada
+    éxito y rechazo para que ajuste la tasa.
+    :param workers: número de hilos/envíos simultáneos
+    :param rate_limiter: limitador compartido (por defecto según config, ver crear_limitador)
+    :param pool: SMTPConnectionPool a reutilizar; si no se indica se crea uno para este envío
+    :param max_reintentos: reintentos ante rechazos transitorios antes de darlo por fallido
+    :param metricas: RunMetrics donde registrar esperas del limitador y conexiones
+    :param relays: RelayRouter opcional; cada intento usa el pool y el limitador del relay elegido
+        (asignado en `item.relay` antes de llamar a send_func) y pasa a otro si ese relay rechaza.
+        Con relays, `rate_limiter` (si se indica) es un tope global que se suma al de cada relay
+    """
+
+    def __init__(self, workers=None, rate_limiter=None, pool=None, progress_callback=None, max_reintentos=None,
+                 metricas=None, relays=None):
+        self.workers = max(1, int(workers or SMTP_WORKERS))
+        self.relays = relays
+        self.rate_limiter = rate_limiter or crear_limitador(capacity=SMTP_RATE_BURST or self.workers)
+        self.tope_global = rate_limiter if relays is not None else None
+        self.max_reintentos = SMTP_TRANSIENT_RETRIES if max_reintentos is None else max_reintentos
+        self.reintentos = 0
+        self.metricas = metricas
+        self._own_pool = pool is None and relays is None
+        self.pool = relays or pool or SMTPConnectionPool(max_idle=self.workers)
+        self.progress_callback = progress_callback
+        self._callback_lock = threading.Lock()
+
+    def _notify(self, callback, *args):
+        if callback:
+            with self._callback_lock:
+                callback(*args)
+
+    def _on_connect(self):
+        if self.progress_callback:
+            self.progress_callback("🔗 Conectando al servidor SMTP...")
+
+    def _worker(self, jobs, send_func, on_success, on_error):
+        while True:
+            item = jobs.get()
+            if item is _FIN:
+                break
+            try:
+                result = self._enviar(send_func, item)
+            except SMTPPoolError as e:
+                logger.error(f"Error con servidor SMTP al conectar: {str(e)}")
+                self._notify(on_error, item, e, True)
+                continue
+            except Exception as e:
+                self._notify(on_error, item, e, False)
+                continue
+            # El correo ya salió: un fallo al registrarlo no debe contarse como error de envío
+            try:
+                self._notify(on_success, item, result)
+            except Exception:
+                logger.exception("Error al registrar un correo enviado")
+
+    def _adquirir(self, limitador):
+        if self.metricas:
+            with self.metricas.cronometro("espera_tasa"):
+                limitador.acquire()
+        else:
+            limitador.acquire()
+
+    def _reintento_transitorio(self, limitador, intento):
+        """Cuenta el reintento e informa al limitador; devuelve la pausa aplicada (segundos)."""
+        with self._callback_lock:
+            self.reintentos += 1
+        registrar_rechazo = getattr(limitador, "registrar_rechazo", None)
+        if registrar_rechazo:
+            # El limitador pausa a todos los hilos; acquire() espera esa pausa
+            return registrar_rechazo(intento)
+        return min(2 ** intento, 60)
+
+    def _enviar(self, send_func, item):
+        if self.relays is not None:
+            return self._enviar_con_relays(send_func, item)
+        intento = 0
+        while True:
+            self._adquirir(self.rate_limiter)
+            try:
+                result = self.pool.execute(lambda server: send_func(server, item), on_connect=self._on_connect)
+            except Exception as e:
+                if not es_error_transitorio(e) or intento >= self.max_reintentos:
+                    raise
+                intento += 1
+                espera = self._reintento_transitorio(self.rate_limiter, intento)
+                if not hasattr(self.rate_limiter, "registrar_rechazo"):
+                    time.sleep(espera)
+                logger.info(f"Rechazo transitorio del servidor ({str(e)}), reintento {intento} de {self.max_reintentos}.")
+                continue
+            registrar_exito = getattr(self.rate_limiter, "registrar_exito", None)
+            if registrar_exito:
+                registrar_exito()
+            return result
+
+    def _enviar_con_relays(self, send_func, item):
+        intento = 0
+        while True:
+            relay = self.relays.elegir()
+            if relay is None:
+                raise SMTPPoolError("Ningún relay SMTP disponible (cuotas diarias agotadas o relays desactivados)")
+            # Todos los relays en pausa: se espera al que se libera primero
+            espera = relay.suspendido_hasta - time.monotonic()
+            if espera > 0:
+                time.sleep(espera)
+            item.relay = relay
+            self._adquirir(relay.limitador)
+            if self.tope_global is not None:
+                self._adquirir(self.tope_global)
+            try:
+                result = relay.pool.execute(lambda server: send_func(server, item), on_connect=self._on_connect)
+            except Exception as e:
+                self.relays.liberar(relay)
+                if es_error_transitorio(e) and intento < self.max_reintentos:
+                    intento += 1
+                    self.relays.suspender(relay, self._reintento_transitorio(relay.limitador, intento))
+                    logger.info(f"Rechazo transitorio de {relay.nombre} ({str(e)}), reintento {intento} "
+                                f"de {self.max_reintentos}.")
+                    continue
+                if es_fallo_de_relay(e):
+                    self.relays.desactivar(relay, e)
+                    continue
+                raise
+            registrar_exito = getattr(relay.limitador, "registrar_exito", None)
+            if registrar_exito:
+                registrar_exito()
+            self.relays.confirmar(relay)
+            return result
+
+    def dispatch(self, items, send_func, on_success=None, on_error=None):
+        """
+        Envía cada elemento de `items` llamando a send_func(server, item) desde los hilos.
+        Los callbacks se ejecutan serializados, por lo que pueden modificar listas/contadores:
+        - on_success(item, resultado): una excepción aquí se registra en el log, no llama a on_error
+        - on_error(item, excepcion, fallo_conexion)
+        """
+        jobs = queue.Queue(maxsize=self.workers * 2)
+        threads = [
+            threading.Thread(
+                target=self._worker, args=(jobs, send_func, on_success, on_error),
+                name=f"smtp-worker-{n}", daemon=True,
+            )
+            for n in range(self.workers)
+        ]
+        if self.metricas:
+            self.pool.metricas = self.metricas
+        for t in threads:
+            t.start()
+        try:
+            for item in items:
+                jobs.put(item)
+        finally:
+            for _ in threads:
+                jobs.put(_FIN)
+            for t in threads:
+                t.join()
+            self.pool.metricas = None
+            if self._own_pool:
+                self.pool.close()
+        logger.info("Estadísticas del pool SMTP: %s", self.pool.stats())
+        self._registrar_tasa()
+
+    def _registrar_tasa(self):
+        if self.relays is not None:
+            for nombre, datos in self.relays.stats_relays().items():
+                logger.info("Relay %s: %d enviados, %d rechazos, tasa final %.2f correos/s%s", nombre,
+                            datos["enviados"], datos["rechazos"], datos["tasa"],
+                            f" (desactivado: {datos['desactivado']})" if datos["desactivado"] else "")
+            return
+        stats = getattr(self.rate_limiter, "stats", None)
+        if stats:
+            datos = stats()
+            logger.info(
+                "Tasa de envío estabilizada en %.2f correos/s (mín. %.2f, máx. %.2f; %d aumentos, %d reducciones, "
+                "%d reintentos transitorios)", datos["tasa"], datos["tasa_minima"], datos["tasa_maxima"],
+                datos["aumentos"], datos["reducciones"], self.reintentos
+            )
@@ -0,0 +1,154 @@
+"""
+Simulación de un envío (dry run): todas las etapas del pipeline salvo el envío SMTP.
+
+Se leen y validan los destinatarios, se cruzan con el índice de boletas, se renderizan las
+plantillas y se arma cada correo MIME completo, sin conectarse al servidor ni registrar nada
+en el journal. El resultado es un reporte de preparación (qué filas fallarían y por qué) y una
+estimación del tiempo de envío según la tasa, la concurrencia configurada y las latencias
+medidas en el último envío real (METRICS_FILE).
+"""
+import json
+import logging
+from .config import METRICS_FILE, CONSTANCIA_WORKERS
+
+logger = logging.getLogger(__name__)
+
+
+class DryRunReport:
+    """Resultado de SendPipeline.simular()."""
+
+    def __init__(self, mes, periodo=None):
+        self.mes = mes
+        self.periodo = periodo
+        self.procesados = 0
+        self.listos = 0
+        self.omitidos = 0
+        self.invalidos = []
+        self.faltantes = []
+        self.huerfanos = []
+        # Filas que fallarían al armar el correo: (fila, nombre, email, dni, motivo)
+        self.errores_armado = []
+        self.bytes_total = 0
+        self.tiempos = {}
+        self.estimacion = {}
+
+    @property
+    def cuota_insuficiente(self):
+        """True si la cuota diaria que queda entre todas las cuentas no alcanza para los correos listos."""
+        cuota = self.estimacion.get("cuota_restante")
+        return cuota is not None and cuota < self.listos
+
+    @property
+    def listo_para_enviar(self):
+        return self.listos > 0 and not (self.invalidos or self.faltantes or self.errores_armado
+                                        or self.cuota_insuficiente)
+
+
+def latencias_previas(path=None):
+    """
+    Latencias medias por correo del último envío real, leídas del archivo de métricas JSON.
+    :return: dict con smtp_envio y constancia_pdf en segundos (solo las que se midieron)
+    """
+    path = METRICS_FILE if path is None else path
+    if not path or path.endswith(".prom"):
+        return {}
+    try:
+        with open(path, encoding="utf-8") as f:
+            histogramas = json.load(f).get("histogramas", {})
+    except (OSError, ValueError):
+        return {}
+    medias = {}
+    for nombre in ("smtp_envio", "constancia_pdf"):
+        histograma = histogramas.get(nombre)
+        if histograma and histograma.get("count"):
+            medias[nombre] = histograma["sum"] / histograma["count"]
+    return medias
+
+
+def estimar_tiempo_envio(n, rate, workers, burst=None, armado_medio=0.0, latencias=None, tasa_maxima=None,
+                         constancia_workers=None):
+    """
+    Estima la duración del envío de `n` correos. El envío termina cuando se cumple el más lento de:
+    - tasa: el limitador deja salir `burst` correos de inmediato y luego `rate` por segundo
+    - concurrencia: cada hilo arma y envía sus correos uno tras otro
+    - constancias: el pool de procesos genera una constancia por correo enviado
+    :param latencias: medias por correo de un envío anterior (ver latencias_previas)
+    :param tasa_maxima: tasa a la que puede llegar el control adaptativo (estimación optimista)
+    :return: dict con segundos, limite ("tasa", "concurrencia" o "constancias") y el detalle de cada cota
+    """
+    latencias = latencias or {}
+    workers = max(1, int(workers))
+    burst = workers if burst is None else burst
+    constancia_workers = CONSTANCIA_WORKERS if constancia_workers is None else constancia_workers
+    por_correo = armado_medio + latencias.get("smtp_envio", 0.0)
+    constancia_media = latencias.get("constancia_pdf", 0.0)
+    if constancia_workers <= 0:
+        # Sin pool de procesos la constancia se genera en el mismo hilo de envío
+        por_correo += constancia_media
+    cotas = {
+        "tasa": max(0, n - burst) / rate if rate else 0.0,
+        "concurrencia": n * por_correo / workers,
+        "constancias": n * constancia_media / constancia_workers if constancia_workers > 0 else 0.0,
+    }
+    limite = max(cotas, key=cotas.get)
+    estimacion = {
+        "correos": n,
+        "segundos": cotas[limite],
+        "limite": limite,
+        "cotas": cotas,
+        "latencia_smtp_medida": "smtp_envio" in latencias,
+    }
+    if tasa_maxima and rate and tasa_maxima > rate:
+        estimacion["segundos_optimista"] = max(
+            max(0, n - burst) / tasa_maxima, cotas["concurrencia"], cotas["constancias"]
+        )
+    return estimacion
+
+
+def _duracion(segundos):
+    segundos = int(round(segundos))
+    horas, resto = divmod(segundos, 3600)
+    minutos, segundos = divmod(resto, 60)
+    if horas:
+        return f"{horas}h {minutos}m"
+    if minutos:
+        return f"{minutos}m {segundos}s"
+    return f"{segundos}s"
+
+
+def formatear_reporte(reporte, limite=10):
+    """Texto del reporte de simulación para la interfaz y la línea de comandos."""
+    lineas = [f"📊 Destinatarios leídos: {reporte.procesados}"]
+    lineas.append(f"✅ Listos para enviar: {reporte.listos}")
+    if reporte.omitidos:
+        lineas.append(f"⏭️ Se omitirían (ya enviados en {reporte.periodo or reporte.mes}): {reporte.omitidos}")
+    secciones = (
+        ("⚠️ Filas inválidas o duplicadas", [(f, n, m) for f, n, _, _, m in reporte.invalidos]),
+        ("❌ Sin PDF de boleta", [(f, n, f"DNI {d}") for f, n, d in reporte.faltantes]),
+        ("❌ Error al armar el correo", [(f, n, m) for f, n, _, _, m in reporte.errores_armado]),
+    )
+    for titulo, filas in secciones:
+        if not filas:
+            continue
+        lineas.append(f"{titulo}: {len(filas)}")
+        for fila, nombre, motivo in filas[:limite]:
+            lineas.append(f"   • Fila {fila}: {nombre} - {motivo}")
+        if len(filas) > limite:
+            lineas.append(f"   ... y {len(filas) - limite} más")
+    if reporte.huerfanos:
+        lineas.append(f"📄 PDF sin destinatario: {len(reporte.huerfanos)}")
+    if reporte.listos:
+        lineas.append(f"📦 Tamaño total de los correos: {reporte.bytes_total / (1024 * 1024):.1f} MB")
+    estimacion = reporte.estimacion
+    if estimacion and reporte.listos:
+        texto = f"⏱️ Tiempo estimado de envío: {_duracion(estimacion['segundos'])} (limitado por {estimacion['limite']})"
+        if "segundos_optimista" in estimacion:
+            texto += f", {_duracion(estimacion['segundos_optimista'])} si la tasa adaptativa sube al máximo"
+        lineas.append(texto)
+        if not estimacion["latencia_smtp_medida"]:
+            lineas.append("   (sin latencias de un envío anterior: no incluye la demora del servidor SMTP)")
+        if reporte.cuota_insuficiente:
+            lineas.append(f"⚠️ La cuota diaria restante de las cuentas SMTP ({estimacion['cuota_restante']}) "
+                          f"no alcanza para {reporte.listos} correos")
+    lineas.append("🟢 Listo para enviar" if reporte.listo_para_enviar else "🔴 Hay observaciones antes de enviar")
+    return "\n".join(lineas)
@@ -0,0 +1,123 @@
+import os
+import csv
+import time
+import threading
+import logging
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+ENCABEZADO_ERRORES = ["Fila", "Nombre", "Email", "DNI", "Motivo"]
+
+
+class ErrorReportWriter:
+    """
+    Reporte de errores que se escribe a disco a medida que ocurren.
+    Cada fila se agrega a un CSV (logError.csv) y se vacía a disco de inmediato (los errores
+    son pocos), de modo que si el proceso se interrumpe, aun de golpe, queda un reporte parcial.
+    Al cerrar, el CSV se convierte a logError.xlsx con openpyxl en modo write-only, en streaming.
+    :param base_filename: nombre base de los archivos (sin extensión)
+    """
+
+    def __init__(self, base_filename="logError"):
+        self.base_filename = base_filename
+        self.csv_path = f"{base_filename}.csv"
+        self.total = 0
+        self._archivo = None
+        self._writer = None
+        self._lock = threading.Lock()
+
+    def _abrir(self):
+        # utf-8-sig: el reporte parcial se abre bien en Excel
+        self._archivo = open(self.csv_path, "w", newline="", encoding="utf-8-sig")
+        self._writer = csv.writer(self._archivo)
+        self._writer.writerow(ENCABEZADO_ERRORES)
+
+    def agregar(self, fila):
+        """Agrega una fila (fila, nombre, email, dni, motivo) y la vacía a disco. Thread-safe."""
+        self.agregar_varios((fila,))
+
+    def agregar_varios(self, filas):
+        """Agrega varias filas con un solo vaciado a disco (p. ej. los errores de validación)."""
+        with self._lock:
+            if self._archivo is None:
+                self._abrir()
+            for fila in filas:
+                self._writer.writerow(fila)
+                self.total += 1
+            self._archivo.flush()
+
+    def abortar(self):
+        """Vacía y cierra el CSV sin convertirlo (queda como reporte parcial)."""
+        with self._lock:
+            if self._archivo is not None:
+                self._archivo.close()
+                self._archivo = None
+                logger.warning(f"Envío interrumpido: reporte parcial de errores en {self.csv_path}")
+        return self.csv_path if self.total else None
+
+    def cerrar(self):
+        """
+        Cierra el CSV y lo convierte a .xlsx (en el orden en que se registraron: primero las filas
+        inválidas, luego los errores de envío). Si el .xlsx está abierto en
+        Excel (PermissionError) se reintenta con un nombre con fecha y hora.
+        :return: archivo de errores guardado (.xlsx, o el .csv si no se pudo convertir) o None
+        """
+        with self._lock:
+            if self._archivo is None:
+                return None
+            self._archivo.close()
+            self._archivo = None
+        xlsx = self._convertir()
+        if xlsx is None:
+            return self.csv_path
+        try:
+            os.remove(self.csv_path)
+        except OSError:
+            pass
+        return xlsx
+
+    def _filas_csv(self):
+        with open(self.csv_path, newline="", encoding="utf-8-sig") as f:
+            lector = csv.reader(f)
+            next(lector, None)
+            for fila, *resto in lector:
+                yield (int(fila) if fila.isdigit() else fila, *resto)
+
+    def _convertir(self):
+        from openpyxl import Workbook
+        # El CSV se lee fila a fila y el libro se escribe en streaming: la memoria no crece con los errores
+        extension = ".xlsx"
+        for attempt in range(5):
+            if attempt == 0:
+                filename = f"{self.base_filename}{extension}"
+            else:
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                filename = f"{self.base_filename}_{timestamp}{extension}"
+            wb = Workbook(write_only=True)
+            ws = wb.create_sheet("Errores")
+            ws.append(ENCABEZADO_ERRORES)
+            for fila in self._filas_csv():
+                ws.append(fila)
+            try:
+                wb.save(filename)
+                return filename
+            except PermissionError:
+                time.sleep(1)
+                continue
+            except Exception as e:
+                logger.error(f"No se pudo convertir el reporte de errores: {str(e)}")
+                break
+        return None
+
+
+def generar_log_errores(errores, base_filename="logError"):
+    """
+    Guarda las filas con error en logError.xlsx (ver ErrorReportWriter).
+    :return: nombre del archivo guardado o None
+    """
+    if not errores:
+        return None
+    reporte = ErrorReportWriter(base_filename)
+    reporte.agregar_varios(errores)
+    return reporte.cerrar()
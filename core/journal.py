@@ -0,0 +1,130 @@
+import sqlite3
+import threading
+import logging
+from datetime import date, datetime
+from .config import SEND_JOURNAL_FILE
+
+logger = logging.getLogger(__name__)
+
+PENDIENTE = "queued"
+ENVIADO = "sent"
+FALLIDO = "failed"
+
+MESES = ("enero", "febrero", "marzo", "abril", "mayo", "junio", "julio", "agosto", "septiembre", "octubre",
+         "noviembre", "diciembre")
+
+
+def periodo_envio(mes, anio=None):
+    """
+    Período de un envío, clave del registro y del archivo de constancias: "Enero" de 2026 -> "2026-01".
+    Sin `anio`, un mes posterior al actual se toma como del año anterior (las boletas de
+    diciembre se envían en enero). Si `mes` no es un nombre de mes se usa "<año>-<mes>".
+    :param mes: nombre del mes (carpeta de boletas)
+    :param anio: año del período
+    """
+    clave = mes.strip().lower()
+    if clave == "setiembre":
+        clave = "septiembre"
+    numero = MESES.index(clave) + 1 if clave in MESES else None
+    if anio is None:
+        hoy = date.today()
+        anio = hoy.year - 1 if numero and numero > hoy.month else hoy.year
+    return f"{int(anio):04d}-{numero:02d}" if numero else f"{int(anio):04d}-{clave}"
+
+
+class SendJournal:
+    """
+    Registro persistente de envíos por período y DNI (SQLite).
+    Cada destinatario pasa por queued -> sent/failed con su Message-ID, de modo que si el
+    proceso se interrumpe, un nuevo envío del mismo período omite a quienes ya recibieron su boleta.
+    El período es año y mes (ver periodo_envio): el enero de cada año es un envío distinto.
+    :param path: archivo SQLite del registro
+    """
+
+    def __init__(self, path=None):
+        self.path = path or SEND_JOURNAL_FILE
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            # La columna `mes` guarda el período YYYY-MM
+            """CREATE TABLE IF NOT EXISTS envios (
+                mes TEXT NOT NULL,
+                dni TEXT NOT NULL,
+                email TEXT,
+                estado TEXT NOT NULL,
+                message_id TEXT,
+                detalle TEXT,
+                actualizado TEXT NOT NULL,
+                PRIMARY KEY (mes, dni)
+            )"""
+        )
+        # Correos enviados por cada cuenta/relay por día (cuotas diarias, ver core.relays)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS uso_relays (
+                fecha TEXT NOT NULL,
+                relay TEXT NOT NULL,
+                enviados INTEGER NOT NULL,
+                PRIMARY KEY (fecha, relay)
+            )"""
+        )
+
+    def _guardar(self, periodo, dni, estado, email=None, message_id=None, detalle=None):
+        ahora = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self._lock:
+            self._conn.execute(
+                """INSERT INTO envios (mes, dni, email, estado, message_id, detalle, actualizado)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (mes, dni) DO UPDATE SET
+                       email = COALESCE(excluded.email, envios.email),
+                       estado = excluded.estado,
+                       message_id = COALESCE(excluded.message_id, envios.message_id),
+                       detalle = excluded.detalle,
+                       actualizado = excluded.actualizado""",
+                (periodo.lower(), dni, email, estado, message_id, detalle, ahora),
+            )
+
+    def enviados(self, periodo):
+        """DNIs ya marcados como enviados en el período."""
+        with self._lock:
+            filas = self._conn.execute(
+                "SELECT dni FROM envios WHERE mes = ? AND estado = ?", (periodo.lower(), ENVIADO)
+            ).fetchall()
+        return {dni for (dni,) in filas}
+
+    def marcar_pendiente(self, periodo, dni, email):
+        self._guardar(periodo, dni, PENDIENTE, email=email)
+
+    def marcar_enviado(self, periodo, dni, email, message_id):
+        self._guardar(periodo, dni, ENVIADO, email=email, message_id=message_id)
+
+    def marcar_fallido(self, periodo, dni, email, detalle):
+        self._guardar(periodo, dni, FALLIDO, email=email, detalle=detalle)
+
+    def resumen(self, periodo):
+        with self._lock:
+            filas = self._conn.execute(
+                "SELECT estado, COUNT(*) FROM envios WHERE mes = ? GROUP BY estado", (periodo.lower(),)
+            ).fetchall()
+        return dict(filas)
+
+    def uso_relay(self, relay, fecha):
+        """Correos enviados por `relay` en la fecha (YYYY-MM-DD)."""
+        with self._lock:
+            fila = self._conn.execute(
+                "SELECT enviados FROM uso_relays WHERE fecha = ? AND relay = ?", (fecha, relay)
+            ).fetchone()
+        return fila[0] if fila else 0
+
+    def registrar_uso_relay(self, relay, fecha):
+        with self._lock:
+            self._conn.execute(
+                """INSERT INTO uso_relays (fecha, relay, enviados) VALUES (?, ?, 1)
+                   ON CONFLICT (fecha, relay) DO UPDATE SET enviados = uso_relays.enviados + 1""",
+                (fecha, relay),
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,97 @@
+import base64
+import socket
+import uuid
+from email.header import Header
+from email.utils import formataddr, make_msgid
+from .config import EMAIL_USER
+
+CRLF = b"\r\n"
+# 57 bytes de entrada = 76 caracteres base64 por línea (RFC 2045)
+_BLOQUE_BASE64 = 57 * 1024
+
+
+def codificar_base64(data):
+    """Codifica en base64 con líneas de 76 caracteres y CRLF, en una sola pasada por bloques."""
+    vista = memoryview(data)
+    partes = []
+    for inicio in range(0, len(vista), _BLOQUE_BASE64):
+        partes.append(base64.encodebytes(vista[inicio:inicio + _BLOQUE_BASE64]).replace(b"\n", CRLF))
+    return b"".join(partes)
+
+
+class CabeceraInvalida(ValueError):
+    """Un valor de cabecera (nombre o asunto) contiene saltos de línea."""
+
+
+def _cabecera(texto, nombre_cabecera):
+    """Valor de cabecera codificado (RFC 2047 si no es ASCII) y plegado a 78 columnas con CRLF."""
+    if "\r" in texto or "\n" in texto:
+        # Un salto de línea permitiría inyectar cabeceras (p. ej. Bcc) desde el Excel o la plantilla
+        raise CabeceraInvalida(f"{nombre_cabecera} contiene saltos de línea: {texto!r}")
+    charset = "us-ascii" if texto.isascii() else "utf-8"
+    return Header(texto, charset, header_name=nombre_cabecera).encode(linesep="\r\n")
+
+
+class MessageBuilder:
+    """
+    Arma correos como bytes listos para `sendmail`, sin pasar por MIMEMultipart ni el generador
+    de `send_message`. Las cabeceras fijas (remitente, acuse de lectura, boundary) se calculan
+    una vez por envío; por destinatario solo se codifican To, Subject, el HTML y el adjunto.
+    :param remitente_nombre: nombre visible del remitente
+    :param remitente_email: dirección del remitente (por defecto EMAIL_USER)
+    """
+
+    def __init__(self, remitente_nombre="Clínica Santa Rosa", remitente_email=None):
+        self.remitente_nombre = remitente_nombre
+        self.remitente_email = remitente_email or EMAIL_USER
+        # getfqdn() puede consultar DNS: se resuelve una sola vez por envío
+        self._dominio = socket.getfqdn()
+        self._boundary = f"=============={uuid.uuid4().hex}=="
+        self._cabeceras_fijas = (
+            f"From: {formataddr((remitente_nombre, self.remitente_email), charset='utf-8')}\r\n"
+            f"Disposition-Notification-To: {self.remitente_email}\r\n"
+            f"MIME-Version: 1.0\r\n"
+            f'Content-Type: multipart/alternative; boundary="{self._boundary}"\r\n'
+        ).encode("ascii")
+        self._inicio_parte = f"--{self._boundary}\r\n".encode("ascii")
+        self._cierre = f"--{self._boundary}--\r\n".encode("ascii")
+        self._cabecera_html = (
+            b'Content-Type: text/html; charset="utf-8"\r\n'
+            b"MIME-Version: 1.0\r\n"
+            b"Content-Transfer-Encoding: base64\r\n\r\n"
+        )
+
+    def nuevo_message_id(self):
+        return make_msgid(domain=self._dominio)
+
+    def cabecera_adjunto(self, nombre_archivo):
+        return (
+            "Content-Type: application/pdf\r\n"
+            "MIME-Version: 1.0\r\n"
+            "Content-Transfer-Encoding: base64\r\n"
+            f'Content-Disposition: attachment; filename="{nombre_archivo}"\r\n\r\n'
+        ).encode("ascii")
+
+    def build(self, nombre, email, asunto, html, adjunto_base64, adjunto_nombre, message_id):
+        """
+        Devuelve el correo completo en bytes (CRLF).
+        Lanza CabeceraInvalida si el nombre o el asunto contienen saltos de línea.
+        :param adjunto_base64: adjunto ya codificado con codificar_base64()
+        """
+        if "\r" in nombre or "\n" in nombre:
+            raise CabeceraInvalida(f"El nombre contiene saltos de línea: {nombre!r}")
+        variables = (
+            f"To: {_cabecera(formataddr((nombre, email), charset='utf-8'), 'To')}\r\n"
+            f"Subject: {_cabecera(asunto, 'Subject')}\r\n"
+            f"Message-ID: {message_id}\r\n\r\n"
+        ).encode("ascii")
+        return b"".join((
+            self._cabeceras_fijas, variables,
+            self._inicio_parte, self._cabecera_html, codificar_base64(html.encode("utf-8")),
+            self._inicio_parte, self.cabecera_adjunto(adjunto_nombre), adjunto_base64,
+            self._cierre,
+        ))
+
+    def send(self, server, email, raw):
+        """Envía los bytes crudos (sin volver a serializar el mensaje)."""
+        return server.sendmail(self.remitente_email, [email], raw)
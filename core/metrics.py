@@ -0,0 +1,176 @@
+"""
+Métricas de una ejecución de envío: contadores, cronómetros e histogramas por etapa.
+Al terminar el envío se escriben en METRICS_FILE, en JSON o en formato de texto de
+Prometheus si el archivo termina en .prom.
+"""
+import json
+import time
+import threading
+import logging
+from contextlib import contextmanager
+from datetime import datetime
+from .config import METRICS_FILE
+
+logger = logging.getLogger(__name__)
+
+# Límites superiores (segundos) de los buckets de los histogramas
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+PREFIJO_PROMETHEUS = "boletas_"
+
+
+class Histogram:
+    """Histograma acumulativo de duraciones (no es thread-safe por sí solo: ver RunMetrics)."""
+    __slots__ = ("buckets", "conteos", "count", "sum", "min", "max")
+
+    def __init__(self, buckets=BUCKETS_SEGUNDOS):
+        self.buckets = buckets
+        self.conteos = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, valor):
+        for n, limite in enumerate(self.buckets):
+            if valor <= limite:
+                self.conteos[n] += 1
+                break
+        self.count += 1
+        self.sum += valor
+        self.min = valor if self.min is None else min(self.min, valor)
+        self.max = valor if self.max is None else max(self.max, valor)
+
+    def acumulados(self):
+        """[(límite, observaciones <= límite)] incluyendo +Inf."""
+        total = 0
+        filas = []
+        for limite, conteo in zip(self.buckets, self.conteos):
+            total += conteo
+            filas.append((limite, total))
+        filas.append(("+Inf", self.count))
+        return filas
+
+    def percentil(self, q):
+        """Estimación por bucket (límite superior del bucket que contiene el percentil)."""
+        if not self.count:
+            return 0.0
+        objetivo = q * self.count
+        for limite, acumulado in self.acumulados():
+            if acumulado >= objetivo:
+                return self.max if limite == "+Inf" else min(limite, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "min": self.min,
+            "max": self.max,
+            "p50": self.percentil(0.50),
+            "p99": self.percentil(0.99),
+            "buckets": {str(limite): acumulado for limite, acumulado in self.acumulados()},
+        }
+
+
+class RunMetrics:
+    """
+    Contadores, tiempos por etapa e histogramas de una ejecución. Thread-safe: los hilos
+    de envío pueden registrar observaciones a la vez.
+    :param etiquetas: datos fijos de la ejecución (p. ej. el mes)
+    """
+
+    def __init__(self, **etiquetas):
+        self.etiquetas = etiquetas
+        self.inicio = datetime.now()
+        self._inicio_perf = time.perf_counter()
+        self.contadores = {}
+        self.etapas = {}
+        self.histogramas = {}
+        self._lock = threading.Lock()
+
+    def incrementar(self, nombre, n=1):
+        with self._lock:
+            self.contadores[nombre] = self.contadores.get(nombre, 0) + n
+
+    def observar(self, nombre, segundos):
+        with self._lock:
+            histograma = self.histogramas.get(nombre)
+            if histograma is None:
+                histograma = self.histogramas[nombre] = Histogram()
+            histograma.observe(segundos)
+
+    def registrar_etapa(self, nombre, segundos):
+        with self._lock:
+            self.etapas[nombre] = self.etapas.get(nombre, 0.0) + segundos
+
+    @contextmanager
+    def cronometro(self, nombre, etapa=False):
+        """
+        Mide el bloque: con `etapa` suma el tiempo total de la etapa, si no lo agrega
+        al histograma `nombre`.
+        """
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            segundos = time.perf_counter() - inicio
+            if etapa:
+                self.registrar_etapa(nombre, segundos)
+            else:
+                self.observar(nombre, segundos)
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "inicio": self.inicio.strftime("%Y-%m-%d %H:%M:%S"),
+                "duracion_segundos": round(time.perf_counter() - self._inicio_perf, 6),
+                "etiquetas": dict(self.etiquetas),
+                "contadores": dict(self.contadores),
+                "etapas_segundos": {k: round(v, 6) for k, v in self.etapas.items()},
+                "histogramas": {k: h.to_dict() for k, h in self.histogramas.items()},
+            }
+
+    def to_prometheus(self):
+        datos = self.to_dict()
+        etiquetas = ",".join(f'{k}="{v}"' for k, v in datos["etiquetas"].items())
+        base = f"{{{etiquetas}}}" if etiquetas else ""
+        lineas = [
+            f"# TYPE {PREFIJO_PROMETHEUS}duracion_segundos gauge",
+            f"{PREFIJO_PROMETHEUS}duracion_segundos{base} {datos['duracion_segundos']}",
+        ]
+        for nombre, valor in sorted(datos["contadores"].items()):
+            metrica = f"{PREFIJO_PROMETHEUS}{nombre}_total"
+            lineas.append(f"# TYPE {metrica} counter")
+            lineas.append(f"{metrica}{base} {valor}")
+        metrica = f"{PREFIJO_PROMETHEUS}etapa_segundos"
+        lineas.append(f"# TYPE {metrica} gauge")
+        for nombre, valor in sorted(datos["etapas_segundos"].items()):
+            lineas.append(f'{metrica}{{{etiquetas + "," if etiquetas else ""}etapa="{nombre}"}} {valor}')
+        with self._lock:
+            histogramas = sorted(self.histogramas.items())
+            for nombre, histograma in histogramas:
+                metrica = f"{PREFIJO_PROMETHEUS}{nombre}_segundos"
+                lineas.append(f"# TYPE {metrica} histogram")
+                for limite, acumulado in histograma.acumulados():
+                    lineas.append(f'{metrica}_bucket{{{etiquetas + "," if etiquetas else ""}le="{limite}"}} {acumulado}')
+                lineas.append(f"{metrica}_sum{base} {histograma.sum:.6f}")
+                lineas.append(f"{metrica}_count{base} {histograma.count}")
+        return "\n".join(lineas) + "\n"
+
+    def escribir(self, path=None):
+        """Guarda las métricas (JSON, o Prometheus si el archivo termina en .prom). Devuelve la ruta o None."""
+        path = METRICS_FILE if path is None else path
+        if not path:
+            return None
+        try:
+            with open(path, "w", encoding="utf-8") as f:
+                if path.endswith(".prom"):
+                    f.write(self.to_prometheus())
+                else:
+                    json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+        except OSError as e:
+            logger.warning(f"No se pudo guardar el archivo de métricas {path}: {str(e)}")
+            return None
+        logger.info(f"Métricas del envío guardadas en {path}")
+        return path
@@ -0,0 +1,561 @@
+"""
+Pipeline de envío por etapas, compartido por la interfaz gráfica y la línea de comandos:
+
+    carga -> validación -> armado -> envío -> constancias -> reporte
+
+Cada etapa es un callable intercambiable (parámetros del constructor) y el avance se
+publica como eventos ProgressEvent a los suscriptores (GUI, CLI, logs). `simular()` recorre
+las mismas etapas sin el envío SMTP (ver core.dry_run).
+"""
+import os
+import time
+import threading
+import logging
+from datetime import datetime
+from .config import (
+    SMTP_RATE_BURST, SMTP_WORKERS, SMTP_RATE_PER_SECOND, SMTP_RATE_ADAPTIVE, SMTP_RATE_MAX_PER_SECOND,
+    PREFETCH_ADJUNTOS,
+)
+from .dispatcher import SMTPDispatcher
+from .rate_limiter import TokenBucket, crear_limitador
+from .smtp_pool import SMTPConnectionPool, SMTPEnvioIncierto
+from .validation import validar_destinatarios
+from .constancia import ConstanciaStage
+from .attachment_cache import crear_cache_adjuntos
+from .prefetch import AttachmentPrefetcher
+from .relays import nombre_metrica
+from .templates import plantillas_compiladas, valores_destinatario, renderizar
+from .message_builder import MessageBuilder, CabeceraInvalida, codificar_base64
+from .journal import SendJournal, periodo_envio
+from .boletas_index import BoletasIndex, reporte_preflight
+from .error_report import ErrorReportWriter
+from .metrics import RunMetrics
+from .dry_run import DryRunReport, estimar_tiempo_envio, latencias_previas
+from .progress import ProgressEvent, ETAPA, CONECTANDO, ENVIANDO, ENVIADO, ERROR, OMITIDO, FIN
+
+logger = logging.getLogger(__name__)
+
+# Filas inválidas que se conservan en la verificación previa (el resto queda en el reporte de errores)
+MUESTRA_INVALIDOS = 10
+
+
+class SendResult:
+    """Resultado de una ejecución del pipeline."""
+
+    def __init__(self, mes, periodo=None):
+        self.mes = mes
+        self.periodo = periodo
+        self.procesados = 0
+        self.enviados = 0
+        self.omitidos = 0
+        # Filas con error; con reporte a disco (reportar) quedan solo en el archivo y aquí se cuentan
+        self.errores = []
+        self.total_errores = 0
+        self.constancias = []
+        self.preflight = None
+        self.tiempos = {}
+        self.pool_stats = {}
+        self.control_tasa = {}
+        self.cache_adjuntos = {}
+        self.relays = {}
+        self.error_file = None
+        self.cancelado = False
+        self.metricas = None
+        self.metrics_file = None
+
+
+def cargar_destinatarios(source):
+    """Etapa de carga por defecto: acepta una ruta (.xlsx/.csv) o un iterable de registros."""
+    if isinstance(source, (str, os.PathLike)):
+        from .recipients import RecipientSource
+        return RecipientSource(source)
+    return source
+
+
+def cargar_adjunto(item, adjuntos=None):
+    """
+    Lee y codifica la boleta de un SendItem: (adjunto_base64, pdf_bytes).
+    :param adjuntos: AttachmentCache opcional; si la boleta no cambió no se lee ni se codifica
+    """
+    if adjuntos is not None:
+        boleta = item.boleta
+        return adjuntos.obtener(item.pdf_path, *((boleta.size, boleta.mtime) if boleta is not None else ()))
+    with open(item.pdf_path, "rb") as f:
+        pdf_bytes = f.read()
+    return codificar_base64(pdf_bytes), pdf_bytes
+
+
+def memoria_adjunto(item):
+    """Bytes que ocupa el adjunto cargado de un SendItem: el PDF más su base64 (4/3 y CRLF cada 76)."""
+    if item.boleta is None:
+        return 0
+    return item.boleta.size + item.boleta.size * 4 // 3 * 78 // 76
+
+
+def armar_mensaje(builder, plantillas, item, adjuntos=None):
+    """
+    Etapa de armado por defecto: renderiza asunto y cuerpo, lee el PDF una sola vez y
+    devuelve (raw, datos_constancia). Si el adjunto ya se leyó por adelantado (item.adjunto)
+    no se vuelve a leer.
+    :param adjuntos: AttachmentCache opcional (ver cargar_adjunto)
+    """
+    msg_id = builder.nuevo_message_id()
+    # Asunto y cuerpo con el Message-ID al final (mismo render que la vista previa del editor)
+    asunto, html_content = renderizar(plantillas, item.valores, msg_id)
+    adjunto_base64, pdf_bytes = item.adjunto or cargar_adjunto(item, adjuntos)
+    raw = builder.build(
+        item.nombre, item.email, asunto, html_content,
+        adjunto_base64, os.path.basename(item.pdf_path), msg_id
+    )
+    constancia = dict(
+        remitente=(builder.remitente_nombre, builder.remitente_email),
+        destinatario=(item.nombre, item.email),
+        asunto=asunto,
+        cuerpo=html_content,
+        adjunto_path=item.pdf_path,
+        message_id=msg_id,
+        adjunto_bytes=pdf_bytes
+    )
+    return raw, constancia
+
+
+class SendItem:
+    """Destinatario listo para enviar (ya validado y con su boleta localizada)."""
+    __slots__ = ("n", "fila", "nombre", "email", "dni", "pdf_path", "valores", "boleta", "adjunto", "relay")
+
+    def __init__(self, n, fila, nombre, email, dni, pdf_path, valores, boleta=None):
+        self.n = n
+        self.fila = fila
+        self.nombre = nombre
+        self.email = email
+        self.dni = dni
+        self.pdf_path = pdf_path
+        self.valores = valores
+        # BoletaInfo del índice (tamaño y fecha ya leídos al recorrer la carpeta)
+        self.boleta = boleta
+        # (adjunto_base64, pdf_bytes) si se leyó por adelantado (ver core.prefetch)
+        self.adjunto = None
+        # Relay por el que sale el intento en curso (lo asigna el despachador, ver core.relays)
+        self.relay = None
+
+    @property
+    def contexto(self):
+        return (self.fila, self.nombre, self.email, self.dni)
+
+
+class SendPipeline:
+    """
+    Pipeline de envío de boletas de un mes.
+    :param pool: SMTPConnectionPool compartido (si no se indica se crea uno)
+    :param journal: SendJournal para reanudar envíos (si no se indica se abre el de config)
+    :param workers: hilos de envío simultáneos
+    :param rate: correos por segundo (si no se indica, SMTP_RATE_PER_SECOND). Con `relays` cada cuenta
+        usa su propia tasa y `rate` es un tope global sobre la suma (si no se indica, sin tope)
+    :param reanudar: omitir los DNI ya enviados en el período según el registro
+    :param cargar: etapa de carga, source -> iterable de registros
+    :param validar: etapa de validación, (registros, on_error) -> generador de registros limpios
+    :param indexar: (path_boletas, mes) -> índice de boletas
+    :param confirmar: reporte_preflight -> bool; se consulta solo si hay observaciones. Requiere una
+        pasada previa por la hoja antes del primer envío (sin `confirmar` se lee una sola vez)
+    :param armar: (builder, plantillas, SendItem, adjuntos) -> (raw, datos_constancia)
+    :param constancias: fábrica de la etapa de constancias (submit/drain); recibe carpeta= y periodo="YYYY-MM"
+    :param adjuntos: fábrica del caché de adjuntos codificados (obtener/stats/close); None para no usarlo
+    :param reportar: fábrica del reporte de errores (agregar/cerrar/abortar); None para no generar reporte
+    :param relays: RelayRouter para repartir el envío entre varias cuentas SMTP (None = solo `pool`)
+    :param prefetch: adjuntos leídos por adelantado durante el envío (por defecto PREFETCH_ADJUNTOS; 0 = sin prefetch)
+    :param metrics_file: archivo de métricas de la ejecución (por defecto METRICS_FILE)
+    """
+
+    def __init__(self, pool=None, journal=None, workers=None, rate=None, reanudar=True,
+                 cargar=cargar_destinatarios, validar=validar_destinatarios, indexar=BoletasIndex,
+                 confirmar=None, armar=armar_mensaje, constancias=ConstanciaStage,
+                 reportar=ErrorReportWriter, adjuntos=crear_cache_adjuntos, prefetch=None,
+                 relays=None, metrics_file=None):
+        self.pool = pool or SMTPConnectionPool()
+        self.journal = journal or SendJournal()
+        self.workers = workers
+        self.rate = rate
+        self.reanudar = reanudar
+        self.cargar = cargar
+        self.validar = validar
+        self.indexar = indexar
+        self.confirmar = confirmar
+        self.armar = armar
+        self.constancias = constancias
+        self.reportar = reportar
+        self.adjuntos = adjuntos
+        self.prefetch = PREFETCH_ADJUNTOS if prefetch is None else prefetch
+        self.relays = relays
+        self.metrics_file = metrics_file
+        self._suscriptores = []
+
+    def subscribe(self, callback):
+        """Registra callback(ProgressEvent). Puede llamarse desde los hilos de envío."""
+        self._suscriptores.append(callback)
+        return callback
+
+    def unsubscribe(self, callback):
+        self._suscriptores.remove(callback)
+
+    def emit(self, tipo, mensaje="", **datos):
+        evento = ProgressEvent(tipo, mensaje, **datos)
+        for callback in list(self._suscriptores):
+            try:
+                callback(evento)
+            except Exception:
+                logger.exception("Error en suscriptor de progreso")
+
+    def run(self, source, mes, path_boletas, anio=None):
+        """
+        Ejecuta todas las etapas para el mes indicado.
+        :param source: ruta del archivo de destinatarios o iterable de registros
+        :param mes: nombre del mes (subcarpeta de boletas)
+        :param anio: año del período (por defecto se deduce de la fecha, ver periodo_envio)
+        :return: SendResult
+        """
+        periodo = periodo_envio(mes, anio)
+        resultado = SendResult(mes, periodo)
+        metricas = resultado.metricas = RunMetrics(mes=mes.lower(), periodo=periodo)
+
+        # Los destinatarios se leen y validan en streaming dentro del envío: el primer correo sale
+        # mientras se sigue leyendo la hoja
+        registros = self.cargar(source)
+        self.emit(ETAPA, "🔍 Indexando las boletas del mes...", etapa="preflight")
+        with metricas.cronometro("indexado_boletas", etapa=True):
+            indice = self.indexar(path_boletas, mes)
+        if self.confirmar:
+            # La confirmación necesita el panorama completo antes del primer envío: pasada previa
+            # (también en streaming) y luego se vuelve a leer la hoja para enviar
+            if iter(registros) is registros:
+                # Un iterador no se puede recorrer dos veces
+                registros = list(registros)
+            self.emit(ETAPA, "🔍 Verificando destinatarios y boletas antes del envío...", etapa="preflight")
+            with metricas.cronometro("preflight", etapa=True):
+                resultado.preflight = self.verificar(registros, indice)
+            preflight = resultado.preflight
+            if preflight["faltantes"] or preflight["huerfanos"] or preflight["total_invalidos"]:
+                if not self.confirmar(preflight):
+                    resultado.cancelado = True
+                    self.emit(FIN, "⏹️ Envío cancelado tras la verificación previa.", resultado=resultado)
+                    return resultado
+
+        # Los errores se escriben a disco a medida que ocurren (queda un reporte parcial si se interrumpe)
+        reporte = self.reportar() if self.reportar else None
+        # Se registran errores desde los hilos de envío y desde el lector de adjuntos
+        bloqueo_errores = threading.Lock()
+
+        def registrar_error(fila):
+            with bloqueo_errores:
+                resultado.total_errores += 1
+                if reporte is None:
+                    resultado.errores.append(fila)
+            if reporte:
+                reporte.agregar(fila)
+
+        # Estado de la lectura; solo lo modifica el hilo que recorre `pendientes`
+        leidos = {"limpios": 0, "invalidos": 0, "segundos": 0.0}
+        muestra_invalidos = []
+        dnis = set()
+        faltantes = []
+
+        def error_validacion(fila):
+            leidos["invalidos"] += 1
+            if len(muestra_invalidos) < MUESTRA_INVALIDOS:
+                muestra_invalidos.append(fila)
+            registrar_error(fila)
+
+        # Siempre se usan las plantillas vigentes (se recompilan solo si cambió el archivo)
+        plantillas = plantillas_compiladas()
+        builder = MessageBuilder()
+        # Con varias cuentas, cada una firma el From de sus correos
+        builders = {}
+        if self.relays:
+            builders = {relay.nombre: MessageBuilder(remitente_email=relay.remitente) for relay in self.relays.relays}
+        mes_capitalizado = mes.capitalize()
+        ya_enviados = self.journal.enviados(periodo) if self.reanudar else set()
+        cache_adjuntos = self.adjuntos() if self.adjuntos else None
+        total = resultado.preflight["total"] if resultado.preflight else None
+
+        def total_estimado():
+            # Sin pasada previa el total se conoce al terminar de leer; mientras, el de la hoja
+            return total or getattr(registros, "total_estimado", None)
+
+        def pendientes():
+            limpios = iter(self.validar(registros, error_validacion))
+            while True:
+                inicio_lectura = time.perf_counter()
+                recipient = next(limpios, None)
+                leidos["segundos"] += time.perf_counter() - inicio_lectura
+                if recipient is None:
+                    return
+                leidos["limpios"] += 1
+                n = leidos["limpios"]
+                fila, nombre, email, dni = recipient["fila"], recipient["nombre"], recipient["email"], recipient["dni"]
+                dnis.add(dni)
+                if dni in ya_enviados:
+                    resultado.omitidos += 1
+                    metricas.incrementar("omitidos")
+                    self.emit(OMITIDO, fila=fila, dni=dni)
+                    continue
+                boleta = indice.get(dni)
+                if boleta is None:
+                    faltantes.append((fila, nombre, dni))
+                    registrar_error((fila, nombre, email, dni, "PDF no encontrado"))
+                    metricas.incrementar("pdf_no_encontrado")
+                    self.emit(ERROR, fila=fila, dni=dni, motivo="PDF no encontrado")
+                    continue
+                self.journal.marcar_pendiente(periodo, dni, email)
+                yield SendItem(n, fila, nombre, email, dni, boleta.path, valores_destinatario(recipient, mes_capitalizado),
+                               boleta=boleta)
+
+        def enviar_uno(server, item):
+            estimado = total_estimado()
+            mensaje = f"📧 Enviando correo {item.n} de {estimado}..." if estimado else f"📧 Enviando correo {item.n}..."
+            self.emit(ENVIANDO, mensaje, n=item.n, total=estimado, fila=item.fila)
+            builder_item = builders[item.relay.nombre] if item.relay is not None else builder
+            with metricas.cronometro("armado"):
+                raw, constancia = self.armar(builder_item, plantillas, item, cache_adjuntos)
+            with metricas.cronometro("smtp_envio"):
+                builder_item.send(server, item.email, raw)
+            metricas.incrementar("bytes_enviados", len(raw))
+            constancia["fecha_envio"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            return constancia
+
+        def soltar_adjunto(item):
+            item.adjunto = None
+            if prefetcher is not None:
+                prefetcher.liberar(item)
+
+        def on_success(item, constancia):
+            soltar_adjunto(item)
+            resultado.enviados += 1
+            metricas.incrementar("enviados")
+            self.journal.marcar_enviado(periodo, item.dni, item.email, constancia["message_id"])
+            try:
+                etapa_constancias.submit(item.contexto, **constancia)
+            except Exception as e:
+                # El correo ya se envió: solo falta su constancia
+                logger.error(f"No se pudo encolar la constancia de {item.dni}: {str(e)}")
+                registrar_error(item.contexto + (f"Constancia no generada: {str(e)}",))
+                metricas.incrementar("constancias_fallidas")
+            self.emit(ENVIADO, fila=item.fila, dni=item.dni, message_id=constancia["message_id"])
+
+        def on_error(item, e, fallo_conexion):
+            soltar_adjunto(item)
+            motivo = f"Error SMTP: {str(e)}"
+            contador = "errores_smtp"
+            if isinstance(e, CabeceraInvalida):
+                # Dato del Excel o de la plantilla: el correo no llegó a enviarse
+                motivo = f"Correo no armado: {str(e)}"
+                contador = "errores_armado"
+            elif isinstance(e, SMTPEnvioIncierto):
+                # Revisar antes de reenviar: el destinatario pudo haberlo recibido
+                motivo = f"Entrega incierta: {str(e)}"
+                contador = "envios_inciertos"
+            elif fallo_conexion:
+                motivo += " (No se pudo conectar)"
+            registrar_error(item.contexto + (motivo,))
+            metricas.incrementar(contador)
+            self.journal.marcar_fallido(periodo, item.dni, item.email, str(e))
+            self.emit(ERROR, fila=item.fila, dni=item.dni, motivo=motivo)
+
+        # Envío; las constancias se generan en paralelo mientras siguen los envíos
+        self.emit(ETAPA, "📨 Enviando boletas...", etapa="envio", total=total)
+        etapa_constancias = self.constancias(carpeta=os.path.join(path_boletas, mes, "constancias"), periodo=periodo)
+        rate_limiter = None
+        if self.rate and self.relays:
+            # Tope fijo: el control adaptativo lo hace cada relay con su propio limitador
+            rate_limiter = TokenBucket(self.rate, SMTP_RATE_BURST or self.workers)
+        elif self.rate:
+            rate_limiter = crear_limitador(self.rate, SMTP_RATE_BURST or self.workers)
+        dispatcher = SMTPDispatcher(
+            workers=self.workers, rate_limiter=rate_limiter, pool=self.pool,
+            progress_callback=lambda mensaje: self.emit(CONECTANDO, mensaje), metricas=metricas, relays=self.relays
+        )
+        if self.relays:
+            self.relays.iniciar()
+        # Las boletas siguientes se leen y codifican en otro hilo mientras se envían las anteriores
+        def leer_adjunto(item):
+            with metricas.cronometro("lectura_adjunto"):
+                return cargar_adjunto(item, cache_adjuntos)
+
+        prefetcher = None
+        if self.prefetch > 0:
+            # Los adjuntos cuentan contra los límites hasta que su correo termina (soltar_adjunto):
+            # K por adelantado más los que están enviando los hilos
+            prefetcher = AttachmentPrefetcher(pendientes(), leer_adjunto, estimar=memoria_adjunto,
+                                              max_items=self.prefetch + dispatcher.workers)
+        pool_antes = dispatcher.pool.stats()
+        inicio = time.perf_counter()
+        try:
+            try:
+                dispatcher.dispatch(prefetcher or pendientes(), enviar_uno, on_success=on_success, on_error=on_error)
+            finally:
+                resultado.tiempos["envio_smtp"] = time.perf_counter() - inicio
+                if prefetcher is not None:
+                    prefetcher.cerrar()
+                    for nombre, valor in prefetcher.stats().items():
+                        metricas.incrementar(f"prefetch_{nombre}", valor)
+                if cache_adjuntos is not None:
+                    resultado.cache_adjuntos = cache_adjuntos.stats()
+                    cache_adjuntos.close()
+                self.emit(ETAPA, "📄 Generando constancias pendientes...", etapa="constancias")
+                resultado.constancias, fallidas = etapa_constancias.drain()
+            for contexto, e in fallidas:
+                registrar_error(contexto + (f"Constancia no generada: {str(e)}",))
+        except BaseException:
+            # Se conserva el CSV con los errores registrados hasta el corte
+            if reporte:
+                resultado.error_file = reporte.abortar()
+            raise
+        resultado.procesados = getattr(registros, "leidos", leidos["limpios"] + leidos["invalidos"])
+        resultado.tiempos["validacion"] = leidos["segundos"]
+        metricas.registrar_etapa("carga_validacion", leidos["segundos"])
+        metricas.incrementar("destinatarios_leidos", resultado.procesados)
+        metricas.incrementar("destinatarios_invalidos", leidos["invalidos"])
+        if resultado.preflight is None:
+            resultado.preflight = {
+                "total": leidos["limpios"], "faltantes": faltantes, "huerfanos": indice.huerfanos(dnis),
+                "invalidos": muestra_invalidos, "total_invalidos": leidos["invalidos"],
+            }
+        resultado.tiempos["constancias_pdf"] = etapa_constancias.tiempo_pdf
+        resultado.tiempos["espera_constancias"] = etapa_constancias.tiempo_espera
+        metricas.registrar_etapa("envio_smtp", resultado.tiempos["envio_smtp"])
+        metricas.registrar_etapa("espera_constancias", etapa_constancias.tiempo_espera)
+        for segundos in getattr(etapa_constancias, "duraciones", ()):
+            metricas.observar("constancia_pdf", segundos)
+        metricas.incrementar("constancias_generadas", len(resultado.constancias))
+        metricas.incrementar("constancias_fallidas", len(fallidas))
+        # Veces que un hilo de envío esperó a que el pool de constancias tuviera lugar
+        metricas.incrementar("constancias_esperas_envio", getattr(etapa_constancias, "esperas_submit", 0))
+        for nombre in ("aciertos", "aciertos_contenido", "fallos", "desalojados"):
+            if nombre in resultado.cache_adjuntos:
+                metricas.incrementar(f"cache_adjuntos_{nombre}", resultado.cache_adjuntos[nombre])
+        resultado.pool_stats = dispatcher.pool.stats()
+        if self.relays:
+            stats_tasa = self.relays.stats_tasa
+            resultado.relays = self.relays.stats_relays(resultado.tiempos["envio_smtp"])
+            for nombre, datos in resultado.relays.items():
+                for clave in ("enviados", "rechazos", "failovers"):
+                    metricas.incrementar(f"relay_{nombre_metrica(nombre)}_{clave}", datos[clave])
+        else:
+            stats_tasa = getattr(dispatcher.rate_limiter, "stats", None)
+        resultado.control_tasa = dict(stats_tasa() if stats_tasa else {}, reintentos=dispatcher.reintentos)
+
+        # Reporte
+        resultado.errores.sort(key=lambda fila: fila[0])
+        if reporte and reporte.total:
+            self.emit(ETAPA, "📝 Guardando reporte de errores...", etapa="reporte")
+            with metricas.cronometro("reporte_errores", etapa=True):
+                resultado.error_file = reporte.cerrar()
+        # El pool puede compartirse entre envíos: se registra solo lo de esta ejecución
+        for nombre, valor in resultado.pool_stats.items():
+            if nombre != "idle":
+                metricas.incrementar(f"pool_{nombre}", valor - pool_antes[nombre])
+        metricas.incrementar("reintentos_transitorios", dispatcher.reintentos)
+        resultado.metrics_file = metricas.escribir(self.metrics_file)
+        logger.info("Tiempos por etapa (s): %s", {k: round(v, 2) for k, v in resultado.tiempos.items()})
+        if resultado.omitidos:
+            logger.info(f"{resultado.omitidos} destinatarios omitidos por estar ya enviados en {periodo}.")
+        self.emit(FIN, resultado=resultado)
+        return resultado
+
+    def verificar(self, registros, indice):
+        """
+        Pasada previa de verificación (solo con `confirmar`): valida los destinatarios y los cruza
+        con el índice de boletas en streaming, sin conservar los registros. De las filas inválidas
+        se guardan el total y las primeras MUESTRA_INVALIDOS (el detalle queda en el reporte de errores).
+        :return: dict de reporte_preflight con invalidos y total_invalidos
+        """
+        invalidos = []
+        total_invalidos = 0
+
+        def contar_invalido(fila):
+            nonlocal total_invalidos
+            total_invalidos += 1
+            if len(invalidos) < MUESTRA_INVALIDOS:
+                invalidos.append(fila)
+
+        preflight = reporte_preflight(self.validar(registros, contar_invalido), indice)
+        preflight["invalidos"] = invalidos
+        preflight["total_invalidos"] = total_invalidos
+        return preflight
+
+    def simular(self, source, mes, path_boletas, anio=None):
+        """
+        Ejecuta todas las etapas salvo el envío SMTP (sin conexiones, journal ni constancias):
+        validación, índice de boletas, plantillas y armado MIME de cada correo.
+        :param anio: año del período (ver run)
+        :return: DryRunReport con las observaciones y el tiempo estimado de envío
+        """
+        periodo = periodo_envio(mes, anio)
+        reporte = DryRunReport(mes, periodo)
+
+        registros = self.cargar(source)
+        self.emit(ETAPA, "🔍 Indexando las boletas del mes...", etapa="preflight")
+        indice = self.indexar(path_boletas, mes)
+
+        # Una sola pasada en streaming: se valida, se cruza con el índice y se arma cada correo
+        self.emit(ETAPA, "🧪 Armando los correos sin enviarlos...", etapa="simulacion")
+        plantillas = plantillas_compiladas()
+        builder = MessageBuilder()
+        mes_capitalizado = mes.capitalize()
+        ya_enviados = self.journal.enviados(periodo) if self.reanudar else set()
+        cache_adjuntos = self.adjuntos() if self.adjuntos else None
+        dnis = set()
+        limpios = 0
+        tiempo_armado = 0.0
+        inicio = time.perf_counter()
+        try:
+            for n, recipient in enumerate(self.validar(registros, reporte.invalidos.append), start=1):
+                limpios = n
+                fila, nombre, email, dni = recipient["fila"], recipient["nombre"], recipient["email"], recipient["dni"]
+                dnis.add(dni)
+                if dni not in indice:
+                    reporte.faltantes.append((fila, nombre, dni))
+                    continue
+                if dni in ya_enviados:
+                    reporte.omitidos += 1
+                    continue
+                boleta = indice.get(dni)
+                item = SendItem(n, fila, nombre, email, dni, boleta.path,
+                                valores_destinatario(recipient, mes_capitalizado), boleta=boleta)
+                inicio_armado = time.perf_counter()
+                try:
+                    raw, _ = self.armar(builder, plantillas, item, cache_adjuntos)
+                except Exception as e:
+                    reporte.errores_armado.append(item.contexto + (str(e),))
+                    continue
+                finally:
+                    tiempo_armado += time.perf_counter() - inicio_armado
+                reporte.listos += 1
+                reporte.bytes_total += len(raw)
+        finally:
+            if cache_adjuntos is not None:
+                cache_adjuntos.close()
+        reporte.procesados = getattr(registros, "leidos", limpios + len(reporte.invalidos))
+        reporte.huerfanos = indice.huerfanos(dnis)
+        reporte.tiempos["armado"] = tiempo_armado
+        reporte.tiempos["validacion"] = time.perf_counter() - inicio - tiempo_armado
+
+        workers = self.workers or SMTP_WORKERS
+        # Con varias cuentas la tasa total es la suma de las tasas de cada relay, acotada por `rate`
+        if self.relays:
+            rate = sum(r.tasa for r in self.relays.relays)
+            if self.rate:
+                rate = min(rate, self.rate)
+        else:
+            rate = self.rate or SMTP_RATE_PER_SECOND
+        tasa_maxima = (SMTP_RATE_MAX_PER_SECOND or rate * 4) if SMTP_RATE_ADAPTIVE else None
+        if tasa_maxima and self.relays and self.rate:
+            tasa_maxima = min(tasa_maxima, self.rate)
+        reporte.estimacion = estimar_tiempo_envio(
+            reporte.listos, rate, workers, burst=SMTP_RATE_BURST or workers,
+            armado_medio=reporte.tiempos["armado"] / reporte.listos if reporte.listos else 0.0,
+            latencias=latencias_previas(self.metrics_file),
+            tasa_maxima=tasa_maxima,
+        )
+        if self.relays:
+            reporte.estimacion["cuota_restante"] = self.relays.cuota_restante()
+        self.emit(FIN, resultado=reporte)
+        return reporte
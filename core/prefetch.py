@@ -0,0 +1,131 @@
+"""
+Lectura anticipada de adjuntos durante el envío.
+
+Sin prefetch, cada hilo de envío lee la boleta de la carpeta compartida justo antes de enviarla,
+de modo que la latencia del disco/SMB y la del servidor SMTP se suman. AttachmentPrefetcher
+recorre los elementos pendientes en un hilo lector que carga y codifica los próximos adjuntos
+mientras los correos anteriores se están transmitiendo. La cola está acotada en cantidad y en
+memoria, así nunca se carga el mes completo en RAM.
+"""
+import threading
+import logging
+from collections import deque
+from .config import PREFETCH_ADJUNTOS, PREFETCH_MAX_MB
+
+logger = logging.getLogger(__name__)
+
+_FIN = object()
+
+
+class AttachmentPrefetcher:
+    """
+    Iterador que entrega los elementos de `items` con su adjunto ya cargado.
+    El hilo lector llama a cargar(item) -> (adjunto_base64, pdf_bytes) y lo guarda en `item.adjunto`;
+    si la carga falla el elemento se entrega sin adjunto y el armado lo vuelve a intentar
+    (y registra el error como siempre).
+    Los límites cuentan todos los adjuntos cargados hasta que el consumidor llama a
+    `liberar(item)` (en cola, esperando en el despachador o enviándose), de modo que
+    `max_bytes` acota la memoria real; el lector espera a tener espacio antes de cargar.
+    :param items: iterable de elementos a enviar (se consume desde el hilo lector)
+    :param cargar: función que lee y codifica el adjunto de un elemento
+    :param max_items: adjuntos cargados a la vez como máximo (K)
+    :param max_bytes: memoria máxima de los adjuntos cargados; un adjunto más grande pasa solo
+    :param estimar: función item -> bytes que ocupará su adjunto (para reservar antes de leerlo)
+    """
+
+    def __init__(self, items, cargar, max_items=None, max_bytes=None, estimar=None):
+        self.items = items
+        self.cargar = cargar
+        self.estimar = estimar
+        self.max_items = max(1, PREFETCH_ADJUNTOS if max_items is None else max_items)
+        self.max_bytes = PREFETCH_MAX_MB * 1024 * 1024 if max_bytes is None else max_bytes
+        self._cola = deque()
+        # id(item) -> (item, bytes reservados) de los adjuntos cargados y aún no liberados
+        self._en_memoria = {}
+        self._bytes = 0
+        self._cond = threading.Condition()
+        self._cerrado = False
+        self._error = None
+        self.esperas_lector = 0
+        self.esperas_consumidor = 0
+        self._hilo = threading.Thread(target=self._leer, name="prefetch-adjuntos", daemon=True)
+        self._hilo.start()
+
+    def _hay_espacio(self, tamano):
+        if not self._en_memoria:
+            return True
+        return len(self._en_memoria) < self.max_items and self._bytes + tamano <= self.max_bytes
+
+    def _reservar(self, item, tamano):
+        """Ajusta los bytes reservados de un adjunto (bajo self._cond)."""
+        clave = id(item)
+        if clave in self._en_memoria:
+            self._bytes -= self._en_memoria[clave][1]
+        self._en_memoria[clave] = (item, tamano)
+        self._bytes += tamano
+
+    def _leer(self):
+        try:
+            for item in self.items:
+                estimado = self.estimar(item) if self.estimar else 0
+                with self._cond:
+                    if not self._cerrado and not self._hay_espacio(estimado):
+                        self.esperas_lector += 1
+                    while not self._cerrado and not self._hay_espacio(estimado):
+                        self._cond.wait()
+                    if self._cerrado:
+                        return
+                    self._reservar(item, estimado)
+                try:
+                    item.adjunto = self.cargar(item)
+                    tamano = sum(len(parte) for parte in item.adjunto)
+                except Exception as e:
+                    logger.warning(f"No se pudo leer por adelantado {getattr(item, 'pdf_path', item)}: {str(e)}")
+                    tamano = 0
+                with self._cond:
+                    if self._cerrado:
+                        return
+                    self._reservar(item, tamano)
+                    self._cola.append(item)
+                    self._cond.notify_all()
+        except BaseException as e:
+            self._error = e
+        finally:
+            with self._cond:
+                self._cola.append(_FIN)
+                self._cond.notify_all()
+
+    def __iter__(self):
+        while True:
+            with self._cond:
+                if not self._cola:
+                    self.esperas_consumidor += 1
+                while not self._cola:
+                    self._cond.wait()
+                item = self._cola.popleft()
+            if item is _FIN:
+                if self._error is not None:
+                    raise self._error
+                return
+            yield item
+
+    def liberar(self, item):
+        """El consumidor terminó con el adjunto de `item` (enviado o fallido): libera su espacio."""
+        with self._cond:
+            liberado = self._en_memoria.pop(id(item), None)
+            if liberado is not None:
+                self._bytes -= liberado[1]
+                self._cond.notify_all()
+
+    def cerrar(self):
+        """Detiene el hilo lector (p. ej. si el envío se interrumpe) y libera los adjuntos en cola."""
+        with self._cond:
+            self._cerrado = True
+            self._cola.clear()
+            self._en_memoria.clear()
+            self._bytes = 0
+            self._cond.notify_all()
+        self._hilo.join(timeout=5)
+
+    def stats(self):
+        return {"esperas_lector": self.esperas_lector, "esperas_consumidor": self.esperas_consumidor}
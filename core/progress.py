@@ -0,0 +1,133 @@
+import queue
+import time
+from collections import deque
+
+# Tipos de evento publicados por el pipeline
+ETAPA = "etapa"
+CONECTANDO = "conectando"
+ENVIANDO = "enviando"
+ENVIADO = "enviado"
+ERROR = "error"
+OMITIDO = "omitido"
+FIN = "fin"
+
+
+class ProgressEvent:
+    """
+    Evento de avance del pipeline.
+    :param tipo: uno de ETAPA, CONECTANDO, ENVIANDO, ENVIADO, ERROR, OMITIDO, FIN
+    :param mensaje: texto listo para mostrar (puede ser vacío)
+    :param datos: información adicional del evento (fila, dni, n, total, ...)
+    """
+    __slots__ = ("tipo", "mensaje", "datos")
+
+    def __init__(self, tipo, mensaje="", **datos):
+        self.tipo = tipo
+        self.mensaje = mensaje
+        self.datos = datos
+
+    def __repr__(self):
+        return f"ProgressEvent({self.tipo!r}, {self.mensaje!r}, {self.datos!r})"
+
+
+# Segundos de historial para calcular la velocidad actual
+VENTANA_VELOCIDAD = 10.0
+
+
+class ProgressSnapshot:
+    """Estado agregado del envío en un instante (lo que la interfaz necesita dibujar)."""
+    __slots__ = ("total", "enviados", "fallidos", "omitidos", "mensaje", "velocidad", "eta", "terminado")
+
+    def __init__(self, total, enviados, fallidos, omitidos, mensaje, velocidad, eta, terminado):
+        self.total = total
+        self.enviados = enviados
+        self.fallidos = fallidos
+        self.omitidos = omitidos
+        self.mensaje = mensaje
+        self.velocidad = velocidad
+        self.eta = eta
+        self.terminado = terminado
+
+    @property
+    def hechos(self):
+        return self.enviados + self.fallidos + self.omitidos
+
+    @property
+    def restantes(self):
+        return max(0, self.total - self.hechos)
+
+
+class ProgressAggregator:
+    """
+    Recoge los eventos del pipeline desde los hilos de envío en una cola thread-safe y los
+    resume bajo demanda. La interfaz llama a `drenar()` a un ritmo fijo (p. ej. 10 veces por
+    segundo) en lugar de recibir una actualización por cada correo.
+    Uso: pipeline.subscribe(agregador.publicar)
+    """
+
+    def __init__(self):
+        self._cola = queue.SimpleQueue()
+        self.total = 0
+        self.enviados = 0
+        self.fallidos = 0
+        self.omitidos = 0
+        self.mensaje = ""
+        self.terminado = False
+        self._enviando = False
+        self._muestras = deque()
+
+    def publicar(self, evento):
+        """Suscriptor del pipeline: solo encola (se llama desde cualquier hilo)."""
+        self._cola.put(evento)
+
+    def _aplicar(self, evento):
+        if evento.mensaje:
+            self.mensaje = evento.mensaje
+        tipo = evento.tipo
+        if tipo == ETAPA and evento.datos.get("etapa") == "envio":
+            self.total = evento.datos.get("total") or 0
+            self._enviando = True
+            self._muestras.clear()
+        elif tipo == ENVIANDO and evento.datos.get("total"):
+            # Sin verificación previa el total es una estimación que se conoce al empezar a leer la hoja
+            self.total = evento.datos["total"]
+        elif tipo == ENVIADO:
+            self.enviados += 1
+        elif tipo == ERROR and self._enviando:
+            self.fallidos += 1
+        elif tipo == OMITIDO:
+            self.omitidos += 1
+        elif tipo == FIN:
+            self.terminado = True
+
+    def _velocidad(self, ahora, hechos):
+        self._muestras.append((ahora, hechos))
+        while len(self._muestras) > 2 and ahora - self._muestras[0][0] > VENTANA_VELOCIDAD:
+            self._muestras.popleft()
+        inicio, hechos_inicio = self._muestras[0]
+        if ahora - inicio <= 0:
+            return 0.0
+        return (hechos - hechos_inicio) / (ahora - inicio)
+
+    def drenar(self):
+        """
+        Aplica todos los eventos pendientes y devuelve un ProgressSnapshot,
+        o None si no llegó ningún evento desde la última llamada.
+        """
+        hubo_eventos = False
+        while True:
+            try:
+                evento = self._cola.get_nowait()
+            except queue.Empty:
+                break
+            self._aplicar(evento)
+            hubo_eventos = True
+        if not hubo_eventos:
+            return None
+        hechos = self.enviados + self.fallidos + self.omitidos
+        velocidad = self._velocidad(time.monotonic(), hechos) if self._enviando else 0.0
+        restantes = max(0, self.total - hechos)
+        eta = restantes / velocidad if velocidad > 0 else None
+        return ProgressSnapshot(
+            self.total, self.enviados, self.fallidos, self.omitidos, self.mensaje, velocidad, eta, self.terminado
+        )
@@ -0,0 +1,156 @@
+import random
+import threading
+import time
+import logging
+from .config import (
+    SMTP_RATE_PER_SECOND, SMTP_RATE_ADAPTIVE, SMTP_RATE_MIN_PER_SECOND, SMTP_RATE_MAX_PER_SECOND,
+    SMTP_RATE_WINDOW, SMTP_BACKOFF_BASE, SMTP_BACKOFF_MAX,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Limitador de envíos compartido entre hilos (token bucket).
+    :param rate: tokens que se reponen por segundo (correos/segundo)
+    :param capacity: máximo de tokens acumulables (ráfaga permitida)
+    """
+
+    def __init__(self, rate, capacity=None):
+        if rate <= 0:
+            raise ValueError("La tasa de envío debe ser mayor que cero")
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity else max(1.0, self.rate))
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def try_acquire(self, tokens=1):
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens=1):
+        """Bloquea hasta disponer de `tokens` y los consume."""
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                espera = (tokens - self._tokens) / self.rate
+            time.sleep(espera)
+
+
+class AdaptiveRateController(TokenBucket):
+    """
+    Token bucket cuya tasa se ajusta según las respuestas del servidor SMTP (AIMD):
+    - tras `ventana` envíos exitosos seguidos, la tasa sube un `paso` (hasta `max_rate`);
+    - ante un rechazo transitorio (421/451/4.7.x) la tasa se reduce a la mitad (hasta `min_rate`)
+      y todos los hilos se pausan un tiempo exponencial con jitter antes de reintentar.
+    :param rate: tasa inicial (correos/segundo)
+    :param capacity: ráfaga permitida
+    :param min_rate: tasa mínima
+    :param max_rate: tasa máxima
+    :param ventana: éxitos consecutivos necesarios para subir la tasa
+    :param backoff_base: espera base (s) del primer reintento
+    :param backoff_max: espera máxima (s) entre reintentos
+    """
+
+    def __init__(self, rate, capacity=None, min_rate=None, max_rate=None, ventana=None,
+                 backoff_base=None, backoff_max=None):
+        super().__init__(rate, capacity)
+        self.min_rate = min(self.rate, float(min_rate or SMTP_RATE_MIN_PER_SECOND))
+        self.max_rate = max(self.rate, float(max_rate or self.rate * 4))
+        self.paso = max(self.rate * 0.1, 0.05)
+        self.ventana = ventana or SMTP_RATE_WINDOW
+        self.backoff_base = backoff_base or SMTP_BACKOFF_BASE
+        self.backoff_max = backoff_max or SMTP_BACKOFF_MAX
+        self._exitos = 0
+        self._pausa_hasta = 0.0
+        self.aumentos = 0
+        self.reducciones = 0
+        self.tasa_minima_usada = self.rate
+        self.tasa_maxima_usada = self.rate
+
+    def _refill(self):
+        ahora = time.monotonic()
+        if ahora < self._pausa_hasta:
+            # Durante la pausa no se reponen tokens
+            self._last = ahora
+            return
+        super()._refill()
+
+    def acquire(self, tokens=1):
+        while True:
+            with self._lock:
+                pausa = self._pausa_hasta - time.monotonic()
+            if pausa <= 0:
+                break
+            time.sleep(pausa)
+        super().acquire(tokens)
+
+    def espera_reintento(self, intento):
+        """Espera exponencial con jitter para el reintento número `intento` (desde 1)."""
+        tope = min(self.backoff_max, self.backoff_base * (2 ** (intento - 1)))
+        return random.uniform(tope / 2, tope)
+
+    def registrar_exito(self):
+        with self._lock:
+            self._exitos += 1
+            if self._exitos < self.ventana or self.rate >= self.max_rate:
+                return
+            self._exitos = 0
+            self._refill()
+            self.rate = min(self.max_rate, self.rate + self.paso)
+            self.aumentos += 1
+            self.tasa_maxima_usada = max(self.tasa_maxima_usada, self.rate)
+        logger.debug("Tasa de envío aumentada a %.2f correos/s", self.rate)
+
+    def registrar_rechazo(self, intento=1):
+        """
+        Registra un rechazo transitorio del servidor: reduce la tasa y pausa a todos los hilos.
+        :return: segundos de espera antes de reintentar
+        """
+        espera = self.espera_reintento(intento)
+        with self._lock:
+            ahora = time.monotonic()
+            self._refill()
+            self._exitos = 0
+            # Los rechazos que llegan durante una pausa vigente son del mismo episodio: se reduce una vez
+            if ahora >= self._pausa_hasta:
+                self.rate = max(self.min_rate, self.rate / 2)
+                self.reducciones += 1
+                self.tasa_minima_usada = min(self.tasa_minima_usada, self.rate)
+            self._tokens = 0.0
+            self._pausa_hasta = max(self._pausa_hasta, ahora + espera)
+        logger.warning("Servidor SMTP limitando envíos: tasa reducida a %.2f correos/s, pausa de %.1fs",
+                       self.rate, espera)
+        return espera
+
+    def stats(self):
+        with self._lock:
+            return {
+                "tasa": round(self.rate, 3),
+                "tasa_minima": round(self.tasa_minima_usada, 3),
+                "tasa_maxima": round(self.tasa_maxima_usada, 3),
+                "aumentos": self.aumentos,
+                "reducciones": self.reducciones,
+            }
+
+
+def crear_limitador(rate=None, capacity=None):
+    """Limitador de envíos según config: adaptativo (por defecto) o de tasa fija."""
+    rate = rate or SMTP_RATE_PER_SECOND
+    if SMTP_RATE_ADAPTIVE:
+        return AdaptiveRateController(rate, capacity, max_rate=SMTP_RATE_MAX_PER_SECOND or None)
+    return TokenBucket(rate, capacity)
@@ -0,0 +1,110 @@
+import os
+import csv
+import logging
+
+logger = logging.getLogger(__name__)
+
+COLUMNAS_REQUERIDAS = ("nombre", "email", "dni")
+EXTENSIONES_EXCEL = (".xlsx", ".xlsm")
+EXTENSIONES_CSV = (".csv",)
+
+
+class RecipientSourceError(Exception):
+    """El archivo de destinatarios no se puede leer o no tiene el formato esperado."""
+
+
+def _texto(valor):
+    if valor is None:
+        return ""
+    # openpyxl devuelve los DNI numéricos como int/float
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    return str(valor).strip()
+
+
+class RecipientSource:
+    """
+    Fuente de destinatarios en streaming (Excel con openpyxl read_only o CSV).
+    Al iterar produce diccionarios {"fila", "nombre", "email", "dni", ...} uno a uno, sin cargar
+    la hoja completa en memoria; las columnas adicionales se incluyen con su nombre en
+    minúsculas. Las filas sin nombre, email o dni se omiten.
+    :param path: ruta al archivo .xlsx/.xlsm/.csv
+    """
+
+    def __init__(self, path):
+        if not path or not os.path.exists(path):
+            raise RecipientSourceError("Debes seleccionar un archivo Excel válido.")
+        self.path = path
+        self.extension = os.path.splitext(path)[1].lower()
+        if self.extension not in EXTENSIONES_EXCEL + EXTENSIONES_CSV:
+            raise RecipientSourceError(f"Formato no soportado: {self.extension or 'sin extensión'}")
+        self.total_estimado = None
+        self.leidos = 0
+
+    def __len__(self):
+        if self.total_estimado is None:
+            raise TypeError("Total de destinatarios desconocido")
+        return self.total_estimado
+
+    def __iter__(self):
+        self.leidos = 0
+        filas = self._iter_excel() if self.extension in EXTENSIONES_EXCEL else self._iter_csv()
+        for numero_fila, valores in filas:
+            registro = {"fila": numero_fila}
+            registro.update({col: _texto(valor) for col, valor in valores.items()})
+            if not all(registro[col] for col in COLUMNAS_REQUERIDAS):
+                continue
+            self.leidos += 1
+            yield registro
+
+    def _indices(self, cabecera):
+        columnas = [_texto(c).lower() for c in cabecera]
+        faltantes = [c for c in COLUMNAS_REQUERIDAS if c not in columnas]
+        if faltantes:
+            raise RecipientSourceError("El Excel debe contener: nombre, email y dni.")
+        # Se conservan también las columnas adicionales (variables extra de la plantilla)
+        indices = {}
+        for idx, col in enumerate(columnas):
+            if col and col != "fila" and col not in indices:
+                indices[col] = idx
+        return indices
+
+    def _iter_excel(self):
+        from openpyxl import load_workbook
+        try:
+            wb = load_workbook(self.path, read_only=True, data_only=True)
+        except Exception as e:
+            raise RecipientSourceError(f"Error al leer Excel: {str(e)}") from e
+        try:
+            ws = wb.active
+            filas = ws.iter_rows(values_only=True)
+            cabecera = next(filas, None)
+            if cabecera is None:
+                return
+            indices = self._indices(cabecera)
+            if ws.max_row:
+                self.total_estimado = max(0, ws.max_row - 1)
+            for numero_fila, fila in enumerate(filas, start=2):
+                yield numero_fila, {
+                    col: fila[idx] if idx < len(fila) else None for col, idx in indices.items()
+                }
+        finally:
+            wb.close()
+
+    def _iter_csv(self):
+        with open(self.path, newline="", encoding="utf-8-sig") as f:
+            muestra = f.read(4096)
+            f.seek(0)
+            try:
+                dialecto = csv.Sniffer().sniff(muestra, delimiters=",;\t")
+            except csv.Error:
+                dialecto = csv.excel
+            filas = csv.reader(f, dialecto)
+            cabecera = next(filas, None)
+            if cabecera is None:
+                return
+            indices = self._indices(cabecera)
+            for numero_fila, fila in enumerate(filas, start=2):
+                yield numero_fila, {
+                    col: fila[idx] if idx < len(fila) else None for col, idx in indices.items()
+                }
@@ -0,0 +1,305 @@
+"""
+Envío repartido entre varias cuentas o relays SMTP.
+
+Las cuentas se listan en SMTP_ACCOUNTS_FILE (JSON), cada una con su tasa y su cuota diaria:
+
+    [
+        {"nombre": "rrhh", "servidor": "smtp.gmail.com", "puerto": 465, "usuario": "rrhh@clinica.pe",
+         "password_env": "RRHH_PASSWORD", "tasa": 2, "cuota_diaria": 2000, "peso": 2},
+        {"nombre": "relay", "servidor": "10.0.0.5", "puerto": 25, "seguridad": "ninguna", "usuario": "",
+         "remitente": "boletas@clinica.pe", "tasa": 5}
+    ]
+
+Los destinatarios se reparten con round-robin ponderado por `peso`. Si un relay rechaza
+temporalmente (421/451/4.7.x) se pausa y el correo se reintenta por otro; si falla la conexión,
+la autenticación o el proveedor bloquea la cuenta (cuota agotada), el relay se desactiva para el
+resto del envío. La cuota diaria se lleva en el registro de envíos, así se respeta entre ejecuciones.
+"""
+import os
+import re
+import json
+import time
+import smtplib
+import threading
+import logging
+from datetime import date
+from .config import SMTP_ACCOUNTS_FILE, SMTP_RATE_PER_SECOND, SMTP_RATE_BURST, SMTP_WORKERS
+from .rate_limiter import crear_limitador
+from . import smtp_pool
+from .smtp_pool import SMTPConnectionPool, SMTPPoolError, PUERTOS_SEGURIDAD
+
+logger = logging.getLogger(__name__)
+
+SEGURIDADES = ("ssl", "starttls", "ninguna")
+
+
+class RelayConfigError(Exception):
+    """El archivo de cuentas SMTP no es válido."""
+
+
+def es_fallo_de_relay(e):
+    """True si el error es de la cuenta o relay (no del destinatario) y conviene pasar a otro."""
+    if isinstance(e, (SMTPPoolError, smtplib.SMTPAuthenticationError, smtplib.SMTPSenderRefused)):
+        return True
+    if isinstance(e, smtplib.SMTPResponseException):
+        mensaje = e.smtp_error.decode("utf-8", "replace") if isinstance(e.smtp_error, bytes) else str(e.smtp_error)
+        # 5.4.5: cuota diaria de la cuenta agotada (Gmail/Google Workspace)
+        return mensaje.lstrip().startswith("5.4.5")
+    return False
+
+
+class Relay:
+    """
+    Cuenta o relay SMTP con su propio pool de sesiones, limitador de tasa y cuota diaria.
+    Nunca usa los datos de la cuenta principal (SMTP_SERVER, EMAIL_USER, EMAIL_PASSWORD).
+    :param nombre: identificador en reportes y en el registro de cuotas
+    :param servidor: host SMTP (obligatorio)
+    :param puerto: por defecto 465 (ssl), 587 (starttls) o 25 (ninguna)
+    :param seguridad: "ssl", "starttls" o "ninguna"
+    :param usuario: cuenta para AUTH (vacío o ausente = relay sin autenticación)
+    :param password: contraseña de `usuario` (obligatoria si hay usuario)
+    :param remitente: dirección From de los correos enviados por este relay (por defecto `usuario`)
+    :param tasa: correos por segundo iniciales (por defecto SMTP_RATE_PER_SECOND)
+    :param cuota_diaria: máximo de correos por día calendario (0 = sin límite)
+    :param peso: proporción de destinatarios que recibe en el reparto
+    """
+
+    def __init__(self, nombre, servidor=None, puerto=None, usuario=None, password=None, seguridad="ssl",
+                 remitente=None, tasa=None, cuota_diaria=0, peso=1, workers=None):
+        if seguridad not in SEGURIDADES:
+            raise RelayConfigError(f"Relay {nombre}: seguridad debe ser una de {', '.join(SEGURIDADES)}")
+        if peso <= 0:
+            raise RelayConfigError(f"Relay {nombre}: el peso debe ser mayor que cero")
+        if not servidor:
+            raise RelayConfigError(f"Relay {nombre}: falta el servidor")
+        if usuario and password is None:
+            raise RelayConfigError(f"Relay {nombre}: falta la contraseña de {usuario} (password o password_env)")
+        if usuario and seguridad == "ninguna":
+            logger.warning(f"Relay {nombre}: la contraseña de {usuario} viaja sin cifrar (seguridad \"ninguna\")")
+        self.nombre = nombre
+        self.servidor = servidor
+        self.puerto = puerto or PUERTOS_SEGURIDAD[seguridad]
+        self.usuario = usuario or ""
+        self.password = password or ""
+        self.seguridad = seguridad
+        self.remitente = remitente or usuario or None
+        self.tasa = tasa or SMTP_RATE_PER_SECOND
+        self.cuota_diaria = int(cuota_diaria or 0)
+        self.peso = peso
+        self.pool = SMTPConnectionPool(connection_factory=self._conectar, max_idle=workers or SMTP_WORKERS)
+        self.limitador = crear_limitador(self.tasa, SMTP_RATE_BURST or None)
+        self.usados_hoy = 0
+        self.reiniciar()
+
+    def _conectar(self):
+        return smtp_pool.abrir_conexion_smtp(self.servidor, self.puerto, self.usuario, self.password, self.seguridad)
+
+    def reiniciar(self):
+        """Contadores y estado de un envío nuevo (el pool y la tasa aprendida se conservan)."""
+        self.enviados = 0
+        self.rechazos = 0
+        self.failovers = 0
+        self.suspendido_hasta = 0.0
+        self.desactivado = None
+        self._peso_actual = 0
+
+    def con_cuota(self):
+        return not self.cuota_diaria or self.usados_hoy < self.cuota_diaria
+
+    def cuota_restante(self):
+        return None if not self.cuota_diaria else max(0, self.cuota_diaria - self.usados_hoy)
+
+
+def _relay_desde_dict(datos, n):
+    datos = dict(datos)
+    nombre = datos.pop("nombre", None) or f"relay{n}"
+    password_env = datos.pop("password_env", None)
+    if password_env:
+        datos["password"] = os.getenv(password_env)
+        if datos["password"] is None and datos.get("usuario"):
+            raise RelayConfigError(f"Relay {nombre}: la variable de entorno {password_env} no está definida")
+    try:
+        return Relay(nombre, **datos)
+    except TypeError as e:
+        raise RelayConfigError(f"Relay {nombre}: {str(e)}") from e
+
+
+def cargar_relays(path=None, workers=None):
+    """
+    Lee las cuentas de SMTP_ACCOUNTS_FILE.
+    :return: lista de Relay, o [] si el archivo no existe
+    """
+    path = SMTP_ACCOUNTS_FILE if path is None else path
+    if not path or not os.path.exists(path):
+        return []
+    try:
+        with open(path, encoding="utf-8") as f:
+            cuentas = json.load(f)
+    except ValueError as e:
+        raise RelayConfigError(f"{path}: JSON inválido ({str(e)})") from e
+    if not isinstance(cuentas, list) or not cuentas:
+        raise RelayConfigError(f"{path}: se esperaba una lista con al menos una cuenta")
+    relays = [_relay_desde_dict(dict(datos, workers=workers), n) for n, datos in enumerate(cuentas, start=1)]
+    nombres = [relay.nombre for relay in relays]
+    if len(set(nombres)) != len(nombres):
+        raise RelayConfigError(f"{path}: los nombres de las cuentas deben ser únicos")
+    return relays
+
+
+class RelayRouter:
+    """
+    Reparte los envíos entre varios relays (round-robin ponderado suave: con pesos 2 y 1 la
+    secuencia es A, B, A, A, B, A, ...) respetando la cuota diaria y las pausas de cada uno.
+    Se comporta como un pool compuesto para el despachador (stats, metricas, close).
+    :param relays: lista de Relay
+    :param journal: SendJournal donde se lleva el uso diario de cada relay
+    """
+
+    def __init__(self, relays, journal=None):
+        if not relays:
+            raise RelayConfigError("Se necesita al menos un relay SMTP")
+        self.relays = relays
+        self.journal = journal
+        self._lock = threading.Lock()
+        self._fecha = None
+        self._metricas = None
+
+    @property
+    def metricas(self):
+        return self._metricas
+
+    @metricas.setter
+    def metricas(self, metricas):
+        self._metricas = metricas
+        for relay in self.relays:
+            relay.pool.metricas = metricas
+
+    def iniciar(self):
+        """Prepara un envío nuevo: reactiva los relays y carga el uso del día."""
+        with self._lock:
+            self._fecha = None
+            self._actualizar_dia()
+            for relay in self.relays:
+                relay.reiniciar()
+
+    def _actualizar_dia(self):
+        hoy = date.today().isoformat()
+        if hoy == self._fecha:
+            return
+        self._fecha = hoy
+        for relay in self.relays:
+            relay.usados_hoy = self.journal.uso_relay(relay.nombre, hoy) if self.journal else 0
+
+    def elegir(self):
+        """
+        Elige el relay del próximo intento y reserva una unidad de su cuota.
+        Si todos los relays activos están en pausa devuelve el que se libera antes.
+        :return: Relay o None si no queda ninguno activo con cuota
+        """
+        with self._lock:
+            self._actualizar_dia()
+            activos = [r for r in self.relays if r.desactivado is None and r.con_cuota()]
+            if not activos:
+                return None
+            ahora = time.monotonic()
+            disponibles = [r for r in activos if r.suspendido_hasta <= ahora]
+            if not disponibles:
+                disponibles = [min(activos, key=lambda r: r.suspendido_hasta)]
+            total = sum(r.peso for r in disponibles)
+            for relay in disponibles:
+                relay._peso_actual += relay.peso
+            elegido = max(disponibles, key=lambda r: r._peso_actual)
+            elegido._peso_actual -= total
+            elegido.usados_hoy += 1
+            return elegido
+
+    def confirmar(self, relay):
+        """Registra un envío exitoso por `relay`."""
+        with self._lock:
+            relay.enviados += 1
+            fecha = self._fecha
+        if self.journal:
+            self.journal.registrar_uso_relay(relay.nombre, fecha)
+
+    def liberar(self, relay):
+        """Devuelve la cuota reservada de un intento fallido."""
+        with self._lock:
+            relay.usados_hoy = max(0, relay.usados_hoy - 1)
+
+    def suspender(self, relay, segundos):
+        """Pausa un relay que está rechazando temporalmente; los envíos pasan a los demás."""
+        with self._lock:
+            relay.rechazos += 1
+            relay.failovers += 1
+            relay.suspendido_hasta = max(relay.suspendido_hasta, time.monotonic() + segundos)
+        logger.warning(f"Relay {relay.nombre} rechazando envíos: en pausa {segundos:.1f}s, se usan los demás")
+
+    def desactivar(self, relay, e):
+        """Saca un relay del envío en curso (conexión, autenticación o cuenta bloqueada)."""
+        with self._lock:
+            if relay.desactivado is None:
+                relay.desactivado = str(e)
+            relay.failovers += 1
+        logger.error(f"Relay {relay.nombre} desactivado para este envío: {str(e)}")
+
+    def stats(self):
+        """Estadísticas de los pools de todos los relays sumadas (mismas claves que SMTPConnectionPool)."""
+        total = {}
+        for relay in self.relays:
+            for nombre, valor in relay.pool.stats().items():
+                total[nombre] = total.get(nombre, 0) + valor
+        return total
+
+    def stats_tasa(self):
+        """Control de tasa de todos los relays sumado (mismas claves que AdaptiveRateController.stats)."""
+        total = {}
+        for relay in self.relays:
+            stats = getattr(relay.limitador, "stats", None)
+            for nombre, valor in (stats() if stats else {"tasa": relay.limitador.rate}).items():
+                total[nombre] = total.get(nombre, 0) + valor
+        return total
+
+    def stats_relays(self, segundos=None):
+        """
+        Envíos por relay en el envío en curso.
+        :param segundos: duración del envío, para calcular correos por segundo
+        """
+        with self._lock:
+            return {
+                relay.nombre: {
+                    "enviados": relay.enviados,
+                    "correos_por_segundo": relay.enviados / segundos if segundos else 0.0,
+                    "rechazos": relay.rechazos,
+                    "failovers": relay.failovers,
+                    "tasa": round(relay.limitador.rate, 3),
+                    "usados_hoy": relay.usados_hoy,
+                    "cuota_restante": relay.cuota_restante(),
+                    "desactivado": relay.desactivado,
+                }
+                for relay in self.relays
+            }
+
+    def cuota_restante(self):
+        """Correos que aún pueden enviarse hoy entre todos los relays (None = sin límite)."""
+        with self._lock:
+            self._actualizar_dia()
+            restantes = [relay.cuota_restante() for relay in self.relays]
+        return None if None in restantes else sum(restantes)
+
+    def close(self):
+        for relay in self.relays:
+            relay.pool.close()
+
+
+def nombre_metrica(nombre):
+    """Nombre de relay apto para métricas (minúsculas, dígitos y guiones bajos)."""
+    return re.sub(r"[^a-z0-9_]", "_", nombre.lower())
+
+
+def crear_router_relays(journal=None, workers=None):
+    """RelayRouter con las cuentas de SMTP_ACCOUNTS_FILE, o None si no hay archivo de cuentas."""
+    relays = cargar_relays(workers=workers)
+    if not relays:
+        return None
+    logger.info("Envío repartido entre %d cuentas SMTP: %s", len(relays), ", ".join(r.nombre for r in relays))
+    return RelayRouter(relays, journal)
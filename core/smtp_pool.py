@@ -0,0 +1,270 @@
+import ssl
+import time
+import smtplib
+import threading
+import logging
+from collections import deque
+from .config import (
+    SMTP_SERVER, SMTP_PORT, EMAIL_USER, EMAIL_PASSWORD, SMTP_WORKERS,
+    SMTP_MESSAGES_PER_CONNECTION, SMTP_POOL_IDLE_CHECK, SMTP_CONNECT_RETRIES,
+)
+
+logger = logging.getLogger(__name__)
+
+# Errores que indican que el servidor cerró la sesión: se reconecta y se reenvía
+ERRORES_DESCONEXION = (
+    smtplib.SMTPServerDisconnected,
+    ConnectionResetError,
+    BrokenPipeError,
+    ssl.SSLError,
+)
+
+
+# Puerto por defecto de cada modo de seguridad
+PUERTOS_SEGURIDAD = {"ssl": 465, "starttls": 587, "ninguna": 25}
+
+
+def abrir_conexion_smtp(servidor=None, puerto=None, usuario=None, password=None, seguridad="ssl"):
+    """
+    Abre una sesión SMTP. Sin `servidor` se usa la cuenta principal (SMTP_SERVER/EMAIL_USER);
+    con `servidor` solo se usan los datos recibidos, nunca las credenciales de la cuenta principal.
+    :param seguridad: "ssl" (SMTP_SSL), "starttls" o "ninguna" (p. ej. un relay interno)
+    :param usuario: cuenta para AUTH; vacío = relay sin autenticación
+    """
+    if servidor is None:
+        servidor, puerto, usuario, password = SMTP_SERVER, SMTP_PORT, EMAIL_USER, EMAIL_PASSWORD
+    puerto = puerto or PUERTOS_SEGURIDAD[seguridad]
+    if seguridad == "ssl":
+        server = smtplib.SMTP_SSL(servidor, puerto)
+    else:
+        server = smtplib.SMTP(servidor, puerto)
+        if seguridad == "starttls":
+            server.starttls()
+    if usuario:
+        server.login(usuario, password)
+    return server
+
+
+class SMTPPoolError(Exception):
+    """No se pudo establecer una conexión SMTP tras los reintentos."""
+
+
+class SMTPEnvioIncierto(smtplib.SMTPException):
+    """
+    La sesión se cortó después de empezar el DATA: el servidor pudo haber aceptado el correo.
+    No se reenvía automáticamente (podría llegar dos veces); se registra como error del destinatario.
+    """
+
+
+def _es_desconexion(e):
+    if isinstance(e, ERRORES_DESCONEXION):
+        return True
+    # 421: el servidor cierra el canal de transmisión
+    return isinstance(e, smtplib.SMTPResponseException) and e.smtp_code == 421
+
+
+# Códigos SMTP que indican limitación temporal del proveedor: se reintenta más tarde
+CODIGOS_TRANSITORIOS = (421, 450, 451, 452)
+
+
+def _respuesta_transitoria(codigo, mensaje):
+    if codigo in CODIGOS_TRANSITORIOS:
+        return True
+    if isinstance(mensaje, bytes):
+        mensaje = mensaje.decode("utf-8", "replace")
+    # Código extendido 4.7.x (p. ej. "4.7.0 Try again later"), enviado incluso con otros 4xx
+    return 400 <= codigo < 500 and str(mensaje).lstrip().startswith("4.7.")
+
+
+def es_error_transitorio(e):
+    """True si el servidor rechazó temporalmente el envío (421/451/4.7.x) y conviene reintentar."""
+    if isinstance(e, smtplib.SMTPRecipientsRefused):
+        return bool(e.recipients) and all(
+            _respuesta_transitoria(codigo, mensaje) for codigo, mensaje in e.recipients.values()
+        )
+    if isinstance(e, smtplib.SMTPResponseException):
+        return _respuesta_transitoria(e.smtp_code, e.smtp_error)
+    return False
+
+
+class _Conexion:
+    __slots__ = ("server", "last_used", "uses", "en_data")
+
+    def __init__(self, server):
+        self.server = server
+        self.last_used = time.monotonic()
+        self.uses = 0
+        # True desde que el envío en curso llegó al comando DATA (ver _vigilar_data)
+        self.en_data = False
+        _vigilar_data(self)
+
+
+def _vigilar_data(conn):
+    """
+    Marca `conn.en_data` cuando sendmail pasa a DATA. Un corte antes (conexión, MAIL, RCPT) deja
+    el correo sin entregar y se puede reenviar; desde DATA el servidor pudo haberlo aceptado.
+    """
+    data = getattr(conn.server, "data", None)
+    if data is None:
+        return
+
+    def data_vigilado(*args, **kwargs):
+        conn.en_data = True
+        return data(*args, **kwargs)
+
+    conn.server.data = data_vigilado
+
+
+def _envio_incierto(conn, e):
+    """SMTPEnvioIncierto si la sesión se cortó después del DATA, o None si se puede reenviar."""
+    # Un 421 ya es una respuesta del servidor (rechazo): solo un corte sin respuesta deja la entrega en duda
+    if not conn.en_data or not _es_desconexion(e) or es_error_transitorio(e):
+        return None
+    return SMTPEnvioIncierto(
+        f"se perdió la conexión después de enviar el contenido ({str(e)}); el correo pudo "
+        f"haberse entregado y no se reenvía automáticamente"
+    )
+
+
+class SMTPConnectionPool:
+    """
+    Pool de sesiones SMTP autenticadas reutilizables entre lotes y envíos.
+    - Las sesiones inactivas más de `idle_check` segundos se verifican con NOOP antes de reutilizarse.
+    - Si el servidor corta la sesión antes del DATA, se reconecta y se reenvía el mensaje; si la
+      corta después, el correo pudo haberse entregado y se devuelve SMTPEnvioIncierto.
+    :param connection_factory: callable que devuelve un servidor SMTP autenticado
+    :param max_idle: máximo de sesiones inactivas que se conservan abiertas
+    :param max_uses: correos por sesión antes de renovarla (0 = sin límite)
+    """
+
+    def __init__(self, connection_factory=None, max_idle=None, idle_check=None,
+                 max_uses=None, connect_retries=None):
+        self.connection_factory = connection_factory or abrir_conexion_smtp
+        self.max_idle = max_idle or SMTP_WORKERS
+        self.idle_check = SMTP_POOL_IDLE_CHECK if idle_check is None else idle_check
+        self.max_uses = SMTP_MESSAGES_PER_CONNECTION if max_uses is None else max_uses
+        self.connect_retries = max(1, connect_retries or SMTP_CONNECT_RETRIES)
+        self._idle = deque()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.reconnects = 0
+        self.noop_checks = 0
+        self.connect_failures = 0
+        # RunMetrics del envío en curso (lo asigna el despachador)
+        self.metricas = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "reconnects": self.reconnects,
+                "noop_checks": self.noop_checks,
+                "connect_failures": self.connect_failures,
+                "idle": len(self._idle),
+            }
+
+    def _cerrar(self, conn):
+        try:
+            conn.server.quit()
+        except Exception:
+            pass
+
+    def _conectar(self, on_connect=None):
+        ultimo_error = None
+        for intento in range(self.connect_retries):
+            if on_connect:
+                on_connect()
+            try:
+                inicio = time.perf_counter()
+                conn = _Conexion(self.connection_factory())
+                if self.metricas:
+                    self.metricas.observar("smtp_conexion", time.perf_counter() - inicio)
+                with self._lock:
+                    self.misses += 1
+                logger.info("Conexión SMTP establecida (%s).", threading.current_thread().name)
+                return conn
+            except Exception as e:
+                ultimo_error = e
+                with self._lock:
+                    self.connect_failures += 1
+                logger.warning(f"Error con servidor SMTP al conectar (intento {intento + 1}): {str(e)}")
+                time.sleep(min(2 ** intento, 10))
+        raise SMTPPoolError(str(ultimo_error)) from ultimo_error
+
+    def _sesion_viva(self, conn):
+        if time.monotonic() - conn.last_used < self.idle_check:
+            return True
+        with self._lock:
+            self.noop_checks += 1
+        try:
+            return conn.server.noop()[0] == 250
+        except Exception:
+            return False
+
+    def acquire(self, on_connect=None):
+        while True:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                return self._conectar(on_connect)
+            if self._sesion_viva(conn):
+                with self._lock:
+                    self.hits += 1
+                return conn
+            logger.info("Sesión SMTP inactiva descartada tras NOOP.")
+            self._cerrar(conn)
+
+    def release(self, conn, broken=False):
+        conn.last_used = time.monotonic()
+        if broken or (self.max_uses and conn.uses >= self.max_uses):
+            self._cerrar(conn)
+            return
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+        self._cerrar(conn)
+
+    def execute(self, func, on_connect=None):
+        """
+        Ejecuta func(server) con una sesión del pool. Si el servidor cae antes del DATA
+        (conexión, MAIL o RCPT), abre una nueva sesión y reintenta una vez el mismo mensaje; si cae
+        después, lanza SMTPEnvioIncierto sin reenviarlo. Los rechazos transitorios (421 por
+        limitación) no se reintentan aquí: el despachador espera antes de reenviar.
+        """
+        conn = self.acquire(on_connect)
+        try:
+            conn.uses += 1
+            conn.en_data = False
+            result = func(conn.server)
+        except Exception as e:
+            self.release(conn, broken=_es_desconexion(e))
+            incierto = _envio_incierto(conn, e)
+            if incierto is not None:
+                raise incierto from e
+            if not _es_desconexion(e) or es_error_transitorio(e):
+                raise
+            logger.warning(f"Sesión SMTP perdida ({str(e)}), reconectando y reenviando.")
+            with self._lock:
+                self.reconnects += 1
+            conn = self._conectar(on_connect)
+            try:
+                conn.uses += 1
+                conn.en_data = False
+                result = func(conn.server)
+            except Exception as e2:
+                self.release(conn, broken=_es_desconexion(e2))
+                incierto = _envio_incierto(conn, e2)
+                if incierto is not None:
+                    raise incierto from e2
+                raise
+        self.release(conn)
+        return result
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = list(self._idle), deque()
+        for conn in idle:
+            self._cerrar(conn)
@@ -0,0 +1,90 @@
+import os
+import re
+import threading
+from functools import lru_cache
+from .config import EMAIL_CONFIG_FILE, load_email_templates
+
+_RE_CAMPO = re.compile(r"\{([A-Za-z0-9_]+)\}")
+_RE_NO_ALFANUM = re.compile(r"[^A-Z0-9_]+")
+
+PIE_MESSAGE_ID = "<br><br><small><b>Identificador de envío (Message-ID):</b> {}</small>"
+
+
+class CompiledTemplate:
+    """
+    Plantilla parseada una sola vez en segmentos literales y variables {CAMPO}.
+    render() arma el texto con un único join; las variables sin valor se dejan tal cual.
+    """
+
+    def __init__(self, texto):
+        self.texto = texto
+        partes = _RE_CAMPO.split(texto)
+        # split alterna literal, campo, literal, campo, ..., literal
+        self._literales = partes[0::2]
+        self._campos = partes[1::2]
+        self.campos = frozenset(self._campos)
+
+    def render(self, valores):
+        partes = [self._literales[0]]
+        for campo, literal in zip(self._campos, self._literales[1:]):
+            partes.append(valores.get(campo, "{" + campo + "}"))
+            partes.append(literal)
+        return "".join(partes)
+
+
+@lru_cache(maxsize=32)
+def compilar(texto):
+    """CompiledTemplate para un texto; los textos ya vistos no se vuelven a parsear."""
+    return CompiledTemplate(texto)
+
+
+def renderizar(plantillas, valores, message_id=None):
+    """
+    Asunto y cuerpo HTML de un correo tal como se envía (con el Message-ID al pie).
+    Lo usan el envío y la vista previa del editor de plantilla.
+    :param plantillas: (asunto, cuerpo) como CompiledTemplate
+    :return: (asunto, html)
+    """
+    subject_template, body_template = plantillas
+    asunto = subject_template.render(valores)
+    html = body_template.render(valores)
+    if message_id:
+        html += PIE_MESSAGE_ID.format(message_id)
+    return asunto, html
+
+
+def nombre_campo(columna):
+    """Nombre de variable para una columna del Excel: 'Cargo actual' -> 'CARGO_ACTUAL'."""
+    return _RE_NO_ALFANUM.sub("_", str(columna).strip().upper()).strip("_")
+
+
+def valores_destinatario(recipient, mes_capitalizado):
+    """
+    Valores para las variables de la plantilla: {NOMBRE}, {MES} y una variable por cada
+    columna adicional del Excel (en mayúsculas).
+    """
+    valores = {nombre_campo(k): str(v) for k, v in recipient.items() if k != "fila" and v is not None}
+    valores["NOMBRE"] = str(recipient["nombre"])
+    valores["MES"] = mes_capitalizado
+    return valores
+
+
+_cache_lock = threading.Lock()
+_cache = {"mtime": None, "plantillas": None}
+
+
+def plantillas_compiladas():
+    """
+    Devuelve (asunto, cuerpo) como CompiledTemplate. Solo se relee y recompila
+    email_config.txt cuando cambia su fecha de modificación.
+    """
+    try:
+        mtime = os.stat(EMAIL_CONFIG_FILE).st_mtime_ns
+    except OSError:
+        mtime = None
+    with _cache_lock:
+        if _cache["plantillas"] is None or _cache["mtime"] != mtime:
+            subject, body = load_email_templates()
+            _cache["plantillas"] = (compilar(subject), compilar(body))
+            _cache["mtime"] = mtime
+        return _cache["plantillas"]
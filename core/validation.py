@@ -0,0 +1,43 @@
+import re
+
+EMAIL_RE = re.compile(r"^[\w\.-]+@[\w\.-]+\.\w+$")
+DNI_RE = re.compile(r"^[0-9]{8}$")
+
+
+def validar_destinatarios(recipients, on_error):
+    """
+    Normaliza y valida los destinatarios a medida que se leen, antes de que lleguen al envío:
+    produce los registros limpios uno a uno y pasa cada fila con error a `on_error`. Marca también
+    DNI y emails repetidos (se conserva la primera fila); de las filas ya vistas solo se guardan
+    su DNI y su email, no el registro, así la memoria no crece con el tamaño de la hoja.
+    :param recipients: iterable de registros {"fila", "nombre", "email", "dni", ...}
+    :param on_error: callable(fila) que recibe (fila, nombre, email, dni, motivo)
+    :return: generador de registros limpios
+    """
+    filas_dni = {}
+    filas_email = {}
+    match_dni = DNI_RE.match
+    match_email = EMAIL_RE.match
+    for n, recipient in enumerate(recipients, start=1):
+        fila = recipient.get("fila", n + 1)
+        nombre = recipient["nombre"]
+        email = str(recipient["email"]).strip()
+        dni = str(recipient["dni"]).strip()
+        if not match_dni(dni):
+            on_error((fila, nombre, email, dni, "DNI inválido"))
+            continue
+        if not match_email(email):
+            on_error((fila, nombre, email, dni, "Email inválido"))
+            continue
+        if dni in filas_dni:
+            on_error((fila, nombre, email, dni, f"DNI duplicado (ya figura en la fila {filas_dni[dni]})"))
+            continue
+        clave_email = email.lower()
+        if clave_email in filas_email:
+            on_error((fila, nombre, email, dni, f"Email duplicado (ya figura en la fila {filas_email[clave_email]})"))
+            continue
+        filas_dni[dni] = fila
+        filas_email[clave_email] = fila
+        limpio = dict(recipient)
+        limpio.update(fila=fila, email=email, dni=dni)
+        yield limpio
@@ -1,18 +1,55 @@
 import os
 import ttkbootstrap as tb
 from ttkbootstrap.constants import *
-from tkinter import filedialog, StringVar, messagebox
-from gui.email_template_modal import open_template_editor_modal
+from tkinter import filedialog, StringVar, BooleanVar, messagebox
 import threading
-import pandas as pd
-from core.email_sender import EmailSender
-from core.config import DEFAULT_PATH
+import time
+from datetime import datetime
+from core.config import DEFAULT_PATH, SMTP_ACCOUNTS_FILE
+from core.recipients import RecipientSource, RecipientSourceError
+from core.dry_run import formatear_reporte
+from core.progress import ProgressAggregator
+
+# Frecuencia de refresco del progreso mientras se envía (los hilos de envío solo encolan eventos)
+PROGRESS_FPS = 10
+
+# Módulos pesados que solo hacen falta al enviar o al editar la plantilla:
+# se precargan en segundo plano una vez dibujada la ventana
+WARM_UP_MODULES = (
+    "core.email_sender",
+    "openpyxl",
+    "reportlab.pdfgen.canvas",
+    "PyPDF2",
+    "tkhtmlview",
+)
+
 
 class EmailSenderGUI:
     # El método ahora solo llama a la función modularizada
     def open_template_editor_modal(self):
+        from gui.email_template_modal import open_template_editor_modal
         open_template_editor_modal(self.root)
 
+    @property
+    def sender(self):
+        """EmailSender creado bajo demanda (el núcleo de envío no se carga al iniciar)"""
+        with self._sender_lock:
+            if self._sender is None:
+                from core.email_sender import EmailSender
+                self._sender = EmailSender()
+            return self._sender
+
+    def warm_up_modules(self):
+        """Precargar en segundo plano los módulos pesados"""
+        def warm():
+            import importlib
+            for nombre in WARM_UP_MODULES:
+                try:
+                    importlib.import_module(nombre)
+                except Exception:
+                    pass
+        threading.Thread(target=warm, name="warm-up", daemon=True).start()
+
     def __init__(self, root):
         self.root = root
         self.root.title("📧 Sistema de Envío de Boletas - Clínica Santa Rosa")
@@ -34,21 +71,29 @@ class EmailSenderGUI:
             'dark': '#343A40'
         }
 
-        self.current_month = pd.Timestamp.now().strftime("%m")
+        self.current_month = datetime.now().strftime("%m")
         self.months = [
             ("01", "Enero"), ("02", "Febrero"), ("03", "Marzo"), ("04", "Abril"),
             ("05", "Mayo"), ("06", "Junio"), ("07", "Julio"), ("08", "Agosto"),
             ("09", "Septiembre"), ("10", "Octubre"), ("11", "Noviembre"), ("12", "Diciembre")
         ]
         self.mes_var = StringVar(value=next(name for num, name in self.months if num == self.current_month))
+        self.current_year = datetime.now().year
+        self.anio_var = StringVar(value=str(self.current_year))
+        # Reenviar también a quienes ya recibieron su boleta en el período (correcciones)
+        self.reenviar_var = BooleanVar(value=False)
         self.path_var = StringVar(value=DEFAULT_PATH)
         self.excel_path_var = StringVar(value="")
         self.status_var = StringVar(value="")
         self.progress_var = StringVar(value="")
+        self.counts_var = StringVar(value="")
         self.is_processing = False
 
-        self.sender = EmailSender()
+        self._sender = None
+        self.progreso = None
+        self._sender_lock = threading.Lock()
         self.build_gui()
+        self.root.after(200, self.warm_up_modules)
 
     def build_gui(self):
         # Frame principal con fondo degradado simulado
@@ -202,6 +247,34 @@ class EmailSenderGUI:
         )
         self.month_combo.pack(anchor="w", fill="x")
 
+        # Año del período: el registro de envíos distingue el enero de cada año
+        year_label = tb.Label(
+            month_frame,
+            text="📆 Año:",
+            font=("Segoe UI", 11, "bold"),
+            bootstyle="info"
+        )
+        year_label.pack(anchor="w", pady=(10, 8))
+
+        self.year_combo = tb.Combobox(
+            month_frame,
+            values=[str(anio) for anio in range(self.current_year - 2, self.current_year + 2)],
+            textvariable=self.anio_var,
+            font=("Segoe UI", 11),
+            bootstyle="info",
+            state="readonly",
+            width=25
+        )
+        self.year_combo.pack(anchor="w", fill="x")
+
+        self.reenviar_check = tb.Checkbutton(
+            month_frame,
+            text="🔁 Reenviar también a quienes ya recibieron su boleta en este período",
+            variable=self.reenviar_var,
+            bootstyle="warning-round-toggle"
+        )
+        self.reenviar_check.pack(anchor="w", pady=(12, 0))
+
     def create_paths_section(self, parent):
         """Crear sección de rutas y archivos"""
         paths_frame = tb.LabelFrame(
@@ -270,7 +343,7 @@ class EmailSenderGUI:
         
         info_text = """📋 Requisitos del archivo Excel:
 • Columnas: nombre, email, dni
-• Formato: .xlsx
+• Formato: .xlsx o .csv
 • Sin filas vacías en datos principales
 
 📁 Estructura de archivos:
@@ -352,11 +425,20 @@ class EmailSenderGUI:
         # Barra de progreso
         self.progress_bar = tb.Progressbar(
             progress_frame,
-            mode='indeterminate',
+            mode='determinate',
             bootstyle="success-striped",
             length=300
         )
-        self.progress_bar.pack(fill="x", pady=(0, 15))
+        self.progress_bar.pack(fill="x", pady=(0, 5))
+
+        # Enviados / fallidos / restantes
+        self.counts_label = tb.Label(
+            progress_frame,
+            textvariable=self.counts_var,
+            font=("Segoe UI", 9),
+            bootstyle="secondary"
+        )
+        self.counts_label.pack(anchor="w", pady=(0, 10))
         
         # Label de estado
         self.status_label = tb.Label(
@@ -384,15 +466,17 @@ class EmailSenderGUI:
 
         # Crear StringVars para cada estadística si no existen
         self.stat_vars = getattr(self, 'stat_vars', {})
-        for key in ["procesados", "enviados", "errores", "tiempo"]:
+        for key in ["procesados", "enviados", "errores", "tiempo", "velocidad", "eta"]:
             if key not in self.stat_vars:
-                self.stat_vars[key] = StringVar(value="0" if key != "tiempo" else "0s")
+                self.stat_vars[key] = StringVar(value={"tiempo": "0s", "velocidad": "-", "eta": "-"}.get(key, "0"))
 
         self.stat_labels = getattr(self, 'stat_labels', {})
         self.stat_labels["procesados"] = self.create_stat_item(stats_grid, "📧 Procesados:", self.stat_vars["procesados"], 0, 0)
         self.stat_labels["enviados"] = self.create_stat_item(stats_grid, "✅ Enviados:", self.stat_vars["enviados"], 0, 1)
         self.stat_labels["errores"] = self.create_stat_item(stats_grid, "❌ Errores:", self.stat_vars["errores"], 1, 0)
         self.stat_labels["tiempo"] = self.create_stat_item(stats_grid, "⏱️ Tiempo:", self.stat_vars["tiempo"], 1, 1)
+        self.stat_labels["velocidad"] = self.create_stat_item(stats_grid, "🚀 Velocidad:", self.stat_vars["velocidad"], 2, 0)
+        self.stat_labels["eta"] = self.create_stat_item(stats_grid, "⏳ Restante:", self.stat_vars["eta"], 2, 1)
 
     def create_stat_item(self, parent, label, var, row, col):
         """Crear un elemento de estadística usando StringVar"""
@@ -412,6 +496,14 @@ class EmailSenderGUI:
         self.stat_vars["errores"].set(str(errores))
         self.stat_vars["tiempo"].set(str(tiempo))
 
+    def update_live_stats(self, velocidad, eta):
+        """Actualizar velocidad de envío y tiempo restante estimado"""
+        self.stat_vars["velocidad"].set(velocidad)
+        self.stat_vars["eta"].set(eta)
+
+    def format_seconds(self, segundos):
+        segundos = int(segundos)
+        return f"{segundos}s" if segundos < 60 else f"{segundos//60}m {segundos%60:02d}s"
 
 
     def create_footer(self, parent):
@@ -446,11 +538,64 @@ class EmailSenderGUI:
             
         if not os.path.exists(self.path_var.get()):
             issues.append("• El directorio de boletas no existe")
-            
+
+        # La carpeta del mes se recorre una sola vez, dentro de la simulación
+        carpeta_mes = os.path.join(self.path_var.get(), self.mes_var.get())
+        if not issues and not os.path.isdir(carpeta_mes):
+            issues.append(f"• No existe la carpeta del mes: {carpeta_mes}")
+
         if issues:
             messagebox.showwarning("⚠️ Problemas de Configuración", "\n".join(issues))
+            return
+
+        if self.is_processing:
+            return
+        # Simulación completa en segundo plano: valida, arma cada correo y estima el tiempo de envío
+        self.set_processing_state(True)
+        self.progreso = ProgressAggregator()
+        self.root.after(1000 // PROGRESS_FPS, self.poll_progress)
+        # Las variables de Tk solo se leen en el hilo de Tk
+        args = (self.excel_path_var.get(), self.mes_var.get(), self.path_var.get(), int(self.anio_var.get()),
+                self.reenviar_var.get())
+        thread = threading.Thread(target=self.dry_run_thread, args=args)
+        thread.daemon = True
+        thread.start()
+
+    def show_config_warning(self, texto):
+        """Mostrar un problema de configuración desde un hilo de trabajo (en el hilo de Tk)"""
+        self.root.after(0, lambda: messagebox.showwarning("⚠️ Problemas de Configuración", texto))
+
+    def dry_run_thread(self, excel_path, mes, path_boletas, anio, reenviar):
+        """Simular el envío (todas las etapas salvo SMTP) y mostrar el reporte de preparación"""
+        from core.relays import RelayConfigError
+        reporte = None
+        try:
+            pipeline = self.sender.crear_pipeline(reanudar=not reenviar)
+            pipeline.subscribe(self.progreso.publicar)
+            reporte = pipeline.simular(RecipientSource(excel_path), mes, path_boletas, anio=anio)
+        except RecipientSourceError as e:
+            self.show_config_warning(f"• {str(e)}")
+            return
+        except RelayConfigError as e:
+            self.show_config_warning(f"• Error en {SMTP_ACCOUNTS_FILE}: {str(e)}")
+            return
+        except Exception as e:
+            self.update_status(f"❌ Error inesperado: {str(e)}", "danger")
+            return
+        finally:
+            # Un solo callback de Tk: primero se dibuja el progreso final y luego se muestra el reporte
+            self.root.after(0, lambda: self.finish_dry_run(reporte))
+
+    def finish_dry_run(self, reporte):
+        """Cerrar la simulación en el hilo de Tk y mostrar el reporte de preparación"""
+        self.set_processing_state(False)
+        if reporte is None:
+            return
+        texto = formatear_reporte(reporte)
+        if reporte.listo_para_enviar:
+            messagebox.showinfo("✅ Configuración Correcta", texto)
         else:
-            messagebox.showinfo("✅ Configuración Correcta", "Todos los requisitos están listos para el envío.")
+            messagebox.showwarning("⚠️ Verificación de Boletas", texto)
 
     def clear_data(self):
         """Limpiar datos de la interfaz"""
@@ -462,6 +607,9 @@ class EmailSenderGUI:
         # Reiniciar las estadísticas
         if hasattr(self, 'update_stats'):
             self.update_stats(0, 0, 0, "0s")
+            self.update_live_stats("-", "-")
+            self.counts_var.set("")
+            self.progress_bar.configure(value=0)
         self.update_status("🔄 Datos limpiados", "info")
 
 
@@ -470,7 +618,7 @@ class EmailSenderGUI:
             return
         file_path = filedialog.askopenfilename(
             title="Seleccionar archivo Excel",
-            filetypes=[("Archivos Excel", "*.xlsx"), ("Todos los archivos", "*.*")]
+            filetypes=[("Archivos Excel", "*.xlsx"), ("Archivos CSV", "*.csv"), ("Todos los archivos", "*.*")]
         )
         if file_path:
             self.excel_path_var.set(file_path)
@@ -487,9 +635,21 @@ class EmailSenderGUI:
                 "Por favor selecciona un archivo Excel antes de continuar."
             )
             return
-        
+
+        if self.reenviar_var.get() and not messagebox.askyesno(
+            "🔁 Reenviar boletas",
+            f"Se enviará la boleta de {self.mes_var.get()} {self.anio_var.get()} también a quienes ya la "
+            f"recibieron.\n\n¿Deseas continuar?"
+        ):
+            return
+
         self.set_processing_state(True)
-        thread = threading.Thread(target=self.send_emails_thread)
+        self.progreso = ProgressAggregator()
+        self.root.after(1000 // PROGRESS_FPS, self.poll_progress)
+        # Las variables de Tk solo se leen en el hilo de Tk
+        args = (self.excel_path_var.get(), self.mes_var.get(), self.path_var.get(), int(self.anio_var.get()),
+                self.reenviar_var.get())
+        thread = threading.Thread(target=self.send_emails_thread, args=args)
         thread.daemon = True
         thread.start()
 
@@ -503,7 +663,10 @@ class EmailSenderGUI:
             )
             self.select_excel_btn.configure(state='disabled')
             self.month_combo.configure(state='disabled')
-            self.progress_bar.start(10)
+            self.year_combo.configure(state='disabled')
+            self.reenviar_check.configure(state='disabled')
+            self.progress_bar.configure(maximum=1, value=0)
+            self.counts_var.set("")
             self.status_var.set("")
             self.progress_var.set("🔄 Iniciando proceso de envío...")
         else:
@@ -514,9 +677,43 @@ class EmailSenderGUI:
             )
             self.select_excel_btn.configure(state='normal')
             self.month_combo.configure(state='readonly')
-            self.progress_bar.stop()
+            self.year_combo.configure(state='readonly')
+            self.reenviar_check.configure(state='normal')
+            # Los hilos de trabajo ya terminaron: se dibujan los eventos que quedan en la cola
+            # antes de soltar el agregador
+            if self.progreso is not None:
+                estado = self.progreso.drenar()
+                if estado is not None:
+                    self.draw_progress(estado)
+            self.progreso = None
             self.progress_var.set("")
 
+    def poll_progress(self):
+        """Dibujar el progreso agregado (hilo de Tk, PROGRESS_FPS veces por segundo mientras se envía)"""
+        progreso = self.progreso
+        if progreso is None:
+            return
+        estado = progreso.drenar()
+        if estado is not None:
+            self.draw_progress(estado)
+        if self.is_processing:
+            self.root.after(1000 // PROGRESS_FPS, self.poll_progress)
+
+    def draw_progress(self, estado):
+        """Dibujar un ProgressSnapshot (hilo de Tk)"""
+        if estado.mensaje:
+            self.progress_var.set(estado.mensaje)
+        if estado.total:
+            self.progress_bar.configure(maximum=estado.total, value=estado.hechos)
+            omitidos = f" | ⏭️ {estado.omitidos} omitidos" if estado.omitidos else ""
+            self.counts_var.set(
+                f"✅ {estado.enviados} enviados | ❌ {estado.fallidos} fallidos | "
+                f"⏳ {estado.restantes} restantes{omitidos}"
+            )
+            if estado.velocidad > 0:
+                eta = self.format_seconds(estado.eta) if estado.eta is not None else "-"
+                self.update_live_stats(f"{estado.velocidad:.1f} correos/s", eta)
+
     def update_progress(self, message):
         self.root.after(0, lambda: self.progress_var.set(message))
 
@@ -526,187 +723,148 @@ class EmailSenderGUI:
             self.status_label.configure(bootstyle=style)
         self.root.after(0, update)
 
-    def send_emails_thread(self):
+    def send_emails_thread(self, excel_path, mes, path_boletas, anio, reenviar):
+        from core.relays import RelayConfigError
         try:
-            self.send_emails()
+            self.send_emails(excel_path, mes, path_boletas, anio, reenviar)
+        except RelayConfigError as e:
+            # Cuentas SMTP mal configuradas: se avisa como en la línea de comandos, no como error inesperado
+            self.update_status(f"❌ Error en {SMTP_ACCOUNTS_FILE}", "danger")
+            self.show_config_warning(f"• Error en {SMTP_ACCOUNTS_FILE}: {str(e)}")
         except Exception as e:
             self.update_status(f"❌ Error inesperado: {str(e)}", "danger")
         finally:
             self.root.after(0, lambda: self.set_processing_state(False))
 
-    def send_emails(self):
-        # Refresca la plantilla de email antes de enviar
-        try:
-            from core.config import load_email_templates
-            subject, body = load_email_templates()
-            self.sender.subject_template = subject
-            self.sender.body_template = body
-        except Exception as e:
-            self.update_status(f"❌ Error al recargar plantilla: {str(e)}", "danger")
-            return
+    def ask_yes_no(self, title, message):
+        """Mostrar una confirmación desde el hilo de envío en el hilo de Tk y esperar la respuesta"""
+        respuesta = {}
+        listo = threading.Event()
+
+        def ask():
+            respuesta["ok"] = messagebox.askyesno(title, message)
+            listo.set()
+
+        self.root.after(0, ask)
+        listo.wait()
+        return respuesta["ok"]
+
+    def format_preflight_report(self, reporte, limite=10):
+        """Texto del reporte de verificación previa (PDF faltantes y huérfanos)"""
+        lineas = [f"📊 Destinatarios: {reporte['total']}"]
+        faltantes = reporte["faltantes"]
+        huerfanos = reporte["huerfanos"]
+        lineas.append(f"❌ Sin PDF de boleta: {len(faltantes)}")
+        for fila, nombre, dni in faltantes[:limite]:
+            lineas.append(f"   • Fila {fila}: {nombre} ({dni})")
+        if len(faltantes) > limite:
+            lineas.append(f"   ... y {len(faltantes) - limite} más")
+        # Solo llega una muestra de las filas inválidas; el detalle completo queda en el reporte de errores
+        invalidos = reporte.get("invalidos", [])
+        total_invalidos = reporte.get("total_invalidos", len(invalidos))
+        if total_invalidos:
+            lineas.append(f"⚠️ Filas inválidas o duplicadas: {total_invalidos}")
+            for fila, nombre, _, _, motivo in invalidos[:limite]:
+                lineas.append(f"   • Fila {fila}: {nombre} - {motivo}")
+            mostradas = min(limite, len(invalidos))
+            if total_invalidos > mostradas:
+                lineas.append(f"   ... y {total_invalidos - mostradas} más (ver el reporte de errores)")
+        lineas.append(f"📄 PDF sin destinatario: {len(huerfanos)}")
+        for dni in huerfanos[:limite]:
+            lineas.append(f"   • {dni}.pdf")
+        if len(huerfanos) > limite:
+            lineas.append(f"   ... y {len(huerfanos) - limite} más")
+        return "\n".join(lineas)
+
+    def confirm_preflight(self, reporte):
+        """Etapa de confirmación del pipeline: se consulta solo si la verificación previa tiene observaciones"""
+        return self.ask_yes_no(
+            "🔍 Verificación previa",
+            self.format_preflight_report(reporte) + "\n\n¿Deseas continuar con el envío?"
+        )
 
-        excel_path = self.excel_path_var.get()
-        if not excel_path or not os.path.exists(excel_path):
-            self.update_status("❌ Error: Debes seleccionar un archivo Excel válido.", "danger")
-            return
-            
+    def send_emails(self, excel_path, mes, path_boletas, anio, reenviar):
         self.update_progress("📖 Leyendo archivo Excel...")
         try:
-            df = pd.read_excel(excel_path, dtype={"dni": str})
-        except Exception as e:
-            self.update_status(f"❌ Error al leer Excel: {str(e)}", "danger")
+            # Los destinatarios se leen en streaming (una pasada para la verificación previa y otra
+            # durante el envío), sin cargar la hoja completa
+            recipients = RecipientSource(excel_path)
+        except RecipientSourceError as e:
+            self.update_status(f"❌ Error: {str(e)}", "danger")
             return
-            
-        required_columns = {"nombre", "email", "dni"}
-        df.columns = df.columns.str.lower()
-        if not required_columns.issubset(df.columns):
-            self.update_status("❌ Error: El Excel debe contener: nombre, email y dni.", "danger")
+
+        # Mismo pipeline que la línea de comandos: validación, verificación previa, envío,
+        # constancias y reporte de errores
+        pipeline = self.sender.crear_pipeline(confirmar=self.confirm_preflight, reanudar=not reenviar)
+        # Los hilos de envío solo encolan eventos; la ventana los dibuja en poll_progress
+        pipeline.subscribe(self.progreso.publicar)
+        start_time = time.time()
+        try:
+            resultado = pipeline.run(recipients, mes, path_boletas, anio=anio)
+        except RecipientSourceError as e:
+            self.update_status(f"❌ Error: {str(e)}", "danger")
             return
-            
-        df = df[["nombre", "email", "dni"]].dropna(subset=["nombre", "email", "dni"])
-        recipients = df.to_dict("records")
-        
-        if not recipients:
-            self.update_status("❌ Sin registros válidos en el archivo Excel.", "danger")
+        if resultado.cancelado:
+            self.update_status("⏹️ Envío cancelado tras la verificación previa.", "warning")
             return
-            
-        mes = self.mes_var.get()
-        path_boletas = self.path_var.get()
-        
-        # Enviar correos y recolectar constancias generadas
-        constancias_generadas = []
-        
-        def send_batch_with_constancia(recipients, mes, path_boletas, progress_callback=None):
-            LOTE_SIZE = 30
-            enviados = 0
-            errores = []
-            total_recipients = len(recipients)
-            sender = self.sender
-            
-            def enviar_lote(lote, start_index):
-                nonlocal enviados
-                import os
-                import time
-                from datetime import datetime
-                
-                try:
-                    if progress_callback:
-                        progress_callback(f"🔗 Conectando al servidor SMTP...")
-                    import smtplib
-                    from core.config import SMTP_SERVER, SMTP_PORT, EMAIL_USER, EMAIL_PASSWORD
-                    server = smtplib.SMTP_SSL(SMTP_SERVER, SMTP_PORT)
-                    server.login(EMAIL_USER, EMAIL_PASSWORD)
-                except Exception as e:
-                    for offset, recipient in enumerate(lote):
-                        i = start_index + offset
-                        nombre = recipient["nombre"]
-                        email = str(recipient["email"]).strip()
-                        dni = str(recipient["dni"]).strip()
-                        errores.append((i, nombre, email, dni, f"Error SMTP: {str(e)} (No se pudo conectar)"))
-                    return
-                    
-                for offset, recipient in enumerate(lote):
-                    i = start_index + offset
-                    if progress_callback:
-                        progress_callback(f"📧 Enviando correo {i+1} de {total_recipients}...")
-                    
-                    nombre = recipient["nombre"]
-                    email = str(recipient["email"]).strip()
-                    dni = str(recipient["dni"]).strip()
-                    
-                    if not sender.is_valid_dni(dni):
-                        errores.append((i, nombre, email, dni, "DNI inválido"))
-                        continue
-                        
-                    if not sender.is_valid_email(email):
-                        errores.append((i, nombre, email, dni, "Email inválido"))
-                        continue
-                        
-                    dni_formatted = dni.zfill(8)
-                    pdf_path = os.path.join(path_boletas, mes, f"{dni_formatted}.pdf")
-                    
-                    if not os.path.exists(pdf_path):
-                        errores.append((i, nombre, email, dni, "PDF no encontrado"))
-                        continue
-                        
-                    msg_asunto = sender.subject_template.replace("{MES}", mes.capitalize())
-                    html_content = sender.body_template.replace("{NOMBRE}", nombre).replace("{MES}", mes.capitalize())
-                    
-                    try:
-                        from email.mime.multipart import MIMEMultipart
-                        from email.mime.text import MIMEText
-                        from email.mime.application import MIMEApplication
-                        from email.utils import formataddr, make_msgid
-                        from email.header import Header
-                        from core.config import EMAIL_USER
-                        
-                        msg = MIMEMultipart("alternative")
-                        msg["From"] = formataddr((str(Header("Clínica Santa Rosa", "utf-8")), EMAIL_USER))
-                        msg["To"] = formataddr((nombre, email))
-                        msg["Subject"] = msg_asunto
-                        msg.add_header('Disposition-Notification-To', EMAIL_USER)
-                        msg_id = make_msgid()
-                        msg['Message-ID'] = msg_id
-                        html_content += f"<br><br><small><b>Identificador de envío (Message-ID):</b> {msg_id}</small>"
-                        msg.attach(MIMEText(html_content, "html"))
-                        
-                        with open(pdf_path, "rb") as f:
-                            part = MIMEApplication(f.read(), _subtype="pdf")
-                            part.add_header("Content-Disposition", "attachment", filename=os.path.basename(pdf_path))
-                            msg.attach(part)
-                            
-                        server.send_message(msg)
-                        enviados += 1
-                        
-                        fecha_envio = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                        constancia_path = sender.generar_constancia_envio(
-                            remitente=("Clínica Santa Rosa", sender.EMAIL_USER if hasattr(sender, 'EMAIL_USER') else ""),
-                            destinatario=(nombre, email),
-                            asunto=msg_asunto,
-                            cuerpo=html_content,
-                            fecha_envio=fecha_envio,
-                            adjunto_path=pdf_path,
-                            message_id=msg_id
-                        )
-                        constancias_generadas.append(constancia_path)
-                        time.sleep(1.5)
-                        
-                    except Exception as e:
-                        errores.append((i, nombre, email, dni, f"Error SMTP: {str(e)}"))
-                        
-                server.quit()
-                time.sleep(2)
-                
-            for batch_start in range(0, total_recipients, LOTE_SIZE):
-                batch = recipients[batch_start:batch_start + LOTE_SIZE]
-                enviar_lote(batch, batch_start)
-                
-            return enviados, errores
-            
-        import time
-        start_time = time.time()
-        enviados, errores = send_batch_with_constancia(
-            recipients, mes, path_boletas, progress_callback=self.update_progress
-        )
         elapsed = int(time.time() - start_time)
-        elapsed_str = f"{elapsed}s" if elapsed < 60 else f"{elapsed//60}m {elapsed%60}s"
+        elapsed_str = self.format_seconds(elapsed)
 
-        error_file_saved = self.sender.generar_log_errores(errores) if errores else None
-        total_procesados = len(recipients)
-        total_enviados = enviados
-        total_errores = len(errores)
+        error_file_saved = resultado.error_file
+        total_procesados = resultado.procesados
+        if not total_procesados:
+            self.update_status("❌ Sin registros válidos en el archivo Excel.", "danger")
+            return
+        total_enviados = resultado.enviados
+        total_errores = resultado.total_errores
 
         # Actualizar estadísticas en la GUI
-        self.update_stats(total_procesados, total_enviados, total_errores, elapsed_str)
+        self.root.after(0, lambda: self.update_stats(total_procesados, total_enviados, total_errores, elapsed_str))
 
         mensaje_lineas = []
         mensaje_lineas.append(f"📊 Total procesados: {total_procesados}")
+        if resultado.omitidos:
+            mensaje_lineas.append(f"⏭️ Omitidos (ya enviados en {resultado.periodo}): {resultado.omitidos}")
         if total_enviados > 0:
             mensaje_lineas.append(f"✅ Enviados correctamente: {total_enviados}")
         if total_errores > 0:
             mensaje_lineas.append(f"❌ Errores encontrados: {total_errores}")
         if error_file_saved:
             mensaje_lineas.append(f"📄 Ver detalles en: {os.path.basename(error_file_saved)}")
+        pool_stats = resultado.pool_stats
+        if pool_stats["hits"] or pool_stats["misses"]:
+            mensaje_lineas.append(
+                f"🔌 Conexiones SMTP: {pool_stats['hits']} reutilizadas, "
+                f"{pool_stats['misses']} nuevas, {pool_stats['reconnects']} reconexiones"
+            )
+        control_tasa = resultado.control_tasa
+        if "tasa" in control_tasa:
+            mensaje_lineas.append(
+                f"🚦 Tasa final: {control_tasa['tasa']:.2f} correos/s | "
+                f"Reintentos por límite del servidor: {control_tasa['reintentos']}"
+            )
+        cache = resultado.cache_adjuntos
+        if cache.get("aciertos", 0) + cache.get("aciertos_contenido", 0) + cache.get("fallos", 0):
+            mensaje_lineas.append(
+                f"🗂️ Caché de adjuntos: {cache['tasa_aciertos']:.0%} aciertos | "
+                f"{cache['aciertos'] + cache['aciertos_contenido']} reutilizados, {cache['fallos']} codificados"
+            )
+        for nombre, relay in resultado.relays.items():
+            texto = (f"📮 {nombre}: {relay['enviados']} enviados ({relay['correos_por_segundo']:.2f} correos/s) | "
+                     f"{relay['rechazos']} rechazos, {relay['failovers']} failovers")
+            if relay["desactivado"]:
+                texto += " | desactivado"
+            mensaje_lineas.append(texto)
+        tiempos = resultado.tiempos
+        if "envio_smtp" in tiempos:
+            mensaje_lineas.append(
+                f"⏱️ Envío SMTP: {tiempos['envio_smtp']:.1f}s | "
+                f"PDF constancias: {tiempos['constancias_pdf']:.1f}s | "
+                f"Espera final constancias: {tiempos['espera_constancias']:.1f}s"
+            )
+
+        if resultado.metrics_file:
+            mensaje_lineas.append(f"📈 Métricas por etapa: {os.path.basename(resultado.metrics_file)}")
 
         mensaje_final = "\n".join(mensaje_lineas)
 
@@ -716,12 +874,15 @@ class EmailSenderGUI:
             style = "success"
         elif total_enviados == 0 and total_errores > 0:
             style = "danger"
+        elif resultado.omitidos:
+            style = "info"
         else:
             style = "secondary"
             mensaje_final = "No se procesaron correos"
 
         self.update_status(mensaje_final, style)
 
+        constancias_generadas = resultado.constancias
         if constancias_generadas:
             carpeta_constancias = os.path.dirname(constancias_generadas[0])
             messagebox.showinfo(
@@ -1,8 +1,16 @@
 import os
+import hashlib
 from tkinter import Toplevel, Entry, Text, END, BOTH, LEFT, RIGHT, Y, X, Scrollbar, VERTICAL, INSERT, messagebox
 import ttkbootstrap as tb
 from tkhtmlview import HTMLLabel
 from core.config import EMAIL_CONFIG_FILE, load_email_templates
+from core.templates import compilar, renderizar, valores_destinatario
+
+# Espera tras la última tecla antes de redibujar la vista previa
+PREVIEW_DEBOUNCE_MS = 300
+# Destinatario de ejemplo: la vista previa usa el mismo render que el envío real
+DESTINATARIO_EJEMPLO = {"nombre": "Juan Pérez", "email": "juan.perez@ejemplo.com", "dni": "12345678"}
+MESSAGE_ID_EJEMPLO = "&lt;ejemplo@clinicasantarosa&gt;"
 
 def open_template_editor_modal(root):
     modal = Toplevel(root)
@@ -21,7 +29,7 @@ def open_template_editor_modal(root):
     help_text = (
         "Variables disponibles: "
         "{NOMBRE} (nombre del destinatario), "
-        "{MES} (mes seleccionado).\n"
+        "{MES} (mes seleccionado) y cualquier otra columna del Excel en mayúsculas (p. ej. {CARGO}).\n"
         "Puedes usar HTML: <b>negrita</b>, <u>subrayado</u>, <i>cursiva</i>, <br>, etc.\n"
         "Ejemplo: <b>Hola {NOMBRE}</b> - Boleta de {MES}."
     )
@@ -78,14 +86,30 @@ def open_template_editor_modal(root):
     preview_label = HTMLLabel(preview_frame, html="", background="#f8f9fa")
     preview_label.pack(fill=BOTH, expand=True)
 
-    def update_preview(*_):
-        # Simula reemplazo de variables para preview
-        subj = subject_entry.get().replace("{MES}", "Junio").replace("{NOMBRE}", "Juan Pérez")
+    valores_ejemplo = valores_destinatario(DESTINATARIO_EJEMPLO, "Junio")
+    preview_state = {"hash": None, "pendiente": None}
+
+    def update_preview():
+        preview_state["pendiente"] = None
+        if not modal.winfo_exists():
+            return
+        subj = subject_entry.get()
         html = text_body.get(1.0, END)
-        html = html.replace("{MES}", "Junio").replace("{NOMBRE}", "Juan Pérez")
-        preview_label.set_html(f"<b>Asunto:</b> {subj}<hr>" + html)
-    subject_entry.bind("<KeyRelease>", update_preview)
-    text_body.bind("<KeyRelease>", update_preview)
+        # Solo se redibuja si cambió el contenido (flechas, Shift, etc. no cambian nada)
+        contenido = hashlib.sha1(f"{subj}\0{html}".encode("utf-8")).digest()
+        if contenido == preview_state["hash"]:
+            return
+        preview_state["hash"] = contenido
+        asunto, cuerpo = renderizar((compilar(subj), compilar(html)), valores_ejemplo, MESSAGE_ID_EJEMPLO)
+        preview_label.set_html(f"<b>Asunto:</b> {asunto}<hr>" + cuerpo)
+
+    def schedule_preview(*_):
+        # Debounce: cada tecla reinicia la espera
+        if preview_state["pendiente"] is not None:
+            modal.after_cancel(preview_state["pendiente"])
+        preview_state["pendiente"] = modal.after(PREVIEW_DEBOUNCE_MS, update_preview)
+    subject_entry.bind("<KeyRelease>", schedule_preview)
+    text_body.bind("<KeyRelease>", schedule_preview)
     update_preview()
 
     # --- Botón guardar ---
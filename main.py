@@ -1,7 +1,10 @@
+import multiprocessing
 from gui.email_sender_gui import EmailSenderGUI
 import ttkbootstrap as tb
 
 if __name__ == "__main__":
+    # Necesario para el pool de procesos de constancias en Windows/ejecutables
+    multiprocessing.freeze_support()
     app = tb.Window(themename="superhero")
     gui = EmailSenderGUI(app)
     app.mainloop()
\ No newline at end of file
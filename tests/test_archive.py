@@ -0,0 +1,109 @@
+import io
+import os
+import zipfile
+
+import pytest
+from PyPDF2 import PdfReader, PdfWriter
+
+from core.archive import ConstanciaArchive, buscar_constancia, carpeta_parciales, rutas_archivo
+
+PERIODO = "2026-06"
+
+
+def pdf(paginas=1):
+    writer = PdfWriter()
+    for _ in range(paginas):
+        writer.add_blank_page(72, 72)
+    salida = io.BytesIO()
+    writer.write(salida)
+    return salida.getvalue()
+
+
+def interrumpir(archivo):
+    """Simula un proceso cortado: el registro de parciales queda sin `cerrar`."""
+    archivo._registro.close()
+
+
+def test_zip_recupera_parciales_de_un_envio_interrumpido(tmp_path):
+    carpeta = str(tmp_path)
+    archivo = ConstanciaArchive(carpeta, PERIODO, "zip")
+    archivo.agregar("111", "<a@test>", b"constancia 111")
+    archivo.agregar("222", "<b@test>", b"constancia 222")
+    interrumpir(archivo)
+    # Antes de cerrar, la constancia ya se puede recuperar desde las parciales
+    assert buscar_constancia(carpeta, PERIODO, dni="222") == b"constancia 222"
+
+    archivo = ConstanciaArchive(carpeta, PERIODO, "zip")
+    archivo.agregar("333", "<c@test>", b"constancia 333")
+    ruta = archivo.cerrar()
+
+    assert not os.path.exists(carpeta_parciales(carpeta, PERIODO))
+    with zipfile.ZipFile(ruta) as zf:
+        assert sorted(zf.namelist()) == ["constancia_111.pdf", "constancia_222.pdf", "constancia_333.pdf"]
+    assert buscar_constancia(carpeta, PERIODO, dni="111") == b"constancia 111"
+    assert buscar_constancia(carpeta, PERIODO, message_id="<c@test>") == b"constancia 333"
+    assert buscar_constancia(carpeta, PERIODO, dni="999") is None
+
+
+def test_zip_agrega_al_archivo_existente(tmp_path):
+    carpeta = str(tmp_path)
+    archivo = ConstanciaArchive(carpeta, PERIODO, "zip")
+    archivo.agregar("111", "<a@test>", b"primera")
+    archivo.cerrar()
+    archivo = ConstanciaArchive(carpeta, PERIODO, "zip")
+    archivo.agregar("111", "<a2@test>", b"reenvio")
+    archivo.agregar("222", "<b@test>", b"segunda")
+    ruta = archivo.cerrar()
+
+    with zipfile.ZipFile(ruta) as zf:
+        assert sorted(zf.namelist()) == ["constancia_111.pdf", "constancia_111_2.pdf", "constancia_222.pdf"]
+    # El índice apunta a la última constancia de cada DNI
+    assert buscar_constancia(carpeta, PERIODO, dni="111") == b"reenvio"
+    assert buscar_constancia(carpeta, PERIODO, message_id="<b@test>") == b"segunda"
+
+
+def test_registro_de_parciales_con_linea_cortada(tmp_path):
+    carpeta = str(tmp_path)
+    archivo = ConstanciaArchive(carpeta, PERIODO, "zip")
+    archivo.agregar("111", "<a@test>", b"constancia 111")
+    interrumpir(archivo)
+    with open(os.path.join(carpeta_parciales(carpeta, PERIODO), "parciales.jsonl"), "a", encoding="utf-8") as f:
+        f.write('{"dni": "222", "mess')
+
+    archivo = ConstanciaArchive(carpeta, PERIODO, "zip")
+    archivo.cerrar()
+    assert buscar_constancia(carpeta, PERIODO, dni="111") == b"constancia 111"
+    assert buscar_constancia(carpeta, PERIODO, dni="222") is None
+
+
+def test_pdf_indexa_rangos_de_paginas(tmp_path):
+    carpeta = str(tmp_path)
+    archivo = ConstanciaArchive(carpeta, PERIODO, "pdf")
+    archivo.agregar("111", "<a@test>", pdf(2))
+    interrumpir(archivo)
+    archivo = ConstanciaArchive(carpeta, PERIODO, "pdf")
+    archivo.agregar("222", "<b@test>", pdf(3))
+    ruta = archivo.cerrar()
+
+    assert len(PdfReader(ruta).pages) == 5
+    assert len(PdfReader(io.BytesIO(buscar_constancia(carpeta, PERIODO, dni="111"))).pages) == 2
+    assert len(PdfReader(io.BytesIO(buscar_constancia(carpeta, PERIODO, message_id="<b@test>"))).pages) == 3
+
+
+@pytest.mark.parametrize("formato", ["zip", "pdf"])
+def test_archivo_danado_se_aparta(tmp_path, formato):
+    carpeta = str(tmp_path)
+    ruta, _ = rutas_archivo(carpeta, PERIODO, formato)
+    with open(ruta, "wb") as f:
+        f.write(b"PK\x03\x04 truncado" if formato == "zip" else b"%PDF-1.4 truncado")
+
+    archivo = ConstanciaArchive(carpeta, PERIODO, formato)
+    assert archivo.apartado and os.path.basename(archivo.apartado).startswith(os.path.basename(ruta) + ".danado-")
+    archivo.agregar("111", "<a@test>", pdf())
+    archivo.cerrar()
+    assert buscar_constancia(carpeta, PERIODO, dni="111") is not None
+
+
+def test_formato_no_soportado(tmp_path):
+    with pytest.raises(ValueError):
+        ConstanciaArchive(str(tmp_path), PERIODO, "tar")
@@ -0,0 +1,124 @@
+from datetime import date
+
+import pytest
+
+from core import journal, message_builder
+from core.journal import SendJournal, periodo_envio
+from core.pipeline import SendPipeline
+from core.smtp_pool import SMTPConnectionPool
+
+
+class _Hoy(date):
+    @classmethod
+    def today(cls):
+        return cls(2026, 3, 15)
+
+
+@pytest.mark.parametrize("mes, anio, esperado", [
+    ("Enero", 2026, "2026-01"),
+    (" DICIEMBRE ", 2025, "2025-12"),
+    ("setiembre", 2026, "2026-09"),
+    ("Septiembre", 2026, "2026-09"),
+    ("Extra", 2026, "2026-extra"),
+])
+def test_periodo_envio(mes, anio, esperado):
+    assert periodo_envio(mes, anio) == esperado
+
+
+def test_periodo_sin_anio(monkeypatch):
+    monkeypatch.setattr(journal, "date", _Hoy)
+    assert periodo_envio("marzo") == "2026-03"
+    assert periodo_envio("febrero") == "2026-02"
+    # Las boletas de diciembre se envían en enero: un mes posterior al actual es del año anterior
+    assert periodo_envio("diciembre") == "2025-12"
+
+
+def test_registro_por_periodo(tmp_path):
+    registro = SendJournal(str(tmp_path / "envios.sqlite3"))
+    registro.marcar_pendiente("2026-01", "12345678", "ana@clinica.pe")
+    registro.marcar_pendiente("2026-01", "87654321", "luis@clinica.pe")
+    registro.marcar_enviado("2026-01", "12345678", "ana@clinica.pe", "<1@clinica.pe>")
+    registro.marcar_fallido("2026-01", "87654321", "luis@clinica.pe", "550 buzón inexistente")
+    assert registro.enviados("2026-01") == {"12345678"}
+    assert registro.enviados("2027-01") == set()
+    assert registro.resumen("2026-01") == {"sent": 1, "failed": 1}
+    registro.close()
+
+
+class _Servidor:
+    def __init__(self, enviados):
+        self.enviados = enviados
+
+    def sendmail(self, remitente, destinatarios, raw):
+        self.enviados.extend(destinatarios)
+
+    def noop(self):
+        return (250, b"ok")
+
+    def quit(self):
+        pass
+
+
+class _Constancias:
+    tiempo_pdf = 0.0
+    tiempo_espera = 0.0
+
+    def submit(self, contexto, **datos):
+        pass
+
+    def drain(self):
+        return [], []
+
+
+def _pipeline(tmp_path, registro, enviados, reanudar):
+    return SendPipeline(
+        pool=SMTPConnectionPool(connection_factory=lambda: _Servidor(enviados)),
+        journal=registro, workers=1, rate=1000, reanudar=reanudar, prefetch=0,
+        armar=lambda builder, plantillas, item, adjuntos: (b"raw", {"message_id": f"<{item.dni}@clinica.pe>"}),
+        constancias=lambda **kwargs: _Constancias(), reportar=None, adjuntos=None,
+        metrics_file="",
+    )
+
+
+@pytest.fixture
+def boletas(tmp_path, monkeypatch):
+    monkeypatch.setattr(message_builder, "EMAIL_USER", "rrhh@clinica.pe")
+    carpeta = tmp_path / "boletas"
+    (carpeta / "enero").mkdir(parents=True)
+    for dni in ("12345678", "87654321"):
+        (carpeta / "enero" / f"{dni}.pdf").write_bytes(b"%PDF-1.4")
+    return str(carpeta)
+
+
+DESTINATARIOS = [
+    {"fila": 2, "nombre": "Ana", "email": "ana@clinica.pe", "dni": "12345678"},
+    {"fila": 3, "nombre": "Luis", "email": "luis@clinica.pe", "dni": "87654321"},
+]
+
+
+def test_reanudar_omite_los_ya_enviados_del_periodo(tmp_path, boletas):
+    registro = SendJournal(str(tmp_path / "envios.sqlite3"))
+    registro.marcar_enviado("2026-01", "12345678", "ana@clinica.pe", "<previo@clinica.pe>")
+    enviados = []
+    resultado = _pipeline(tmp_path, registro, enviados, reanudar=True).run(DESTINATARIOS, "enero", boletas, anio=2026)
+    assert enviados == ["luis@clinica.pe"]
+    assert (resultado.enviados, resultado.omitidos) == (1, 1)
+    assert registro.enviados("2026-01") == {"12345678", "87654321"}
+
+    # El mismo mes de otro año es otro período: se envía a todos
+    enviados.clear()
+    resultado = _pipeline(tmp_path, registro, enviados, reanudar=True).run(DESTINATARIOS, "enero", boletas, anio=2027)
+    assert sorted(enviados) == ["ana@clinica.pe", "luis@clinica.pe"]
+    assert resultado.omitidos == 0
+    registro.close()
+
+
+def test_reenviar_ignora_el_registro(tmp_path, boletas):
+    registro = SendJournal(str(tmp_path / "envios.sqlite3"))
+    for destinatario in DESTINATARIOS:
+        registro.marcar_enviado("2026-01", destinatario["dni"], destinatario["email"], "<previo@clinica.pe>")
+    enviados = []
+    resultado = _pipeline(tmp_path, registro, enviados, reanudar=False).run(DESTINATARIOS, "enero", boletas, anio=2026)
+    assert sorted(enviados) == ["ana@clinica.pe", "luis@clinica.pe"]
+    assert (resultado.enviados, resultado.omitidos) == (2, 0)
+    registro.close()
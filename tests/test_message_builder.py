@@ -0,0 +1,46 @@
+from email import message_from_bytes
+from email.header import decode_header, make_header
+
+import pytest
+
+from core.message_builder import MessageBuilder, CabeceraInvalida, codificar_base64
+
+
+@pytest.fixture
+def builder():
+    return MessageBuilder(remitente_email="rrhh@clinica.pe")
+
+
+def _armar(builder, nombre="Ana Pérez", email="ana@clinica.pe", asunto="Boleta del mes de Enero"):
+    return builder.build(nombre, email, asunto, "<p>Hola</p>", codificar_base64(b"%PDF-1.4"), "12345678.pdf",
+                         builder.nuevo_message_id())
+
+
+@pytest.mark.parametrize("campo", ["nombre", "asunto"])
+@pytest.mark.parametrize("salto", ["\r\n", "\n", "\r"])
+def test_rechaza_saltos_de_linea(builder, campo, salto):
+    valor = f"Boleta{salto}Bcc: todos@clinica.pe"
+    with pytest.raises(CabeceraInvalida):
+        _armar(builder, **{campo: valor})
+
+
+def test_cabeceras_plegadas_y_codificadas(builder):
+    asunto = "Boleta del mes de Setiembre - Área de Hospitalización y Cuidados Intensivos " * 3
+    raw = _armar(builder, asunto=asunto.strip())
+    cabeceras = raw.split(b"\r\n\r\n", 1)[0]
+    # To y Subject (con sus líneas de continuación) van entre Content-Type y Message-ID
+    variables = cabeceras[cabeceras.index(b"\r\nTo: ") + 2:cabeceras.index(b"\r\nMessage-ID: ")].split(b"\r\n")
+    assert len(variables) > 2
+    assert all(len(linea) <= 78 for linea in variables)
+    assert all(linea.startswith((b"To: ", b"Subject: ", b" ")) for linea in variables)
+    mensaje = message_from_bytes(raw)
+    assert str(make_header(decode_header(mensaje["Subject"]))) == asunto.strip()
+    assert str(make_header(decode_header(mensaje["To"]))) == "Ana Pérez <ana@clinica.pe>"
+
+
+def test_codificar_base64_en_lineas_de_76():
+    codificado = codificar_base64(bytes(range(256)) * 500)
+    lineas = codificado.split(b"\r\n")
+    assert lineas[-1] == b""
+    assert all(len(linea) <= 76 for linea in lineas)
+    assert len(lineas[0]) == 76
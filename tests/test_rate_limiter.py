@@ -0,0 +1,105 @@
+from types import SimpleNamespace
+
+import pytest
+
+from core import rate_limiter
+from core.rate_limiter import TokenBucket, AdaptiveRateController
+
+
+class Reloj:
+    def __init__(self):
+        self.ahora = 1000.0
+
+    def monotonic(self):
+        return self.ahora
+
+    def sleep(self, segundos):
+        self.ahora += segundos
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    reloj = Reloj()
+    monkeypatch.setattr(rate_limiter, "time", SimpleNamespace(monotonic=reloj.monotonic, sleep=reloj.sleep))
+    return reloj
+
+
+def test_token_bucket_rafaga_y_reposicion(reloj):
+    bucket = TokenBucket(rate=2, capacity=3)
+    assert [bucket.try_acquire() for _ in range(4)] == [True, True, True, False]
+    reloj.ahora += 0.5
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
+    # La reposición no supera la capacidad
+    reloj.ahora += 100
+    assert [bucket.try_acquire() for _ in range(4)] == [True, True, True, False]
+
+
+def test_token_bucket_acquire_espera_lo_justo(reloj):
+    bucket = TokenBucket(rate=4, capacity=1)
+    bucket.acquire()
+    inicio = reloj.ahora
+    bucket.acquire()
+    assert reloj.ahora - inicio == pytest.approx(0.25)
+
+
+def test_token_bucket_rechaza_tasa_invalida():
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0)
+
+
+def test_aimd_sube_por_ventana_hasta_el_maximo(reloj):
+    control = AdaptiveRateController(rate=1, capacity=1, min_rate=0.2, max_rate=1.25, ventana=3)
+    assert control.paso == pytest.approx(0.1)
+    for _ in range(2):
+        control.registrar_exito()
+    assert control.rate == pytest.approx(1.0)
+    control.registrar_exito()
+    assert control.rate == pytest.approx(1.1)
+    for _ in range(9):
+        control.registrar_exito()
+    assert control.rate == pytest.approx(1.25)
+    assert control.stats()["aumentos"] == 3
+
+
+def test_aimd_reduce_a_la_mitad_una_vez_por_episodio(reloj, monkeypatch):
+    monkeypatch.setattr(rate_limiter.random, "uniform", lambda minimo, maximo: maximo)
+    control = AdaptiveRateController(rate=4, capacity=4, min_rate=0.5, ventana=3, backoff_base=2, backoff_max=5)
+    assert control.registrar_rechazo(1) == 2
+    assert control.rate == 2
+    assert not control.try_acquire()
+    # Otro rechazo durante la pausa es del mismo episodio: no vuelve a reducir, solo alarga la espera
+    assert control.registrar_rechazo(2) == 4
+    assert control.rate == 2
+    reloj.ahora += 4
+    assert control.registrar_rechazo(3) == 5
+    assert control.rate == 1
+    reloj.ahora += 5
+    assert control.registrar_rechazo(1) == 2
+    reloj.ahora += 2
+    control.registrar_rechazo(1)
+    assert control.rate == 0.5
+    assert control.stats()["reducciones"] == 4
+    # Un rechazo reinicia la cuenta de éxitos de la ventana
+    control.registrar_exito()
+    control.registrar_exito()
+    control.registrar_rechazo(1)
+    control.registrar_exito()
+    assert control.stats()["aumentos"] == 0
+
+
+def test_aimd_no_repone_tokens_durante_la_pausa(reloj, monkeypatch):
+    monkeypatch.setattr(rate_limiter.random, "uniform", lambda minimo, maximo: maximo)
+    control = AdaptiveRateController(rate=10, capacity=5, ventana=3, backoff_base=1)
+    control.registrar_rechazo(1)
+    reloj.ahora += 0.9
+    assert not control.try_acquire()
+    reloj.ahora += 0.2
+    assert control.try_acquire()
+
+
+def test_espera_de_reintento_con_jitter():
+    control = AdaptiveRateController(rate=1, backoff_base=2, backoff_max=10)
+    for intento, tope in ((1, 2), (2, 4), (3, 8), (5, 10)):
+        espera = control.espera_reintento(intento)
+        assert tope / 2 <= espera <= tope
@@ -0,0 +1,73 @@
+import pytest
+
+from core.journal import SendJournal
+from core.relays import Relay, RelayRouter, RelayConfigError
+
+
+@pytest.fixture
+def journal(tmp_path):
+    journal = SendJournal(str(tmp_path / "envios.sqlite3"))
+    yield journal
+    journal.close()
+
+
+def crear_router(journal=None, **cuotas):
+    relays = [
+        Relay("a", "smtp.a.test", tasa=5, peso=2, cuota_diaria=cuotas.get("a", 0)),
+        Relay("b", "smtp.b.test", tasa=5, peso=1, cuota_diaria=cuotas.get("b", 0)),
+    ]
+    router = RelayRouter(relays, journal)
+    router.iniciar()
+    return router
+
+
+def test_round_robin_ponderado_suave():
+    router = crear_router()
+    elegidos = [router.elegir().nombre for _ in range(6)]
+    assert elegidos == ["a", "b", "a", "a", "b", "a"]
+
+
+def test_relay_sin_cuota_queda_fuera_hasta_liberar():
+    router = crear_router(b=1)
+    assert [router.elegir().nombre for _ in range(3)] == ["a", "b", "a"]
+    assert [router.elegir().nombre for _ in range(3)] == ["a", "a", "a"]
+    b = router.relays[1]
+    assert b.cuota_restante() == 0
+    # Un intento fallido devuelve la cuota reservada
+    router.liberar(b)
+    assert b.cuota_restante() == 1
+    assert "b" in [router.elegir().nombre for _ in range(3)]
+
+
+def test_sin_relays_con_cuota_no_elige_ninguno():
+    router = crear_router(a=1, b=1)
+    assert {router.elegir().nombre, router.elegir().nombre} == {"a", "b"}
+    assert router.elegir() is None
+    assert router.cuota_restante() == 0
+
+
+def test_relay_desactivado_no_se_elige():
+    router = crear_router()
+    router.desactivar(router.relays[0], Exception("autenticación rechazada"))
+    assert [router.elegir().nombre for _ in range(3)] == ["b", "b", "b"]
+
+
+def test_uso_diario_persiste_en_el_journal(journal):
+    router = crear_router(journal, a=3)
+    a = router.elegir()
+    assert a.nombre == "a"
+    router.confirmar(a)
+    router.confirmar(a)
+    # Un envío nuevo del mismo día parte del uso registrado
+    otro = crear_router(journal, a=3)
+    assert otro.relays[0].usados_hoy == 2
+    assert otro.relays[0].cuota_restante() == 1
+
+
+def test_configuracion_invalida():
+    with pytest.raises(RelayConfigError):
+        Relay("a", "smtp.a.test", peso=0)
+    with pytest.raises(RelayConfigError):
+        Relay("a", None)
+    with pytest.raises(RelayConfigError):
+        RelayRouter([])
@@ -0,0 +1,51 @@
+from core.validation import validar_destinatarios
+
+
+def _fila(fila, nombre, email, dni):
+    return {"fila": fila, "nombre": nombre, "email": email, "dni": dni}
+
+
+def test_filas_invalidas():
+    errores = []
+    limpios = list(validar_destinatarios([
+        _fila(2, "Ana", "ana@clinica.pe", "1234567"),
+        _fila(3, "Luis", "luis@", "87654321"),
+        _fila(4, "Rosa", " rosa@clinica.pe ", " 11111111 "),
+    ], errores.append))
+    assert [r["fila"] for r in limpios] == [4]
+    assert limpios[0]["email"] == "rosa@clinica.pe"
+    assert limpios[0]["dni"] == "11111111"
+    assert [(e[0], e[4]) for e in errores] == [(2, "DNI inválido"), (3, "Email inválido")]
+
+
+def test_duplicados_conservan_la_primera_fila():
+    errores = []
+    limpios = list(validar_destinatarios([
+        _fila(2, "Ana", "ana@clinica.pe", "12345678"),
+        _fila(3, "Ana bis", "otra@clinica.pe", "12345678"),
+        _fila(4, "Luis", "ANA@clinica.pe", "87654321"),
+    ], errores.append))
+    assert [r["nombre"] for r in limpios] == ["Ana"]
+    assert [e[4] for e in errores] == [
+        "DNI duplicado (ya figura en la fila 2)",
+        "Email duplicado (ya figura en la fila 2)",
+    ]
+
+
+def test_fila_por_defecto_y_columnas_adicionales():
+    limpios = list(validar_destinatarios([{"nombre": "Ana", "email": "ana@clinica.pe", "dni": "12345678",
+                                           "area": "UCI"}], [].append))
+    assert limpios == [{"nombre": "Ana", "email": "ana@clinica.pe", "dni": "12345678", "area": "UCI", "fila": 2}]
+
+
+def test_entrega_cada_registro_antes_de_leer_el_siguiente():
+    leidos = []
+
+    def fuente():
+        for n in range(3):
+            leidos.append(n)
+            yield _fila(n + 2, f"P{n}", f"p{n}@clinica.pe", f"1000000{n}")
+
+    limpios = validar_destinatarios(fuente(), [].append)
+    next(limpios)
+    assert leidos == [0]